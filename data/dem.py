@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+CACHE = os.environ.get('FLOSIM_DEM_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'flosim', 'dem'))
+CHUNK_BYTES = 64 * 2 ** 20
+
+
+class Raster:
+    # a north-up grid, data[0, 0] is the top left cell and left/top are the outer edges of that cell
+    def __init__(self, data, left, top, dx, dy, nodata=None):
+        self.data, self.left, self.top, self.dx, self.dy, self.nodata = data, left, top, dx, dy, nodata
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def bounds(self):
+        rows, cols = self.data.shape
+        return self.left, self.top - rows * self.dy, self.left + cols * self.dx, self.top
+
+    def crop(self, left, bottom, right, top):
+        # a view of the cells overlapping the box, nothing is read
+        rows, cols = self.data.shape
+        c0 = max(int(np.floor((left - self.left) / self.dx)), 0)
+        c1 = min(int(np.ceil((right - self.left) / self.dx)), cols)
+        r0 = max(int(np.floor((self.top - top) / self.dy)), 0)
+        r1 = min(int(np.ceil((self.top - bottom) / self.dy)), rows)
+        if r0 >= r1 or c0 >= c1:
+            raise ValueError(f'box {(left, bottom, right, top)} does not overlap the raster {self.bounds}')
+        return Raster(self.data[r0:r1, c0:c1], self.left + c0 * self.dx, self.top - r0 * self.dy,
+                      self.dx, self.dy, self.nodata)
+
+    def _rows(self, r0, r1):
+        rows = np.array(self.data[r0:r1], dtype=np.float64)
+        if self.nodata is not None:
+            rows[rows == self.nodata] = np.nan
+        return rows
+
+
+def _read_header(f, keys):
+    header = {}
+    while True:
+        pos = f.tell()
+        line = f.readline()
+        parts = line.split()
+        if len(parts) != 2 or parts[0].lower() not in keys:
+            f.seek(pos)
+            return header
+        header[parts[0].lower()] = float(parts[1])
+
+
+def load_ascii(path, cache=CACHE):
+    # the text grid is parsed once, in row chunks, into a .npy in the cache and mapped from there,
+    # without a cache it is read into memory
+    keys = {'ncols', 'nrows', 'xllcorner', 'yllcorner', 'xllcenter', 'yllcenter', 'cellsize', 'nodata_value'}
+    with open(path) as f:
+        h = _read_header(f, keys)
+        rows, cols, size = int(h['nrows']), int(h['ncols']), h['cellsize']
+        left = h['xllcorner'] if 'xllcorner' in h else h['xllcenter'] - size / 2
+        bottom = h['yllcorner'] if 'yllcorner' in h else h['yllcenter'] - size / 2
+        if cache is None:
+            return Raster(np.loadtxt(f, dtype=np.float32, ndmin=2), left, bottom + rows * size, size, size,
+                          h.get('nodata_value'))
+        raw = os.path.join(cache, _key(path, 'raw') + '.npy')
+        if not os.path.exists(raw):
+            os.makedirs(cache, exist_ok=True)
+            out = open_memmap(raw + '.tmp', mode='w+', dtype=np.float32, shape=(rows, cols))
+            step = max(CHUNK_BYTES // (cols * 4), 1)
+            for r in range(0, rows, step):
+                out[r:r + step] = np.loadtxt(f, dtype=np.float32, max_rows=min(step, rows - r), ndmin=2)
+            out.flush()
+            del out
+            os.replace(raw + '.tmp', raw)
+    return Raster(np.load(raw, mmap_mode='r'), left, bottom + rows * size, size, size, h.get('nodata_value'))
+
+
+def load_bil(path):
+    # raw band interleaved by line with an ESRI .hdr, only the first band is mapped
+    with open(os.path.splitext(path)[0] + '.hdr') as f:
+        h = {k.lower(): v for k, v in (line.split(None, 1) for line in f if line.strip())}
+    rows, cols = int(h['nrows']), int(h['ncols'])
+    bands, bits = int(h.get('nbands', 1)), int(h.get('nbits', 32 if path.endswith('.flt') else 16))
+    kind = h.get('pixeltype', 'float' if path.endswith('.flt') else 'signedint').strip().lower()
+    order = '>' if h.get('byteorder', 'I').strip().upper() in ('M', 'MSBFIRST') else '<'
+    dtype = np.dtype(f"{order}{'f' if kind.startswith('float') else 'u' if kind == 'unsignedint' else 'i'}{bits // 8}")
+    data = np.memmap(path, dtype=dtype, mode='r', offset=int(h.get('skipbytes', 0)), shape=(rows, bands, cols))[:, 0]
+    dx, dy = float(h.get('xdim', h.get('cellsize', 1))), float(h.get('ydim', h.get('cellsize', 1)))
+    if 'ulxmap' in h:
+        left, top = float(h['ulxmap']) - dx / 2, float(h['ulymap']) + dy / 2
+    else:
+        left, top = float(h.get('xllcorner', 0)), float(h.get('yllcorner', 0)) + rows * dy
+    nodata = h.get('nodata', h.get('nodata_value'))
+    return Raster(data, left, top, dx, dy, None if nodata is None else float(nodata))
+
+
+def load(path, cache=CACHE):
+    match os.path.splitext(path)[1].lower():
+        case '.asc':
+            return load_ascii(path, cache)
+        case '.bil' | '.flt':
+            return load_bil(path)
+    raise ValueError(f'unsupported raster format {path!r}, expected .asc, .bil or .flt')
+
+
+def _chunks(rows, cols, n):
+    # output rows per chunk so that the source rows one chunk reads stay within CHUNK_BYTES
+    per = rows / n
+    return max(int(CHUNK_BYTES // (8 * cols * max(per, 1))), 1)
+
+
+def block_mean(raster, shape):
+    # mean of the source cells whose index range falls in every output cell, nodata cells are skipped
+    y, x = shape
+    rows, cols = raster.shape
+    re = np.floor(np.arange(y + 1) * rows / y).astype(int)
+    ce = np.floor(np.arange(x + 1) * cols / x).astype(int)
+    if (np.diff(re) == 0).any() or (np.diff(ce) == 0).any():
+        raise ValueError(f'block mean cannot upsample {raster.shape} to {shape}, use bilinear')
+    out = np.empty(shape)
+    step = _chunks(rows, cols, y)
+    for i in range(0, y, step):
+        j = min(i + step, y)
+        a = raster._rows(re[i], re[j])
+        valid = ~np.isnan(a)
+        a[~valid] = 0
+        sums = np.add.reduceat(np.add.reduceat(a, re[i:j] - re[i], axis=0), ce[:-1], axis=1)
+        counts = np.add.reduceat(np.add.reduceat(valid, re[i:j] - re[i], axis=0, dtype=np.int64), ce[:-1], axis=1)
+        np.divide(sums, counts, out=out[i:j], where=counts > 0)
+        out[i:j][counts == 0] = np.nan
+    return out
+
+
+def bilinear(raster, shape):
+    # samples the source at the output cell centres, treating source values as cell centre values
+    y, x = shape
+    rows, cols = raster.shape
+    sy = np.clip((np.arange(y) + 0.5) * rows / y - 0.5, 0, rows - 1)
+    sx = np.clip((np.arange(x) + 0.5) * cols / x - 0.5, 0, cols - 1)
+    c0 = np.minimum(sx.astype(int), cols - 2) if cols > 1 else np.zeros(x, dtype=int)
+    fx = sx - c0
+    c1 = np.minimum(c0 + 1, cols - 1)
+    out = np.empty(shape)
+    step = _chunks(rows, cols, y)
+    for i in range(0, y, step):
+        j = min(i + step, y)
+        r0 = np.minimum(sy[i:j].astype(int), rows - 2) if rows > 1 else np.zeros(j - i, dtype=int)
+        fy = (sy[i:j] - r0)[:, None]
+        lo, hi = r0[0], min(r0[-1] + 2, rows)
+        a = raster._rows(lo, hi)
+        top, bottom = a[r0 - lo], a[np.minimum(r0 + 1, rows - 1) - lo]
+        col = lambda b: b[:, c0] * (1 - fx) + b[:, c1] * fx
+        out[i:j] = col(top) * (1 - fy) + col(bottom) * fy
+    return out
+
+
+def _key(path, *args):
+    stat = os.stat(path)
+    return hashlib.sha1(json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns, *args]).encode()).hexdigest()
+
+
+def elevation(path, shape, bbox=None, method='mean', cache=CACHE):
+    # the raster resampled onto a (y, x) grid, optionally cropped to (left, bottom, right, top) first
+    if method not in ('mean', 'bilinear'):
+        raise ValueError(f"unknown method {method!r}, expected 'mean' or 'bilinear'")
+    name = None
+    if cache is not None:
+        name = os.path.join(cache, _key(path, list(shape), bbox and list(bbox), method) + '.npy')
+        if os.path.exists(name):
+            return np.load(name)
+    raster = load(path, cache)
+    if bbox is not None:
+        raster = raster.crop(*bbox)
+    out = block_mean(raster, shape) if method == 'mean' else bilinear(raster, shape)
+    if name is not None:
+        os.makedirs(cache, exist_ok=True)
+        np.save(name + '.tmp.npy', out)
+        os.replace(name + '.tmp.npy', name)
+    return out
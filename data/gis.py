@@ -1,51 +1,133 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from pandas import json_normalize
-from requests import get
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+ELEVATION_URL = os.environ.get('FLOSIM_ELEVATION_URL', 'https://api.open-elevation.com/api/v1')
+ROAD_URL = os.environ.get('FLOSIM_ROAD_URL', 'https://nominatim.openstreetmap.org')
+CACHE = os.environ.get('FLOSIM_GIS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'flosim', 'gis.sqlite'))
 
-def elevation(top_left_lat=None, top_left_lon=None, bottom_right_lat=None, bottom_right_lon=None):
-    def get_elevation(lat=None, long=None):
-        if lat is None or long is None:
-            return None
-        query = ('https://api.open-elevation.com/api/v1/lookup'
-                 f'?locations={lat},{long}')
-        r = get(query, timeout=20)
 
-        if r.status_code == 200 or r.status_code == 201:
-            _ele = json_normalize(r.json(), 'results')['elevation'].values[0]
-        else:
-            _ele = None
-        return _ele
+class Cache:
+    # persistent lookups keyed by coordinates rounded to `precision` decimals, only used from the calling thread
+    def __init__(self, path=CACHE, precision=5):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS lookup '
+                         '(kind TEXT, lat INTEGER, lon INTEGER, value REAL, PRIMARY KEY (kind, lat, lon))')
+        self._scale = 10 ** precision
 
-    cord = np.mgrid[top_left_lat:bottom_right_lat:.1, top_left_lon:bottom_right_lon:.1]
+    def _key(self, lat, lon):
+        return int(round(lat * self._scale)), int(round(lon * self._scale))
+
+    def get(self, kind, points):
+        values = {}
+        for lat, lon in points:
+            row = self._db.execute('SELECT value FROM lookup WHERE kind = ? AND lat = ? AND lon = ?',
+                                   (kind, *self._key(lat, lon))).fetchone()
+            if row is not None:
+                values[lat, lon] = row[0]
+        return values
+
+    def put(self, kind, values):
+        self._db.executemany('INSERT OR REPLACE INTO lookup VALUES (?, ?, ?, ?)',
+                             [(kind, *self._key(lat, lon), value) for (lat, lon), value in values.items()])
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+class Fetcher:
+    def __init__(self,
+                 elevation_url=ELEVATION_URL,
+                 road_url=ROAD_URL,
+                 workers=8,
+                 road_workers=1,
+                 batch=100,
+                 retries=5,
+                 backoff=0.5,
+                 timeout=20,
+                 cache=CACHE,
+                 precision=5):
+        self.elevation_url, self.road_url = elevation_url.rstrip('/'), road_url.rstrip('/')
+        # nominatim's usage policy allows a single client connection, hence the separate road_workers
+        self.workers, self.road_workers, self.batch, self.timeout = workers, road_workers, batch, timeout
+        self.session = Session()
+        self.session.headers['User-Agent'] = 'flosim'
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=None, respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(workers, road_workers), max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.cache = None if cache is None else cache if isinstance(cache, Cache) else Cache(cache, precision)
 
-    shape = (cord.shape[1], cord.shape[2])
-    dtype = np.float32
-    ele = np.empty(shape, dtype=dtype)
-    for i in range(cord.shape[1]):
-        for j in range(cord.shape[2]):
-            ele[i][j] = get_elevation(lat=cord[0][i][j], long=cord[1][i][j])
+    def __enter__(self):
+        return self
 
-    return ele
+    def __exit__(self, *_):
+        self.close()
 
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
 
-def road(top_left_lat=None, top_left_lon=None, bottom_right_lat=None, bottom_right_lon=None):
-    def get_road_data(lat=None, long=None):
-        url = f'https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={long}'
-        response = get(url, timeout=20)
-        data = response.json()
-        if 'road' in data['address']:
-            return True
-        else:
-            return False
+    def _lookup(self, kind, points, fetch, chunk, workers):
+        # cached values first, the rest in chunks of `chunk` points on a pool of `workers` threads
+        points = [(float(lat), float(lon)) for lat, lon in points]
+        values = {} if self.cache is None else self.cache.get(kind, points)
+        missing = list(dict.fromkeys(p for p in points if p not in values))
+        chunks = [missing[i:i + chunk] for i in range(0, len(missing), chunk)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for part, result in zip(chunks, pool.map(fetch, chunks)):
+                fetched = dict(zip(part, result))
+                values.update(fetched)
+                if self.cache is not None:
+                    self.cache.put(kind, fetched)
+        return np.array([values[p] for p in points], dtype=np.float64)
 
+    def _fetch_elevation(self, points):
+        r = self.session.post(f'{self.elevation_url}/lookup', timeout=self.timeout,
+                              json={'locations': [{'latitude': lat, 'longitude': lon} for lat, lon in points]})
+        r.raise_for_status()
+        return [result['elevation'] for result in r.json()['results']]
+
+    def _fetch_road(self, points):
+        (lat, lon), = points
+        r = self.session.get(f'{self.road_url}/reverse', timeout=self.timeout,
+                             params={'format': 'json', 'lat': lat, 'lon': lon})
+        r.raise_for_status()
+        return ['road' in r.json().get('address', {})]
+
+    def elevations(self, points):
+        return self._lookup('elevation', points, self._fetch_elevation, self.batch, self.workers)
+
+    def roads(self, points):
+        return self._lookup('road', points, self._fetch_road, 1, self.road_workers).astype(bool)
+
+
+def _grid(top_left_lat, top_left_lon, bottom_right_lat, bottom_right_lon):
     cord = np.mgrid[top_left_lat:bottom_right_lat:.1, top_left_lon:bottom_right_lon:.1]
+    return cord.shape[1:], np.stack([cord[0].ravel(), cord[1].ravel()], axis=1)
+
+
+def elevation(top_left_lat=None, top_left_lon=None, bottom_right_lat=None, bottom_right_lon=None, fetcher=None):
+    shape, points = _grid(top_left_lat, top_left_lon, bottom_right_lat, bottom_right_lon)
+    if fetcher is None:
+        with Fetcher() as fetcher:
+            return fetcher.elevations(points).reshape(shape).astype(np.float32)
+    return fetcher.elevations(points).reshape(shape).astype(np.float32)
 
-    shape = (cord.shape[1], cord.shape[2])
-    dtype = np.float32
-    is_road = np.empty(shape, dtype=dtype)
-    for i in range(cord.shape[1]):
-        for j in range(cord.shape[2]):
-            is_road[i][j] = get_road_data(lat=cord[0][i][j], long=cord[1][i][j])
 
-    return is_road
+def road(top_left_lat=None, top_left_lon=None, bottom_right_lat=None, bottom_right_lon=None, fetcher=None):
+    shape, points = _grid(top_left_lat, top_left_lon, bottom_right_lat, bottom_right_lon)
+    if fetcher is None:
+        with Fetcher() as fetcher:
+            return fetcher.roads(points).reshape(shape).astype(np.float32)
+    return fetcher.roads(points).reshape(shape).astype(np.float32)
@@ -1,2 +1,9 @@
-from .basin import Basin, ControlLayer, FillsLayer, DrainLayer
+from .basin import Basin, ControlLayer, FillsLayer, DrainLayer, SparseLayer, SparseFillsLayer, SparseDrainLayer
 from .layers import *
+from .ensemble import EnsembleBasin
+from .parallel import ParallelBasin
+from .refine import HierarchicalBasin
+from .outofcore import OutOfCoreBasin
+from .terrain import Terrain
+from .record import Recorder, Recording
+from .observe import Gauges, Regions, Sections, Volume
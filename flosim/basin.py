@@ -1,20 +1,95 @@
+import warnings
 from abc import ABCMeta, abstractmethod, ABC
 
 import numpy as np
 
-from flosim.func import gauss_seidel_solver, surr, zeroBoundAdjust, velAct
+from flosim import jit, checkpoint
+from flosim.profile import Profiler
+from flosim.terrain import Terrain
+from flosim.func import Workspace, jacobi_solver, surr, zeroBoundAdjust, velAct
+
+
+class Accumulator:
+    FIELDS = "W", "B", "SVX", "SVY"
+
+    def __init__(self,
+                 dW: "np.ndarray",
+                 dB: "np.ndarray",
+                 dSVX: "np.ndarray",
+                 dSVY: "np.ndarray",
+                 mask: "np.ndarray",
+                 cache: bool = True,
+                 jit: bool = False):
+        self.dW, self.dB, self.dSVX, self.dSVY = dW, dB, dSVX, dSVY
+        # the built-in dense layers accumulate through the compiled kernels instead
+        self.jit = jit
+        self.tmp = np.zeros_like(dW)
+        self.mask = mask
+        self._cache = {} if cache else None
+        self._fusedKey, self._fused = None, None
+
+    def __getitem__(self, field: str) -> "np.ndarray":
+        return getattr(self, f"d{field}")
+
+    def scaled(self, layer: "ControlLayer", tick: float) -> "np.ndarray":
+        # a layer's state independent contribution only changes with its version and the tick
+        if self._cache is None:
+            shape = layer[...].shape
+            return layer._scaled(tick, self.tmp if shape == self.tmp.shape else np.empty(shape, dtype=self.tmp.dtype))
+        key, out = self._cache.get(layer, (None, None))
+        if key != (layer.version, tick):
+            # a sparse layer's grid changes size with its set cells
+            if out is None or out.shape != layer[...].shape:
+                out = np.empty(layer[...].shape, dtype=self.tmp.dtype)
+            self._cache[layer] = (layer.version, tick), layer._scaled(tick, out)
+        return out
+
+    def fused(self, layers: list["ControlLayer"], tick: float) -> "np.ndarray":
+        key = tick, tuple((id(layer), layer.version) for layer in layers)
+        if key != self._fusedKey:
+            if self._fused is None:
+                self._fused = np.empty_like(self.tmp)
+            self._fused.fill(0)
+            for layer in layers:
+                if isinstance(layer, SparseLayer):
+                    # the set cells' rates are scattered onto the dense grid
+                    layer._view(self._fused)[:, layer.index] += layer._scaled(tick, np.empty(layer[...].shape,
+                                                                                             dtype=self.tmp.dtype))
+                else:
+                    np.add(self._fused, layer._scaled(tick, self.tmp), out=self._fused)
+            self._fusedKey = key
+        return self._fused
 
 
 class ControlLayer(metaclass=ABCMeta):
     ZERO = np.float64(0)
+    FIELDS = Accumulator.FIELDS
+    SOURCE = False
 
-    def __init__(self, x, y):
+    def __init__(self, x, y, members: int = None, dtype=np.float64):
         self._x, self._y = x, y
-        self._level = np.zeros((self._y, self._x), dtype=np.float64)
+        shape = (self._y, self._x) if members is None else (members, self._y, self._x)
+        self._level = np.zeros(shape, dtype=dtype)
+        self.ZERO = self._level.dtype.type(0)
+        self._version = 0
 
     def __getitem__(self, item):
         return self._level[item]
 
+    @property
+    def version(self):
+        return self._version
+
+    def touch(self):
+        self._version += 1
+
+    def clear(self):
+        self._level[...] = 0
+        self.touch()
+
+    def _scaled(self, tick: float, out: "np.ndarray") -> "np.ndarray":
+        raise NotImplementedError
+
     def __call__(self,
                  WM: "np.ndarray",
                  BM: "np.ndarray",
@@ -23,17 +98,32 @@ class ControlLayer(metaclass=ABCMeta):
                  tick: float) -> tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
         return self._tick(WM, BM, SVX, SVY, tick)
 
+    def accumulate(self,
+                   acc: "Accumulator",
+                   WM: "np.ndarray",
+                   BM: "np.ndarray",
+                   SVX: "np.ndarray",
+                   SVY: "np.ndarray",
+                   tick: float):
+        # adapter for layers that only implement the tuple returning _tick
+        for field, d in zip(Accumulator.FIELDS, self(WM, BM, SVX, SVY, tick)):
+            if field in self.FIELDS and d is not self.ZERO:
+                dst = acc[field]
+                dst += d
+
     @abstractmethod
     def _tick(self, *args, **kwargs) -> tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
         pass
 
 
 class FillsLayer(ControlLayer, ABC):
-    def setFill(self, x, y, fill):
-        self._level[y, x] = fill
+    def setFill(self, x, y, fill, member=...):
+        self._level[member, y, x] = fill
+        self.touch()
 
-    def removeFill(self, x, y):
-        self._level[y, x] = self.ZERO
+    def removeFill(self, x, y, member=...):
+        self._level[member, y, x] = self.ZERO
+        self.touch()
 
     def __call__(self,
                  WM: "np.ndarray",
@@ -45,11 +135,13 @@ class FillsLayer(ControlLayer, ABC):
 
 
 class DrainLayer(ControlLayer, ABC):
-    def setDrain(self, x, y, drain):
-        self._level[y, x] = drain
+    def setDrain(self, x, y, drain, member=...):
+        self._level[member, y, x] = drain
+        self.touch()
 
-    def removeDrain(self, x, y):
-        self._level[y, x] = self.ZERO
+    def removeDrain(self, x, y, member=...):
+        self._level[member, y, x] = self.ZERO
+        self.touch()
 
     def __call__(self,
                  WM: "np.ndarray",
@@ -60,76 +152,560 @@ class DrainLayer(ControlLayer, ABC):
         drain, db, dvx, dvy = self._tick(WM, BM, SVX, SVY, tick=tick)
         return np.where(WM > drain, -drain, -WM), db, dvx, dvy
 
+    @staticmethod
+    def _drainInto(acc: "Accumulator", WM: "np.ndarray", drain: "np.ndarray"):
+        np.minimum(WM, drain, out=acc.tmp)
+        np.subtract(acc.dW, acc.tmp, out=acc.dW)
+
+
+class SparseLayer(ControlLayer, ABC):
+    # keeps only the set cells: sorted flat indices into the (members, y, x) field and one value per index
+    def __init__(self, x, y, members: int = None, dtype=np.float64):
+        self._x, self._y, self._members = x, y, members
+        self._index = np.zeros(0, dtype=np.int64)
+        self._level = np.zeros(0, dtype=dtype)
+        self.ZERO = self._level.dtype.type(0)
+        self._version = 0
+
+    @property
+    def shape(self):
+        return (self._y, self._x) if self._members is None else (self._members, self._y, self._x)
+
+    @property
+    def index(self):
+        return self._index
+
+    def dense(self) -> "np.ndarray":
+        out = np.zeros(self.shape, dtype=self._level.dtype)
+        out.reshape(-1)[self._index] = self._level
+        return out
+
+    def _view(self, a: "np.ndarray") -> "np.ndarray":
+        # a field as rows the flat indices address, one per member for a layer without members in an ensemble
+        return a.reshape(-1, self._y * self._x if self._members is None else self._members * self._y * self._x)
+
+    def _flat(self, x, y, member=...):
+        ys, xs = np.arange(self._y)[y], np.arange(self._x)[x]
+        if isinstance(x, slice) or isinstance(y, slice):
+            ys, xs = np.broadcast_arrays(np.atleast_1d(ys)[:, None], np.atleast_1d(xs)[None, :])
+        flat = np.ravel_multi_index(np.broadcast_arrays(ys, xs), (self._y, self._x))
+        if self._members is None:
+            return flat
+        ms = np.atleast_1d(np.arange(self._members)[member])
+        return ms.reshape(-1, *[1] * np.ndim(flat)) * (self._y * self._x) + flat
+
+    def _set(self, x, y, value, member=...):
+        flat = self._flat(x, y, member)
+        value = np.broadcast_to(np.asarray(value, dtype=self._level.dtype), flat.shape)
+        # new values win over old ones at the same index, zeros drop the index
+        index = np.concatenate([flat.ravel()[::-1], self._index])
+        level = np.concatenate([value.ravel()[::-1], self._level])
+        index, first = np.unique(index, return_index=True)
+        level = level[first]
+        keep = level != 0
+        self._index, self._level = index[keep], level[keep]
+        self.touch()
+
+    def clear(self):
+        self._index, self._level = self._index[:0], self._level[:0]
+        self.touch()
+
+    def __call__(self,
+                 WM: "np.ndarray",
+                 BM: "np.ndarray",
+                 SVX: "np.ndarray",
+                 SVY: "np.ndarray",
+                 tick: float) -> tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+        acc = Accumulator(np.zeros(WM.shape, dtype=WM.dtype), None, None, None, None, cache=False)
+        self.accumulate(acc, WM, BM, SVX, SVY, tick=tick)
+        return acc.dW, self.ZERO, self.ZERO, self.ZERO
+
+    def _tick(self, *args, **kwargs):
+        return self(*args, **kwargs)
+
+
+class SparseFillsLayer(SparseLayer, ABC):
+    def setFill(self, x, y, fill, member=...):
+        self._set(x, y, fill, member)
+
+    def removeFill(self, x, y, member=...):
+        self._set(x, y, self.ZERO, member)
+
+
+class SparseDrainLayer(SparseLayer, ABC):
+    def setDrain(self, x, y, drain, member=...):
+        self._set(x, y, drain, member)
+
+    def removeDrain(self, x, y, member=...):
+        self._set(x, y, self.ZERO, member)
+
+    def _drainInto(self, acc: "Accumulator", WM: "np.ndarray", drain: "np.ndarray"):
+        # the clamp against the available water only looks at the drained cells
+        self._view(acc.dW)[:, self._index] -= np.minimum(self._view(WM)[:, self._index], drain)
+
+
+def _clusters(tiles: "np.ndarray") -> list[list[int]]:
+    # bounding boxes [i0, i1, j0, j1] of the 4-connected clusters of set tiles, overlapping boxes merged
+    seen, (ty, tx), boxes = ~tiles, tiles.shape, []
+    for i, j in zip(*np.nonzero(tiles)):
+        if seen[i, j]:
+            continue
+        seen[i, j] = True
+        stack, box = [(i, j)], [i, i + 1, j, j + 1]
+        while stack:
+            a, b = stack.pop()
+            box = [min(box[0], a), max(box[1], a + 1), min(box[2], b), max(box[3], b + 1)]
+            for c, d in ((a - 1, b), (a + 1, b), (a, b - 1), (a, b + 1)):
+                if 0 <= c < ty and 0 <= d < tx and not seen[c, d]:
+                    seen[c, d] = True
+                    stack.append((c, d))
+        boxes.append(box)
+    merged = True
+    while merged:
+        merged = False
+        for a in range(len(boxes)):
+            for b in range(a + 1, len(boxes)):
+                p, q = boxes[a], boxes[b]
+                if p[0] < q[1] and q[0] < p[1] and p[2] < q[3] and q[2] < p[3]:
+                    boxes[a] = [min(p[0], q[0]), max(p[1], q[1]), min(p[2], q[2]), max(p[3], q[3])]
+                    del boxes[b]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
 
 class Basin:
-    def __init__(self, x: int, y: int, eta: float = 0.5, maxElv: float = 10.0):
+    # red-black gauss-seidel and multigrid were tried and dropped, the downhill masks switch between sweeps and
+    # neither reached a given error in fewer sweeps than jacobi without rescaling the grid's mass
+    SOLVERS = "jacobi",
+    BACKENDS = "numpy", "numba"
+
+    def __init__(self,
+                 x: int,
+                 y: int,
+                 eta: float = 0.5,
+                 maxElv: float = 10.0,
+                 solver: str = "jacobi",
+                 maxIter: int = 32,
+                 tol: float = None,
+                 backend: str = "numpy",
+                 tileSize: int = None,
+                 dtype=np.float64,
+                 accDtype=None,
+                 cacheLayers: bool = True,
+                 fuseSources: bool = False,
+                 _fields: dict[str, "np.ndarray"] = None):
+        if solver not in self.SOLVERS:
+            raise ValueError(f"unknown solver {solver!r}, expected one of {self.SOLVERS}")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"unknown backend {backend!r}, expected one of {self.BACKENDS}")
+        if backend == "numba" and not jit.AVAILABLE:
+            warnings.warn("numba is not installed, falling back to the numpy backend", RuntimeWarning)
+            backend = "numpy"
+        self._jit = backend == "numba"
         self._x, self._y = x, y
         self._eta = eta
         self._maxElv = maxElv
+        # tol ends a solve once no cell changes by more than it in an iteration, which needs the downhill masks to
+        # settle: on slopes they do within a few iterations, where water ponds they keep flipping and every solve
+        # runs to maxIter
+        self._solver, self._maxIter, self._tol = solver, maxIter, tol
+        self._iterations, self._residual = 0, np.inf
+        self._tileSize, self._active, self._wet, self._sourceTiles = tileSize, None, None, {}
+        self._time, self._ticks = 0., 0
+        self._prevWM = None
+        self._profiler = None
+        self._terrain = None
+        self._hooks: list = []
         self._layers: list["ControlLayer"] = []
-
-        self._BM = np.zeros((self._y, self._x), dtype=np.float64)
-        self._WM = np.zeros((self._y, self._x), dtype=np.float64)
-        self._SVX = np.zeros((2, self._y, self._x), dtype=np.float64)
-        self._SVY = np.zeros((2, self._y, self._x), dtype=np.float64)
-
-        self._dB = np.zeros_like(self._BM)
-        self._dW = np.zeros_like(self._WM)
-        self._dSVX = np.zeros_like(self._SVX)
-        self._dSVY = np.zeros_like(self._SVY)
+        self._fields: tuple[str, ...] = ()
+        self._fuseSources = fuseSources
+
+        self._allocate(dtype, accDtype, cacheLayers, _fields or {})
+
+    def _allocate(self, dtype, accDtype, cacheLayers, fields):
+        *n, y, x = self._fieldShape()
+        self._BM = self._field(fields, "BM", self._elevationShape(), dtype)
+        self._WM = self._field(fields, "WM", (*n, y, x), dtype)
+        self._SVX = self._field(fields, "SVX", (*n, 2, y, x), dtype)
+        self._SVY = self._field(fields, "SVY", (*n, 2, y, x), dtype)
+
+        # layer contributions and mass sums may accumulate in a wider type than the stored fields
+        self._accDtype = np.dtype(accDtype or dtype)
+        self._dB = np.zeros(self._BM.shape, dtype=self._accDtype)
+        self._dW = np.zeros(self._WM.shape, dtype=self._accDtype)
+        self._dSVX = np.zeros(self._SVX.shape, dtype=self._accDtype)
+        self._dSVY = np.zeros(self._SVY.shape, dtype=self._accDtype)
+
+        self._nWM = np.zeros(self._WM.shape, dtype=dtype)
+        self._tWM = np.zeros(self._WM.shape, dtype=dtype)
+        self._ws = Workspace(self._WM.shape, self._WM.dtype)
+        self._acc = Accumulator(self._dW, self._dB, self._dSVX, self._dSVY, self._ws.l, cacheLayers, self._jit)
+
+    @staticmethod
+    def _field(fields: dict[str, "np.ndarray"], name: str, shape: tuple[int, ...], dtype) -> "np.ndarray":
+        # fields holds the arrays a restore hands in, they take the place of fresh zeros
+        return fields[name] if name in fields else np.zeros(shape, dtype=dtype)
 
     def __getitem__(self, item):
         return self._WM[item]
 
+    def _fieldShape(self) -> tuple[int, ...]:
+        return self._y, self._x
+
+    def _elevationShape(self) -> tuple[int, ...]:
+        return self._y, self._x
+
     @property
     def BM(self):
         return self._BM
 
+    @property
+    def dtype(self):
+        return self._WM.dtype
+
+    def mass(self):
+        return self._WM.sum(axis=(-2, -1), dtype=self._accDtype)
+
+    @property
+    def backend(self):
+        return "numba" if self._jit else "numpy"
+
+    @property
+    def time(self):
+        return self._time
+
+    @property
+    def ticks(self):
+        return self._ticks
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def iterations(self):
+        return self._iterations
+
+    @property
+    def residual(self):
+        return self._residual
+
     def setElevation(self, x, y, elevation):
-        self._BM[y, x] = np.minimum(elevation, self._maxElv)
+        self._BM[..., y, x] = np.minimum(elevation, self._maxElv)
+        self._edited(x, y)
 
     def addElevation(self, x, y, elevation):
-        self._BM[y, x] += elevation
+        self._BM[..., y, x] += elevation
         self._BM[self._BM < 0] = 0
         self._BM[self._BM > self._maxElv] = self._maxElv
+        self._edited(x, y)
+
+    def _edited(self, x=slice(None), y=slice(None)):
+        if self._terrain is not None:
+            self._terrain.invalidate(x, y)
+
+    @property
+    def terrain(self) -> "Terrain":
+        # built on first use, then brought up to date with the elevation edits since the last use
+        if self._terrain is None:
+            self._terrain = Terrain(self._BM)
+        return self._terrain.update(self._BM)
 
     def setVelL(self, x, y, vel):
-        self._SVX[0, y, x] = vel
+        self._SVX[..., 0, y, x] = vel
 
     def setVelR(self, x, y, vel):
-        self._SVX[1, y, x] = vel
+        self._SVX[..., 1, y, x] = vel
 
     def setVelU(self, x, y, vel):
-        self._SVY[0, y, x] = vel
+        self._SVY[..., 0, y, x] = vel
 
     def setVelD(self, x, y, vel):
-        self._SVY[1, y, x] = vel
+        self._SVY[..., 1, y, x] = vel
+
+    def _config(self) -> dict:
+        # constructor arguments that rebuild an equivalent basin
+        return dict(x=self._x, y=self._y, eta=self._eta, maxElv=self._maxElv, solver=self._solver,
+                    maxIter=self._maxIter, tol=self._tol, backend=self.backend,
+                    tileSize=self._tileSize, dtype=self.dtype.str, accDtype=self._accDtype.str,
+                    cacheLayers=self._acc._cache is not None, fuseSources=self._fuseSources)
+
+    def _adopt(self, field: str, array: "np.ndarray"):
+        setattr(self, f"_{field}", array)
+        self._wet = None
+
+    def _snapshot(self) -> tuple[dict, dict]:
+        # state a subclass checkpoints beyond fields and layers, as a json-able dict and named arrays
+        return {}, {}
+
+    def _restore(self, extra: dict, array):
+        # array(name) loads one of the arrays _snapshot named
+        pass
+
+    def checkpoint(self, path: str, background: bool = False):
+        return checkpoint.save(self, path, background)
+
+    @classmethod
+    def restore(cls, path: str) -> "Basin":
+        return checkpoint.load(path, cls)
+
+    def profile(self, sink=None, every: int = 1, memory: bool = False) -> "Profiler":
+        self.unprofile()
+        self._profiler = Profiler(sink, every, memory).attach(self)
+        return self._profiler
+
+    def unprofile(self):
+        if self._profiler is not None:
+            self._profiler.detach()
+            self._profiler = None
+
+    def addHook(self, hook):
+        self._hooks.append(hook)
+
+    def removeHook(self, hook):
+        self._hooks.remove(hook)
 
     def addLayer(self, layer: ControlLayer):
         assert isinstance(layer, ControlLayer)
         self._layers.append(layer)
+        self._fields = tuple(f for f in Accumulator.FIELDS if any(f in lay.FIELDS for lay in self._layers))
 
     def diffuse(self, dex, ndex, tick):
-        return (dex + tick * surr(self._BM, ndex)) / (1 + tick)
+        # returns a new array, the solvers go through _diffuse, which updates their ndex in place
+        return self._diffuse(self._BM, self._ws, dex, ndex.copy(), tick)
+
+    def _diffuse(self, e, ws, dex, ndex, tick):
+        if self._jit:
+            return jit.diffuse(e, dex, ndex, tick, ws.t)
+        s = surr(e, ndex, out=ndex, ws=ws)
+        np.multiply(s, tick, out=s)
+        np.add(s, dex, out=s)
+        return np.divide(s, 1 + tick, out=s)
+
+    def solve(self, dex, out, tick, win=(...,)):
+        e, ws, tmp = self._BM[win], self._ws.view(dex.shape), self._tWM[win]
+        if self._jit:
+            np.copyto(out, dex)
+            tol = -1. if self._tol is None else self._tol
+            self._iterations, self._residual = jit.jacobi(e, dex, out, tick, self._maxIter, tol, ws.t)
+            return out
+        foo = lambda _dex, ndex: self._diffuse(e, ws, _dex, ndex, tick)
+        ndex, self._iterations, self._residual = jacobi_solver(foo, dex, self._maxIter, self._tol, out=out, tmp=tmp)
+        return ndex
+
+    def _spread(self):
+        # how many cells water can travel in one tick
+        return self._maxIter + 1
+
+    def _scan(self, win=(..., slice(None), slice(None))):
+        # per tile of the tile aligned window, whether any of its cells holds water
+        ts, WM = self._tileSize, self._WM[win]
+        wet = np.not_equal(WM, 0, out=self._ws.l[win])
+        if wet.ndim > 2:
+            wet = wet.any(axis=tuple(range(wet.ndim - 2)))
+        tiles = np.logical_or.reduceat(wet, np.arange(0, wet.shape[0], ts), axis=0)
+        return np.logical_or.reduceat(tiles, np.arange(0, wet.shape[1], ts), axis=1)
+
+    def _touched(self, win=(..., slice(None), slice(None))):
+        # water was written into win outside the flow, its tiles are rescanned
+        if self._wet is None:
+            return
+        ts = self._tileSize
+        (y0, y1, _), (x0, x1, _) = win[-2].indices(self._y), win[-1].indices(self._x)
+        rows, cols = slice(y0 // ts, -(-y1 // ts)), slice(x0 // ts, -(-x1 // ts))
+        self._wet[rows, cols] |= self._scan((..., slice(rows.start * ts, rows.stop * ts),
+                                             slice(cols.start * ts, cols.stop * ts)))
+
+    def _layerTiles(self):
+        # tiles where a layer may add water, from where the filling layers are set, cached per layer version, None
+        # if a layer of unknown kind adds water
+        ts, shape = self._tileSize, self._wet.shape
+        tiles = np.zeros(shape, dtype=bool)
+        for layer in self._layers:
+            if "W" not in layer.FIELDS or isinstance(layer, (DrainLayer, SparseDrainLayer)):
+                continue
+            if not isinstance(layer, (FillsLayer, SparseLayer)):
+                return None
+            version, cached = self._sourceTiles.get(id(layer), (None, None))
+            if version != layer._version:
+                if isinstance(layer, SparseLayer):
+                    ys, xs = np.divmod(layer.index % (self._y * self._x), self._x)
+                    cached = np.zeros(shape, dtype=bool)
+                    cached[ys // ts, xs // ts] = True
+                else:
+                    set_ = np.not_equal(layer[...], 0)
+                    if set_.ndim > 2:
+                        set_ = set_.any(axis=tuple(range(set_.ndim - 2)))
+                    cached = np.logical_or.reduceat(set_, np.arange(0, self._y, ts), axis=0)
+                    cached = np.logical_or.reduceat(cached, np.arange(0, self._x, ts), axis=1)
+                self._sourceTiles[id(layer)] = layer._version, cached
+            tiles |= cached
+        return tiles
+
+    def _activeWindows(self):
+        # tile aligned windows around the wet tiles grown by the spread, one per cluster of them, the wet tiles are
+        # carried from tick to tick: rescanned inside the windows after the flow, and marked where layers add water
+        spread = self._spread()
+        if self._tileSize is None:
+            return [(...,)]
+        ts = self._tileSize
+        if self._wet is None:
+            self._wet = np.zeros((-(-self._y // ts), -(-self._x // ts)), dtype=bool)
+            tiles = self._scan()
+        else:
+            tiles = self._layerTiles()
+            tiles = self._scan() if tiles is None else tiles | self._wet
+        # window edges must stay dry for the whole tick so the halo can be treated as a wall
+        r = -(-(spread + 1) // ts)
+        for axis in (0, 1):
+            grown = tiles.copy()
+            for i in range(1, r + 1):
+                if axis == 0:
+                    grown[i:] |= tiles[:-i]
+                    grown[:-i] |= tiles[i:]
+                else:
+                    grown[:, i:] |= tiles[:, :-i]
+                    grown[:, :-i] |= tiles[:, i:]
+            tiles = grown
+        self._active = tiles
+        return [(..., slice(i0 * ts, i1 * ts), slice(j0 * ts, j1 * ts)) for i0, i1, j0, j1 in _clusters(tiles)]
 
     def tick(self, tick: float = 1):
-        self._dW.fill(0)
-        self._dB.fill(0)
-        self._dSVX.fill(0)
-        self._dSVY.fill(0)
-        tick *= self._eta
-
-        for layer in self._layers:
-            dw, db, vx, vy = layer(self._WM, self._BM, self._SVX, self._SVY, tick)
-            self._dW += dw
-            self._dB += db
-            self._dSVX += vx
-            self._dSVY += vy
-        self._BM += self._dB
-        self._WM += self._dW
-        self._SVX += self._dSVX
-        self._SVY += self._dSVY
+        self._step(tick, self._time + tick)
 
+    def _step(self, tick, time):
+        self._time = time
+        self._ticks += 1
+        tick *= self._eta
+        self._applyLayers(tick)
+        self._boundaries()
+        self._flow(tick)
+        for hook in self._hooks:
+            hook(self)
+
+    def stableStep(self, dtMax: float, cfl: float = 0.5) -> float:
+        # velAct moves w * v * tick * eta out of every wet cell, which stays non-negative while that is at most w
+        t, wet = self._ws.t, np.greater(self._WM, 0, out=self._ws.l)
+        np.add(self._SVX[..., 0, :, :], self._SVX[..., 1, :, :], out=t)
+        np.add(t, self._SVY[..., 0, :, :], out=t)
+        np.add(t, self._SVY[..., 1, :, :], out=t)
+        v = float(np.max(t, where=wet, initial=0)) * self._eta
+        return dtMax if v * dtMax <= cfl else cfl / v
+
+    def run(self,
+            until: float,
+            dtMax: float = 1.0,
+            dtMin: float = 1e-3,
+            cfl: float = 0.5,
+            maxRise: float = None,
+            outputs=(),
+            callback=None) -> int:
+        # steps from the current time to until, each step is bounded by the velocity criterion and, given maxRise,
+        # grown or shrunk so that no cell's depth changes by more than maxRise, output times are hit exactly, dtMin
+        # only bounds the maxRise adaption, the velocity criterion wins over it with a warning
+        outputs = {float(t) for t in outputs if self._time < t <= until}
+        targets = sorted(outputs | {float(until)})
+        if maxRise is not None and self._prevWM is None:
+            self._prevWM = np.empty_like(self._WM)
+        dt, steps, warned = dtMax, 0, False
+        for target in targets:
+            while self._time < target:
+                stable = self.stableStep(dtMax, cfl)
+                if stable < dtMin and not warned:
+                    warnings.warn(f"velocities need steps of {stable:g}, below dtMin={dtMin:g}", RuntimeWarning)
+                    warned = True
+                step = min(stable, dt)
+                remaining = target - self._time
+                if remaining <= step:
+                    step = remaining
+                elif remaining < 2 * step:
+                    step = remaining / 2
+                if maxRise is not None:
+                    np.copyto(self._prevWM, self._WM)
+                self._step(step, target if step == remaining else self._time + step)
+                steps += 1
+                if maxRise is not None:
+                    np.subtract(self._WM, self._prevWM, out=self._prevWM)
+                    rise = float(np.abs(self._prevWM, out=self._prevWM).max(initial=0))
+                    dt = step * 2 if rise == 0 else step * min(2., 0.9 * maxRise / rise)
+                    dt = min(max(dt, dtMin), dtMax)
+            if callback is not None and target in outputs:
+                callback(self)
+        return steps
+
+    def fastForward(self, duration: float, rate=None):
+        # jumps duration ahead under steady rain without ticking: the water in the basin and the rain falling meanwhile
+        # settle on the terrain at once, velocities and drains are left out, rate is the rain depth per unit of time
+        # and defaults to the source layers
+        if rate is None:
+            sources = [layer for layer in self._layers if layer.SOURCE]
+            rate = self._acc.fused(sources, self._eta) if sources else 0
+        self._WM[...] = self._settle(self._WM + np.multiply(rate, duration))
+        self._touched()
+        self._time += duration
+
+    def _settle(self, volume):
+        return self.terrain.settle(volume)
+
+    def _boundaries(self):
         zeroBoundAdjust(self._SVX, self._SVY)
-        self._WM += velAct(self._BM, self._WM, self._SVX, self._SVY, tick)
-        self._WM = gauss_seidel_solver(lambda dex, ndex: self.diffuse(dex, ndex, tick), self._WM)
+
+    def _accumulate(self, acc, layers, WM, BM, SVX, SVY, tick):
+        for field in self._fields:
+            acc[field].fill(0)
+        if self._fuseSources:
+            sources = [layer for layer in layers if layer.SOURCE]
+            if sources:
+                np.add(acc.dW, acc.fused(sources, tick), out=acc.dW)
+                layers = [layer for layer in layers if not layer.SOURCE]
+        for layer in layers:
+            layer.accumulate(acc, WM, BM, SVX, SVY, tick=tick)
+
+    def _applyLayers(self, tick):
+        fields = self._fields
+        self._accumulate(self._acc, self._layers, self._WM, self._BM, self._SVX, self._SVY, tick)
+        if "B" in fields:
+            self._edited()
+        if self._jit and len(fields) == len(Accumulator.FIELDS):
+            jit.apply(self._BM, self._dB, self._WM, self._dW, self._SVX, self._dSVX, self._SVY, self._dSVY)
+            return
+        if "B" in fields:
+            self._BM += self._dB
+        if "W" in fields:
+            self._WM += self._dW
+        if "SVX" in fields:
+            self._SVX += self._dSVX
+        if "SVY" in fields:
+            self._SVY += self._dSVY
+
+    def _advect(self, windows, tick):
+        for win in windows:
+            WM = self._WM[win]
+            if self._jit:
+                WM += jit.velAct(WM, self._SVX[win], self._SVY[win], tick, self._tWM[win])
+            else:
+                WM += velAct(self._BM[win], WM, self._SVX[win], self._SVY[win], tick,
+                             out=self._tWM[win], ws=self._ws.view(WM.shape))
+
+    def _flow(self, tick):
+        iterations, residual = 0, 0.
+        windows = self._activeWindows()
+        if not windows:
+            self._iterations, self._residual = 0, 0.
+        self._advect(windows, tick)
+        if windows == [(...,)]:
+            self._WM, self._nWM = self.solve(self._WM, self._nWM, tick), self._WM
+        else:
+            for win in windows:
+                self._WM[win] = self.solve(self._WM[win], self._nWM[win], tick, win)
+                iterations, residual = max(iterations, self._iterations), max(residual, self._residual)
+            self._iterations, self._residual = iterations, residual
+        if self._wet is not None:
+            self._wet[...] = False
+            ts = self._tileSize
+            for _, rows, cols in windows:
+                self._wet[rows.start // ts:-(-rows.stop // ts), cols.start // ts:-(-cols.stop // ts)] = self._scan(
+                    (..., rows, cols))
@@ -0,0 +1,153 @@
+import importlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# checkpoint layout:
+#   header.json         basin class and constructor arguments, scalar state and the layer stack
+#   <name>.npy          one raw array per field and per array attribute of a layer
+# arrays are restored as copy-on-write memory maps, so a restore only reads the pages that are touched
+# and any number of basins can be forked from one checkpoint without copying it
+
+FIELDS = "BM", "WM", "SVX", "SVY"
+STATE = "time", "ticks", "iterations", "residual"
+
+_pool = None
+
+# basin and layer classes from outside flosim that checkpoints may name, by the name they are saved under
+_registered: dict[str, type] = {}
+
+
+def register(cls: type) -> type:
+    # allows checkpointing a basin or layer class defined outside flosim, usable as a class decorator,
+    # the class has to be registered again in the process that restores it
+    _registered[f"{cls.__module__}:{cls.__qualname__}"] = cls
+    return cls
+
+
+def _flosim(module: str) -> bool:
+    return module == "flosim" or module.startswith("flosim.")
+
+
+def _name(cls) -> str:
+    name = f"{cls.__module__}:{cls.__qualname__}"
+    if not _flosim(cls.__module__) and _registered.get(name) is not cls:
+        raise TypeError(f"cannot checkpoint {cls.__qualname__}, classes from outside flosim must be registered "
+                        f"with flosim.checkpoint.register")
+    return name
+
+
+def _resolve(name: str, base: type):
+    # a checkpoint only ever names flosim's own basins and layers or registered classes, nothing else is
+    # imported or instantiated
+    module, qualname = name.split(":")
+    if name in _registered:
+        obj = _registered[name]
+    elif _flosim(module):
+        obj = importlib.import_module(module)
+        for part in qualname.split("."):
+            obj = getattr(obj, part)
+    else:
+        raise ValueError(f"checkpoint names {name}, which is neither a flosim class nor registered")
+    if not isinstance(obj, type) or not issubclass(obj, base):
+        raise ValueError(f"checkpoint names {name}, which is not a {base.__qualname__}")
+    return obj
+
+
+def _encode(value):
+    if isinstance(value, np.generic):
+        return {"dtype": value.dtype.str, "value": value.item()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"cannot checkpoint attribute of type {type(value).__name__}")
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return np.dtype(value["dtype"]).type(value["value"])
+    return value
+
+
+def snapshot(basin) -> tuple[dict, dict[str, "np.ndarray"]]:
+    # copies everything a checkpoint needs, so the basin may keep ticking while it is written
+    header = {"class": _name(type(basin)),
+              "config": basin._config(),
+              "state": {name: getattr(basin, f"_{name}") for name in STATE},
+              "layers": []}
+    arrays = {field: getattr(basin, f"_{field}").copy() for field in FIELDS}
+    for i, layer in enumerate(basin._layers):
+        entry = {"class": _name(type(layer)), "arrays": [], "attrs": {}}
+        for attr, value in vars(layer).items():
+            if callable(value):
+                continue
+            if isinstance(value, np.ndarray):
+                entry["arrays"].append(attr)
+                arrays[f"layer{i}{attr}"] = value.copy()
+            else:
+                entry["attrs"][attr] = _encode(value)
+        header["layers"].append(entry)
+    header["extra"], extra = basin._snapshot()
+    arrays.update((name, value.copy()) for name, value in extra.items())
+    return header, arrays
+
+
+def write(path: str, header: dict, arrays: dict[str, "np.ndarray"]):
+    # written next to the target and swapped in at the end, an interrupted write never clobbers a checkpoint
+    tmp, old = path + ".tmp", path + ".old"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, name + ".npy"), array)
+    with open(os.path.join(tmp, "header.json"), "w") as f:
+        json.dump(header, f)
+    if os.path.exists(path):
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def save(basin, path: str, background: bool = False):
+    global _pool
+    header, arrays = snapshot(basin)
+    if not background:
+        return write(path, header, arrays)
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=1)
+    return _pool.submit(write, path, header, arrays)
+
+
+def load(path: str, cls=None, config: dict = None):
+    # config overrides constructor arguments of the checkpointed basin
+    with open(os.path.join(path, "header.json")) as f:
+        header = json.load(f)
+    array = lambda name: np.load(os.path.join(path, name + ".npy"), mmap_mode="c")
+
+    from flosim.basin import Basin, ControlLayer
+    saved = _resolve(header["class"], Basin)
+    if cls is not None and not issubclass(saved, cls):
+        raise TypeError(f"checkpoint holds a {saved.__qualname__}, not a {cls.__qualname__}")
+    # the fields are handed to the constructor so the basin takes them instead of allocating its own,
+    # a basin that keeps them elsewhere leaves them to _adopt
+    fields = {field: array(field) for field in FIELDS}
+    basin = saved(**dict(header["config"], **(config or {})), _fields=fields)
+    for field, value in fields.items():
+        if getattr(basin, f"_{field}") is not value:
+            basin._adopt(field, value)
+    for name, value in header["state"].items():
+        setattr(basin, f"_{name}", value)
+    basin._restore(header.get("extra", {}), array)
+
+    for i, entry in enumerate(header["layers"]):
+        layerCls = _resolve(entry["class"], ControlLayer)
+        layer = layerCls.__new__(layerCls)
+        for attr, value in entry["attrs"].items():
+            setattr(layer, attr, _decode(value))
+        for attr in entry["arrays"]:
+            setattr(layer, attr, array(f"layer{i}{attr}"))
+        basin.addLayer(layer)
+    return basin
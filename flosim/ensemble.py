@@ -0,0 +1,80 @@
+import numpy as np
+
+from flosim.basin import Basin
+from flosim.terrain import Terrain
+
+
+class EnsembleBasin(Basin):
+    def __init__(self, members: int, x: int, y: int, sharedElevation: bool = True, **kwargs):
+        if kwargs.get("backend", "numpy") != "numpy":
+            raise ValueError("EnsembleBasin only supports the numpy backend")
+        self._members = members
+        self._sharedElevation = sharedElevation
+        super().__init__(x, y, **kwargs)
+
+    def _fieldShape(self) -> tuple[int, ...]:
+        return self._members, self._y, self._x
+
+    def _elevationShape(self) -> tuple[int, ...]:
+        return (self._y, self._x) if self._sharedElevation else (self._members, self._y, self._x)
+
+    def _config(self) -> dict:
+        return dict(super()._config(), members=self._members, sharedElevation=self._sharedElevation)
+
+    @property
+    def members(self):
+        return self._members
+
+    def setElevation(self, x, y, elevation, member=...):
+        if self._sharedElevation and member is not ...:
+            raise ValueError("elevation is shared by all members")
+        self._BM[member, y, x] = np.minimum(elevation, self._maxElv)
+        self._edited(x, y, member)
+
+    def addElevation(self, x, y, elevation, member=...):
+        if self._sharedElevation and member is not ...:
+            raise ValueError("elevation is shared by all members")
+        self._BM[member, y, x] += elevation
+        self._BM[self._BM < 0] = 0
+        self._BM[self._BM > self._maxElv] = self._maxElv
+        self._edited(x, y, member)
+
+    def _edited(self, x=slice(None), y=slice(None), member=...):
+        if self._sharedElevation or self._terrain is None:
+            return super()._edited(x, y)
+        for m in np.atleast_1d(np.arange(self._members)[member]):
+            if self._terrain[m] is not None:
+                self._terrain[m].invalidate(x, y)
+
+    @property
+    def terrain(self) -> "Terrain":
+        if not self._sharedElevation:
+            raise ValueError("members have their own elevation, use memberTerrain(member)")
+        return super().terrain
+
+    def memberTerrain(self, member: int) -> "Terrain":
+        # with per member elevation every member keeps its own terrain, built on first use
+        if self._sharedElevation:
+            return self.terrain
+        if self._terrain is None:
+            self._terrain = [None] * self._members
+        if self._terrain[member] is None:
+            self._terrain[member] = Terrain(self._BM[member])
+        return self._terrain[member].update(self._BM[member])
+
+    def _settle(self, volume):
+        if self._sharedElevation:
+            return super()._settle(volume)
+        return np.stack([self.memberTerrain(m).settle(volume[m]) for m in range(self._members)])
+
+    def setVelL(self, x, y, vel, member=...):
+        self._SVX[member, 0, y, x] = vel
+
+    def setVelR(self, x, y, vel, member=...):
+        self._SVX[member, 1, y, x] = vel
+
+    def setVelU(self, x, y, vel, member=...):
+        self._SVY[member, 0, y, x] = vel
+
+    def setVelD(self, x, y, vel, member=...):
+        self._SVY[member, 1, y, x] = vel
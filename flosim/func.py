@@ -1,39 +1,139 @@
 import numpy as np
 
 
+class Workspace:
+    # scratch buffers of the kernels named, a kernel only finds its own buffers set
+    KERNELS = "surr", "velAct"
+
+    def __init__(self, shape: tuple[int, ...], dtype=np.float64, kernels: tuple[str, ...] = KERNELS):
+        *n, y, x = shape
+        self.h = self.l = self.r = self.u = self.d = self.c = self.q = self.fx = self.fy = None
+        if "surr" in kernels:
+            self.h = np.full((*n, y + 2, x + 2), np.inf, dtype=dtype)
+            self.l, self.r, self.u, self.d = np.empty((4, *n, y, x), dtype=bool)
+            self.c = np.empty((*n, y, x), dtype=np.int8)
+            self.q = np.empty((*n, y, x), dtype=dtype)
+        self.t = np.empty((*n, y, x), dtype=dtype)
+        if "velAct" in kernels:
+            self.fx = np.empty((*n, 2, y, x), dtype=dtype)
+            self.fy = np.empty((*n, 2, y, x), dtype=dtype)
+
+    def view(self, shape: tuple[int, ...]) -> "Workspace":
+        if shape == self.t.shape:
+            return self
+        y, x = shape[-2:]
+        ws = Workspace.__new__(Workspace)
+        ws.h = None if self.h is None else self.h[..., :y + 2, :x + 2]
+        if ws.h is not None:
+            ws.h[..., y + 1, :] = np.inf
+            ws.h[..., :, x + 1] = np.inf
+        ws.l, ws.r, ws.u, ws.d, ws.c, ws.q, ws.t, ws.fx, ws.fy = \
+            (None if a is None else a[..., :y, :x] for a in (self.l, self.r, self.u, self.d, self.c, self.q, self.t,
+                                                              self.fx, self.fy))
+        return ws
+
+
 def zeroBoundAdjust(SVX: "np.ndarray", SVY: "np.ndarray"):
     pass
 
 
-def gauss_seidel_solver(foo, dex: "np.ndarray", n=32) -> "np.ndarray":
-    ndex = dex.copy()
-    for _ in range(n):
+def gauss_seidel_solver(foo, dex: "np.ndarray", n=32, out: "np.ndarray" = None) -> "np.ndarray":
+    return jacobi_solver(foo, dex, n, out=out)[0]
+
+
+# the solver returns (solution, iterations, residual), the residual being the max-norm of the last update
+
+
+def jacobi_solver(foo,
+                  dex: "np.ndarray",
+                  n=32,
+                  tol: float = None,
+                  out: "np.ndarray" = None,
+                  tmp: "np.ndarray" = None) -> tuple["np.ndarray", int, float]:
+    ndex = _init(dex, out)
+    res = np.inf
+    for i in range(n):
+        check = tol is not None or i == n - 1
+        if check:
+            tmp = _copy(ndex, tmp)
         ndex = foo(dex, ndex)
-    return ndex
-
-
-def surr(e: "np.ndarray", w: "np.ndarray") -> "np.ndarray":
-    h = np.pad(e + w, ((1, 1), (1, 1)), 'constant', constant_values=float("inf"))
-    lr = h[:, :-1] - h[:, 1:]
-    ud = h[:-1, :] - h[1:, :]
-    l = lr[1:-1, :-1] <= 0
-    r = lr[1:-1, 1:] >= 0
-    u = ud[:-1, 1:-1] <= 0
-    d = ud[1:, 1:-1] >= 0
-
-    s = np.pad((w * l)[:, 1:], ((0, 0), (0, 1))) / 4 + \
-        np.pad((w * r)[:, :-1], ((0, 0), (1, 0))) / 4 + \
-        np.pad((w * u)[1:, :], ((0, 1), (0, 0))) / 4 + \
-        np.pad((w * d)[:-1, :], ((1, 0), (0, 0))) / 4
-    agr = 4 - (l.astype(np.int8) + r.astype(np.int8) + u.astype(np.int8) + d.astype(np.int8))
-    return s + agr * w / 4
-
-
-def velAct(e: "np.ndarray", w: "np.ndarray", vx: "np.ndarray", vy: "np.ndarray", k: float) -> "np.ndarray":
-    fx = w * vx * k
-    fy = w * vy * k
-    l = np.pad(fx[0, :, 1:], ((0, 0), (0, 1)))
-    r = np.pad(fx[1, :, :-1], ((0, 0), (1, 0)))
-    u = np.pad(fy[0, 1:], ((0, 1), (0, 0)))
-    d = np.pad(fy[1, :-1], ((1, 0), (0, 0)))
-    return l + r + u + d - fx.sum(axis=0) - fy.sum(axis=0)
+        if check:
+            np.subtract(ndex, tmp, out=tmp)
+            res = float(np.abs(tmp, out=tmp).max(initial=0))
+            if tol is not None and res <= tol:
+                return ndex, i + 1, res
+    return ndex, n, res
+
+
+def _init(dex, out):
+    if out is None:
+        return dex.copy()
+    np.copyto(out, dex)
+    return out
+
+
+def _copy(src, dst):
+    if dst is None:
+        return src.copy()
+    np.copyto(dst, src)
+    return dst
+
+
+def surr(e: "np.ndarray", w: "np.ndarray", out: "np.ndarray" = None, ws: "Workspace" = None) -> "np.ndarray":
+    # w is fully consumed before out is written, so out may alias w
+    if ws is None:
+        ws = Workspace(w.shape, w.dtype, ("surr",))
+    if out is None:
+        out = np.empty_like(w)
+    h, l, r, u, d, c, q, t = ws.h, ws.l, ws.r, ws.u, ws.d, ws.c, ws.q, ws.t
+    hc = h[..., 1:-1, 1:-1]
+    np.add(e, w, out=hc)
+    np.less_equal(h[..., 1:-1, :-2], hc, out=l)
+    np.less_equal(h[..., 1:-1, 2:], hc, out=r)
+    np.less_equal(h[..., :-2, 1:-1], hc, out=u)
+    np.less_equal(h[..., 2:, 1:-1], hc, out=d)
+    np.multiply(w, 0.25, out=q)
+
+    np.multiply(q[..., 1:], l[..., 1:], out=out[..., :-1])
+    out[..., -1] = 0
+    np.multiply(q[..., :-1], r[..., :-1], out=t[..., 1:])
+    np.add(out[..., 1:], t[..., 1:], out=out[..., 1:])
+    np.multiply(q[..., 1:, :], u[..., 1:, :], out=t[..., :-1, :])
+    np.add(out[..., :-1, :], t[..., :-1, :], out=out[..., :-1, :])
+    np.multiply(q[..., :-1, :], d[..., :-1, :], out=t[..., 1:, :])
+    np.add(out[..., 1:, :], t[..., 1:, :], out=out[..., 1:, :])
+
+    np.add(l, r, out=c, dtype=np.int8)
+    np.add(c, u, out=c)
+    np.add(c, d, out=c)
+    np.subtract(4, c, out=c)
+    np.multiply(c, q, out=t)
+    return np.add(out, t, out=out)
+
+
+def velAct(e: "np.ndarray",
+           w: "np.ndarray",
+           vx: "np.ndarray",
+           vy: "np.ndarray",
+           k: float,
+           out: "np.ndarray" = None,
+           ws: "Workspace" = None) -> "np.ndarray":
+    if ws is None:
+        ws = Workspace(w.shape, w.dtype, ("velAct",))
+    if out is None:
+        out = np.empty_like(w)
+    fx, fy, t = ws.fx, ws.fy, ws.t
+    np.multiply(w[..., None, :, :], vx, out=fx)
+    np.multiply(fx, k, out=fx)
+    np.multiply(w[..., None, :, :], vy, out=fy)
+    np.multiply(fy, k, out=fy)
+
+    out[..., :-1] = fx[..., 0, :, 1:]
+    out[..., -1] = 0
+    np.add(out[..., 1:], fx[..., 1, :, :-1], out=out[..., 1:])
+    np.add(out[..., :-1, :], fy[..., 0, 1:, :], out=out[..., :-1, :])
+    np.add(out[..., 1:, :], fy[..., 1, :-1, :], out=out[..., 1:, :])
+    np.add(fx[..., 0, :, :], fx[..., 1, :, :], out=t)
+    np.subtract(out, t, out=out)
+    np.add(fy[..., 0, :, :], fy[..., 1, :, :], out=t)
+    return np.subtract(out, t, out=out)
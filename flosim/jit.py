@@ -0,0 +1,310 @@
+import heapq
+
+import numpy as np
+
+try:
+    from numba import njit as _njit
+except ImportError:
+    _njit = None
+
+AVAILABLE = _njit is not None
+
+
+def _jit(foo):
+    return foo if _njit is None else _njit(cache=True)(foo)
+
+
+@_jit
+def surr(e, w, out):
+    y, x = w.shape
+    for i in range(y):
+        for j in range(x):
+            hc = e[i, j] + w[i, j]
+            cnt = 0
+            s = 0.
+            if j + 1 < x:
+                if e[i, j + 1] + w[i, j + 1] <= hc:
+                    cnt += 1
+                if hc <= e[i, j + 1] + w[i, j + 1]:
+                    s += w[i, j + 1] * 0.25
+            if j > 0:
+                if e[i, j - 1] + w[i, j - 1] <= hc:
+                    cnt += 1
+                if hc <= e[i, j - 1] + w[i, j - 1]:
+                    s += w[i, j - 1] * 0.25
+            if i + 1 < y:
+                if e[i + 1, j] + w[i + 1, j] <= hc:
+                    cnt += 1
+                if hc <= e[i + 1, j] + w[i + 1, j]:
+                    s += w[i + 1, j] * 0.25
+            if i > 0:
+                if e[i - 1, j] + w[i - 1, j] <= hc:
+                    cnt += 1
+                if hc <= e[i - 1, j] + w[i - 1, j]:
+                    s += w[i - 1, j] * 0.25
+            out[i, j] = s + (4 - cnt) * (w[i, j] * 0.25)
+    return out
+
+
+@_jit
+def velAct(w, vx, vy, k, out):
+    y, x = w.shape
+    for i in range(y):
+        for j in range(x):
+            s = 0.
+            if j + 1 < x:
+                s += w[i, j + 1] * vx[0, i, j + 1] * k
+            if j > 0:
+                s += w[i, j - 1] * vx[1, i, j - 1] * k
+            if i + 1 < y:
+                s += w[i + 1, j] * vy[0, i + 1, j] * k
+            if i > 0:
+                s += w[i - 1, j] * vy[1, i - 1, j] * k
+            s -= w[i, j] * vx[0, i, j] * k + w[i, j] * vx[1, i, j] * k
+            s -= w[i, j] * vy[0, i, j] * k + w[i, j] * vy[1, i, j] * k
+            out[i, j] = s
+    return out
+
+
+@_jit
+def diffuse(e, dex, ndex, k, tmp):
+    surr(e, ndex, tmp)
+    y, x = ndex.shape
+    for i in range(y):
+        for j in range(x):
+            ndex[i, j] = (tmp[i, j] * k + dex[i, j]) / (1 + k)
+    return ndex
+
+
+@_jit
+def jacobi(e, dex, ndex, k, n, tol, tmp):
+    y, x = ndex.shape
+    res = np.inf
+    for it in range(n):
+        surr(e, ndex, tmp)
+        res = 0.
+        for i in range(y):
+            for j in range(x):
+                v = (tmp[i, j] * k + dex[i, j]) / (1 + k)
+                res = max(res, abs(v - ndex[i, j]))
+                ndex[i, j] = v
+        if res <= tol:
+            return it + 1, res
+    return n, res
+
+
+# the built-in dense layers' accumulation, one pass over the grid each, products taken in the order numpy takes them
+
+
+@_jit
+def fill(dW, level, k):
+    y, x = dW.shape
+    for i in range(y):
+        for j in range(x):
+            dW[i, j] += level[i, j] * k
+
+
+@_jit
+def drain(dW, WM, level, a, b):
+    # drains level * a * b, no more than the water there is
+    y, x = dW.shape
+    for i in range(y):
+        for j in range(x):
+            dW[i, j] -= min(WM[i, j], level[i, j] * a * b)
+
+
+@_jit
+def reservoir(dW, WM, mask, height, k):
+    # tops the masked cells below height up by height * k
+    y, x = dW.shape
+    for i in range(y):
+        for j in range(x):
+            if mask[i, j] and WM[i, j] < height:
+                dW[i, j] += height * k
+
+
+@_jit
+def apply(BM, dB, WM, dW, SVX, dSVX, SVY, dSVY):
+    y, x = WM.shape
+    for i in range(y):
+        for j in range(x):
+            BM[i, j] += dB[i, j]
+            WM[i, j] += dW[i, j]
+            for c in range(2):
+                SVX[c, i, j] += dSVX[c, i, j]
+                SVY[c, i, j] += dSVY[c, i, j]
+
+
+@_jit
+def priorityFlood(e, region, filled, parent, r0, r1, c0, c1):
+    # floods the cells of region (all inside rows r0:r1, columns c0:c1) lowest first, from the grid edge and from the
+    # known cells around them, a cell's filled level is the lowest level at which water can leave it and its parent the
+    # flat index of the cell it was reached from, region is used up as the cells are reached
+    y, x = e.shape
+    heap = [(0., 0, 0)]
+    heap.pop()
+    seq = 0
+    for i in range(max(r0 - 1, 0), min(r1 + 1, y)):
+        for j in range(max(c0 - 1, 0), min(c1 + 1, x)):
+            if region[i, j]:
+                if i == 0 or j == 0 or i == y - 1 or j == x - 1:
+                    region[i, j] = False
+                    filled[i, j] = e[i, j]
+                    parent[i * x + j] = -1
+                    heapq.heappush(heap, (float(e[i, j]), seq, i * x + j))
+                    seq += 1
+            elif (j > 0 and region[i, j - 1]) or (j + 1 < x and region[i, j + 1]) or \
+                    (i > 0 and region[i - 1, j]) or (i + 1 < y and region[i + 1, j]):
+                heapq.heappush(heap, (float(filled[i, j]), seq, i * x + j))
+                seq += 1
+    while len(heap) > 0:
+        h, _, c = heapq.heappop(heap)
+        i, j = c // x, c % x
+        for d in range(4):
+            ni, nj = (i, j - 1) if d == 0 else (i, j + 1) if d == 1 else (i - 1, j) if d == 2 else (i + 1, j)
+            if 0 <= ni < y and 0 <= nj < x and region[ni, nj]:
+                region[ni, nj] = False
+                v = max(float(e[ni, nj]), h)
+                filled[ni, nj] = v
+                parent[ni * x + nj] = c
+                heapq.heappush(heap, (v, seq, ni * x + nj))
+                seq += 1
+
+
+@_jit
+def drainage(e, filled, parent, x, order, labels):
+    # orders the (flat) cells from the outlets upstream, every cell after its parent, and numbers the depressions,
+    # the connected cells below their filled level, which all share that level, -1 if the parents hold a cycle
+    n = parent.shape[0]
+    start = np.zeros(n + 1, dtype=np.int64)
+    for c in range(n):
+        if parent[c] >= 0:
+            start[parent[c] + 1] += 1
+    for c in range(n):
+        start[c + 1] += start[c]
+    fill = start[:-1].copy()
+    children = np.empty(n, dtype=np.int64)
+    tail = 0
+    for c in range(n):
+        p = parent[c]
+        if p >= 0:
+            children[fill[p]] = c
+            fill[p] += 1
+        else:
+            order[tail] = c
+            tail += 1
+    head = 0
+    while head < tail:
+        c = order[head]
+        head += 1
+        for k in range(start[c], start[c + 1]):
+            order[tail] = children[k]
+            tail += 1
+    if tail < n:
+        return -1
+    labels[:] = 0
+    count = 0
+    stack = children
+    for c in range(n):
+        if labels[c] > 0 or filled[c] <= e[c]:
+            continue
+        count += 1
+        labels[c] = count
+        stack[0] = c
+        top = 1
+        while top > 0:
+            top -= 1
+            q = stack[top]
+            i, j = q // x, q % x
+            for d in range(4):
+                if d == 0 and j == 0 or d == 1 and j == x - 1 or d == 2 and i == 0 or d == 3 and q + x >= n:
+                    continue
+                m = q - 1 if d == 0 else q + 1 if d == 1 else q - x if d == 2 else q + x
+                if labels[m] == 0 and filled[m] > e[m]:
+                    labels[m] = count
+                    stack[top] = m
+                    top += 1
+    return count
+
+
+@_jit
+def affected(raised, lowered, e, filled, parent, order, labels, x, region):
+    # the (flat) cells whose filled level may change: everything draining through a cell raised above its filled
+    # level, and the depressions connected to a lowered cell through cells filled above the level water can now
+    # leave it at (its new elevation on the grid edge, else no less than that and the lowest filled neighbour),
+    # since only those gain a way out, closed under the drainage tree and the depressions, so no cell kept can drain
+    # into the re-flooded ones
+    n = order.shape[0]
+    lo = np.inf
+    stack = np.empty(n, dtype=np.int64)
+    seen = np.zeros(n, dtype=np.bool_)
+    top = 0
+    for c in range(n):
+        if raised[c]:
+            region[c] = True
+        if lowered[c]:
+            i, j = c // x, c % x
+            level = np.inf
+            if j > 0:
+                level = min(level, filled[c - 1])
+            if j < x - 1:
+                level = min(level, filled[c + 1])
+            if i > 0:
+                level = min(level, filled[c - x])
+            if c + x < n:
+                level = min(level, filled[c + x])
+            level = max(level, e[c])
+            if i == 0 or j == 0 or j == x - 1 or c + x >= n:
+                level = e[c]
+            if level < filled[c]:
+                lo = min(lo, level)
+                region[c] = True
+                seen[c] = True
+                stack[top] = c
+                top += 1
+    while top > 0:
+        top -= 1
+        c = stack[top]
+        i, j = c // x, c % x
+        for d in range(4):
+            if d == 0 and j == 0 or d == 1 and j == x - 1 or d == 2 and i == 0 or d == 3 and c + x >= n:
+                continue
+            m = c - 1 if d == 0 else c + 1 if d == 1 else c - x if d == 2 else c + x
+            if not seen[m] and filled[m] > lo:
+                seen[m] = True
+                if filled[m] > e[m]:
+                    region[m] = True
+                stack[top] = m
+                top += 1
+    touched = np.zeros(n + 1, dtype=np.bool_)
+    grown = True
+    while grown:
+        grown = False
+        for k in range(n):
+            c = order[k]
+            if not region[c] and parent[c] >= 0 and region[parent[c]]:
+                region[c] = True
+        for c in range(n):
+            if region[c] and labels[c] > 0:
+                touched[labels[c]] = True
+        for c in range(n):
+            if not region[c] and touched[labels[c]] and labels[c] > 0:
+                region[c] = True
+                grown = True
+
+
+@_jit
+def route(volume, order, parent, labels, capacity, stored):
+    # moves every (flat) cell's water down the drainage tree, upstream first, a depression keeps what it can hold
+    # at its exits, the cells of it whose parent lies outside
+    for k in range(order.shape[0] - 1, -1, -1):
+        c = order[k]
+        p = parent[c]
+        label = labels[c]
+        if label > 0 and (p < 0 or labels[p] != label):
+            take = min(volume[c], capacity[label] - stored[label])
+            stored[label] += take
+            volume[c] -= take
+        if p >= 0:
+            volume[p] += volume[c]
+            volume[c] = 0.
@@ -1,42 +1,134 @@
-from .basin import FillsLayer as _FL, DrainLayer as _DL
+from .basin import FillsLayer as _FL, DrainLayer as _DL, SparseFillsLayer as _SFL, SparseDrainLayer as _SDL, \
+    SparseLayer as _SL
 
 import numpy as _np
 
+from . import jit as _jit
+
 
 class RainLayer(_FL):
+    FIELDS = "W",
+    SOURCE = True
+
+    def _scaled(self, tick: float, out: "_np.ndarray") -> "_np.ndarray":
+        return _np.multiply(self._level, tick, out=out)
+
+    def accumulate(self, acc, WM, *_, tick: float, **__):
+        if acc.jit:
+            _jit.fill(acc.dW, self._level, tick)
+        else:
+            _np.add(acc.dW, acc.scaled(self, tick), out=acc.dW)
+
     def _tick(self, *_, tick: float, **__) -> tuple["_np.ndarray", "_np.ndarray", "_np.ndarray", "_np.ndarray"]:
         return self._level * tick, self.ZERO, self.ZERO, self.ZERO
 
 
 class GutterLayer(_DL):
+    FIELDS = "W",
+
+    def _scaled(self, tick: float, out: "_np.ndarray") -> "_np.ndarray":
+        return _np.multiply(self._level, tick, out=out)
+
+    def accumulate(self, acc, WM, *_, tick: float, **__):
+        if acc.jit:
+            _jit.drain(acc.dW, WM, self._level, tick, 1.)
+        else:
+            self._drainInto(acc, WM, acc.scaled(self, tick))
+
     def _tick(self, *_, tick: float, **__) -> tuple["_np.ndarray", "_np.ndarray", "_np.ndarray", "_np.ndarray"]:
         return self._level * tick, self.ZERO, self.ZERO, self.ZERO
 
 
 class EvaporationLayer(_DL):
-    def __init__(self, x, y, rate):
-        super().__init__(x, y)
+    FIELDS = "W",
+
+    def __init__(self, x, y, rate, members: int = None, dtype=_np.float64):
+        super().__init__(x, y, members, dtype)
         self._level += 0.01
         self._rate = rate
 
+    def _scaled(self, tick: float, out: "_np.ndarray") -> "_np.ndarray":
+        _np.multiply(self._level, self._rate, out=out)
+        return _np.multiply(out, tick, out=out)
+
+    def accumulate(self, acc, WM, *_, tick: float, **__):
+        if acc.jit:
+            _jit.drain(acc.dW, WM, self._level, self._rate, tick)
+        else:
+            self._drainInto(acc, WM, acc.scaled(self, tick))
+
     def _tick(self, *_, tick: float, **__) -> tuple["_np.ndarray", "_np.ndarray", "_np.ndarray", "_np.ndarray"]:
         return self._level * self._rate * tick, self.ZERO, self.ZERO, self.ZERO
 
 
 class ReservoirLayer(_FL):
-    def __init__(self, x, y, height):
-        super().__init__(x, y)
+    FIELDS = "W",
+
+    def __init__(self, x, y, height, members: int = None, dtype=_np.float64):
+        super().__init__(x, y, members, dtype)
         self._level = self._level.astype(bool)
         self._height = height
 
-    def setMask(self, x, y, mask: bool = True):
-        self._level[y, x] = mask
+    def setMask(self, x, y, mask: bool = True, member=...):
+        self._level[member, y, x] = mask
+        self.touch()
 
     def setHeight(self, height):
         self._height = height
+        self.touch()
+
+    def accumulate(self, acc, WM, *_, tick: float, **__):
+        if acc.jit:
+            _jit.reservoir(acc.dW, WM, self._level, self._height, tick)
+            return
+        _np.less(WM, self._height, out=acc.mask)
+        _np.logical_and(acc.mask, self._level, out=acc.mask)
+        _np.multiply(acc.mask, self._height * tick, out=acc.tmp)
+        _np.add(acc.dW, acc.tmp, out=acc.dW)
 
     def _tick(self,
               WM: "_np.ndarray", *_,
               tick: float, **__) -> tuple["_np.ndarray", "_np.ndarray", "_np.ndarray", "_np.ndarray"]:
         return _np.where(self._level * (WM - self._height) < 0, self._height * tick, self.ZERO),\
             self.ZERO, self.ZERO, self.ZERO
+
+
+class SparseRainLayer(_SFL):
+    FIELDS = "W",
+    SOURCE = True
+
+    def _scaled(self, tick: float, out: "_np.ndarray") -> "_np.ndarray":
+        return _np.multiply(self._level, tick, out=out)
+
+    def accumulate(self, acc, WM, *_, tick: float, **__):
+        self._view(acc.dW)[:, self._index] += acc.scaled(self, tick)
+
+
+class SparseGutterLayer(_SDL):
+    FIELDS = "W",
+
+    def _scaled(self, tick: float, out: "_np.ndarray") -> "_np.ndarray":
+        return _np.multiply(self._level, tick, out=out)
+
+    def accumulate(self, acc, WM, *_, tick: float, **__):
+        self._drainInto(acc, WM, acc.scaled(self, tick))
+
+
+class SparseReservoirLayer(_SL):
+    FIELDS = "W",
+
+    def __init__(self, x, y, height, members: int = None, dtype=_np.float64):
+        super().__init__(x, y, members, dtype)
+        self._level = self._level.astype(bool)
+        self._height = height
+
+    def setMask(self, x, y, mask: bool = True, member=...):
+        self._set(x, y, mask, member)
+
+    def setHeight(self, height):
+        self._height = height
+        self.touch()
+
+    def accumulate(self, acc, WM, *_, tick: float, **__):
+        below = self._view(WM)[:, self._index] < self._height
+        self._view(acc.dW)[:, self._index] += below * (self._height * tick)
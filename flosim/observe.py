@@ -0,0 +1,176 @@
+import numpy as np
+
+
+class Series:
+    # time series of fixed shape samples, a ring buffer when capacity is given and a growing array otherwise
+    def __init__(self, shape: tuple[int, ...], capacity: int = None, dtype=np.float64):
+        self._capacity, self._n = capacity, 0
+        size = capacity or 64
+        self._times = np.empty(size)
+        self._values = np.empty((size, *shape), dtype=dtype)
+
+    def __len__(self):
+        return self._n if self._capacity is None else min(self._n, self._capacity)
+
+    def push(self, time: float) -> "np.ndarray":
+        if self._capacity is None:
+            i = self._n
+            if i == len(self._times):
+                self._times = np.concatenate([self._times, np.empty_like(self._times)])
+                self._values = np.concatenate([self._values, np.empty_like(self._values)])
+        else:
+            i = self._n % self._capacity
+        self._n += 1
+        self._times[i] = time
+        return self._values[i]
+
+    def _order(self, a):
+        if self._capacity is None or self._n <= self._capacity:
+            return a[:len(self)]
+        i = self._n % self._capacity
+        return np.concatenate([a[i:], a[:i]])
+
+    @property
+    def times(self) -> "np.ndarray":
+        return self._order(self._times)
+
+    @property
+    def values(self) -> "np.ndarray":
+        return self._order(self._values)
+
+
+class Observer:
+    # a basin hook that reduces the state after every n-th tick into one sample of a Series, stored in DTYPE or, when
+    # that is None, in the basin's dtype
+    DTYPE = None
+
+    def __init__(self, size: int, capacity: int = None, every: int = 1):
+        self._size, self._capacity, self._every = size, capacity, every
+        self._series = None
+
+    def __call__(self, basin):
+        if basin.ticks % self._every:
+            return
+        *lead, y, x = basin[:].shape
+        if self._series is None:
+            self._series = Series((*lead, self._size), self._capacity, self.DTYPE or basin.dtype)
+        row = self._series.push(basin.time)
+        self._observe(basin, row.reshape(-1, self._size), y, x)
+
+    def _observe(self, basin, out: "np.ndarray", y: int, x: int):
+        raise NotImplementedError
+
+    def __len__(self):
+        return 0 if self._series is None else len(self._series)
+
+    @property
+    def times(self) -> "np.ndarray":
+        return np.empty(0) if self._series is None else self._series.times
+
+    @property
+    def values(self) -> "np.ndarray":
+        return np.empty((0, self._size)) if self._series is None else self._series.values
+
+
+def _flat(a):
+    # (..., y, x) -> (members, y * x) without copying
+    *_, y, x = a.shape
+    return a.reshape(-1, y * x)
+
+
+class Gauges(Observer):
+    # water depth at a list of points
+    def __init__(self, x, y, capacity: int = None, every: int = 1):
+        self._x, self._y = np.atleast_1d(x), np.atleast_1d(y)
+        super().__init__(len(self._x), capacity, every)
+        self._index = None
+
+    def _observe(self, basin, out, y, x):
+        if self._index is None:
+            self._index = np.ravel_multi_index((self._y, self._x), (y, x))
+        np.take(_flat(basin[:]), self._index, axis=-1, out=out)
+
+
+class Regions(Observer):
+    # water volume inside a label image (0 is outside every region) or a list of possibly overlapping masks
+    DTYPE = np.float64
+    def __init__(self, regions, capacity: int = None, every: int = 1):
+        if isinstance(regions, np.ndarray) and regions.dtype != bool:
+            self._index = np.flatnonzero(regions)
+            self._group = regions.ravel()[self._index] - 1
+            size = int(regions.max(initial=0))
+        else:
+            masks = [np.flatnonzero(mask) for mask in regions]
+            self._index = np.concatenate(masks)
+            self._group = np.repeat(np.arange(len(masks)), [len(m) for m in masks])
+            size = len(masks)
+        super().__init__(size, capacity, every)
+        self._groups = None
+
+    def _observe(self, basin, out, y, x):
+        WM = _flat(basin[:])
+        if self._groups is None:
+            m = len(WM)
+            self._groups = (self._group + self._size * np.arange(m)[:, None]).ravel()
+        out[...] = np.bincount(self._groups, weights=WM[:, self._index].ravel(),
+                               minlength=out.size).reshape(out.shape)
+
+
+class Sections(Observer):
+    # net advective discharge out of a set of cells in one of the velocity directions, per unit time
+    # cells on the grid edge give the outflow through that edge, the implicit diffusion is not included
+    DTYPE = np.float64
+    DIRECTIONS = {"L": ("SVX", 0, 0, -1), "R": ("SVX", 1, 0, 1), "U": ("SVY", 0, -1, 0), "D": ("SVY", 1, 1, 0)}
+
+    def __init__(self, sections: list[tuple], capacity: int = None, every: int = 1):
+        for *_, direction in sections:
+            if direction not in self.DIRECTIONS:
+                raise ValueError(f"unknown direction {direction!r}, expected one of {tuple(self.DIRECTIONS)}")
+        self._sections = sections
+        super().__init__(len(sections), capacity, every)
+        self._plan = None
+
+    def _build(self, y, x, m):
+        # per velocity field: flat cell index, velocity component, output slot and sign of every term
+        parts = {"SVX": [], "SVY": []}
+        for i, (sx, sy, direction) in enumerate(self._sections):
+            cells = np.zeros((y, x), dtype=bool)
+            cells[sy, sx] = True
+            field, c, dy, dx = self.DIRECTIONS[direction]
+            cy, cx = np.nonzero(cells)
+            ny, nx = cy + dy, cx + dx
+            inside = (0 <= ny) & (ny < y) & (0 <= nx) & (nx < x)
+            # water leaving the cells minus what the neighbours send back through the same faces
+            for py, px, comp, sign in ((cy, cx, c, 1), (ny[inside], nx[inside], 1 - c, -1)):
+                n = len(py)
+                parts[field].append((np.ravel_multi_index((py, px), (y, x)),
+                                     np.full(n, comp), np.full(n, i), np.full(n, sign)))
+        plan = {}
+        for field, terms in parts.items():
+            if terms:
+                idx, comp, group, sign = (np.concatenate(a) for a in zip(*terms))
+                plan[field] = idx, comp, (group + self._size * np.arange(m)[:, None]).ravel(), sign
+        return plan
+
+    def _observe(self, basin, out, y, x):
+        WM = _flat(basin[:])
+        m = len(WM)
+        if self._plan is None:
+            self._plan = self._build(y, x, m)
+        out.fill(0)
+        for field, (idx, comp, groups, sign) in self._plan.items():
+            V = getattr(basin, f"_{field}").reshape(m, 2, -1)
+            flux = WM[:, idx] * V[:, comp, idx] * sign
+            out += np.bincount(groups, weights=flux.ravel(), minlength=out.size).reshape(out.shape)
+        out *= basin._eta
+
+
+class Volume(Observer):
+    # total water volume, the hydrograph of the whole basin, summed in float64 whatever the basin's dtype
+    DTYPE = np.float64
+
+    def __init__(self, capacity: int = None, every: int = 1):
+        super().__init__(1, capacity, every)
+
+    def _observe(self, basin, out, y, x):
+        out[:, 0] = np.ravel(basin[:].sum(axis=(-2, -1), dtype=np.float64))
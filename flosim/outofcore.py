@@ -0,0 +1,194 @@
+import copy
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from flosim import jit, checkpoint
+from flosim.basin import Basin, Accumulator, SparseLayer
+from flosim.func import Workspace, jacobi_solver, velAct
+
+FIELDS = {"W": "WM", "B": "BM", "SVX": "SVX", "SVY": "SVY"}
+
+# directories mapped by a live basin, a second one would truncate its files
+_inUse = set()
+
+
+class OutOfCoreBasin(Basin):
+    # a basin whose fields, and the grids of its layers, live in .npy files under path and are mapped rather than
+    # loaded, a tick streams over bands of rows: the layers are applied band by band, then every band is flowed on
+    # its rows plus a halo of as many rows as water can travel in a tick, and written to the second water file,
+    # which becomes the current one once all bands are done, the next band is read on a loader thread meanwhile
+    def __init__(self, x: int, y: int, path: str, band: int = 256, **kwargs):
+        if kwargs.get("tileSize") is not None:
+            raise ValueError("OutOfCoreBasin does not track active tiles")
+        real = os.path.realpath(path)
+        if real in _inUse:
+            raise ValueError(f"{path} is in use by another OutOfCoreBasin")
+        _inUse.add(real)
+        self._release = weakref.finalize(self, _inUse.discard, real)
+        self._path, self._band = path, band
+        super().__init__(x, y, **kwargs)
+        self._loader = ThreadPoolExecutor(1)
+
+    @classmethod
+    def restore(cls, source: str, path: str = None) -> "OutOfCoreBasin":
+        # the restored basin maps its own files under path, by default the directory of the basin checkpointed,
+        # which must not be in use then
+        return checkpoint.load(source, cls, None if path is None else {"path": path})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _map(self, name, shape, dtype):
+        return open_memmap(os.path.join(self._path, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape)
+
+    def _allocate(self, dtype, accDtype, cacheLayers, fields):
+        # restored fields are not taken over, the basin maps its own files and _adopt copies them in
+        os.makedirs(self._path, exist_ok=True)
+        y, x = self._y, self._x
+        self._BM = self._map("BM", (y, x), dtype)
+        self._WM, self._nWM = self._map("WM0", (y, x), dtype), self._map("WM1", (y, x), dtype)
+        self._SVX, self._SVY = self._map("SVX", (2, y, x), dtype), self._map("SVY", (2, y, x), dtype)
+
+        # only one band is ever in memory, the layer buffers cover its rows and the flow buffers its halo as well
+        self._accDtype = np.dtype(accDtype or dtype)
+        band, rows = min(self._band, y), min(self._band + 2 * self._spread(), y)
+        self._dB = np.zeros((band, x), dtype=self._accDtype)
+        self._dW = np.zeros((band, x), dtype=self._accDtype)
+        self._dSVX = np.zeros((2, band, x), dtype=self._accDtype)
+        self._dSVY = np.zeros((2, band, x), dtype=self._accDtype)
+        self._tWM = np.zeros((rows, x), dtype=dtype)
+        self._sol = np.zeros((rows, x), dtype=dtype)
+        self._ws = Workspace((rows, x), dtype)
+        self._acc = Accumulator(self._dW, self._dB, self._dSVX, self._dSVY, self._ws.l[:band], cacheLayers, self._jit)
+
+    def _config(self) -> dict:
+        return dict(super()._config(), path=self._path, band=self._band)
+
+    def _copyRows(self, target, array):
+        for r0 in range(0, self._y, self._band):
+            target[..., r0:r0 + self._band, :] = array[..., r0:r0 + self._band, :]
+
+    def _adopt(self, field: str, array: "np.ndarray"):
+        # restored state is copied into the mapped files a band at a time
+        self._copyRows(getattr(self, f"_{field}"), array)
+
+    def flush(self):
+        for a in (self._BM, self._WM, self._nWM, self._SVX, self._SVY,
+                  *(v for layer in self._layers for v in vars(layer).values() if isinstance(v, np.memmap))):
+            a.flush()
+
+    def close(self):
+        self._loader.shutdown()
+        self.flush()
+        self._release()
+
+    @property
+    def terrain(self):
+        raise ValueError("OutOfCoreBasin has no terrain, a flood fill holds several full grids in memory")
+
+    def fastForward(self, duration: float, rate=None):
+        raise ValueError("OutOfCoreBasin cannot fast forward, a flood fill holds several full grids in memory")
+
+    def addLayer(self, layer):
+        # the layer's grids move to files next to the basin's
+        super().addLayer(layer)
+        i = len(self._layers) - 1
+        for attr, value in vars(layer).items():
+            if isinstance(value, np.ndarray) and value.shape[-2:] == (self._y, self._x):
+                mapped = self._map(f"layer{i}{attr}", value.shape, value.dtype)
+                self._copyRows(mapped, value)
+                setattr(layer, attr, mapped)
+
+    def _bandLayer(self, layer, r0, r1):
+        # a shallow copy of the layer seeing rows r0:r1 only, without the instance wrappers a profiler adds
+        view = copy.copy(layer)
+        vars(view).pop("accumulate", None)
+        for attr, value in vars(layer).items():
+            if isinstance(value, np.ndarray) and value.shape[-2:] == (self._y, self._x):
+                setattr(view, attr, value[..., r0:r1, :])
+        if isinstance(layer, SparseLayer):
+            i0, i1 = np.searchsorted(layer._index, (r0 * self._x, r1 * self._x))
+            view._index, view._level = layer._index[i0:i1] - r0 * self._x, layer._level[i0:i1]
+        view._y = r1 - r0
+        return view
+
+    def _stream(self, halo, fields):
+        # yields (r0, r1, h0, arrays) for every band, arrays hold rows h0:h1 of the fields, the band's rows r0:r1 plus
+        # up to halo rows on either side, read into memory on the loader thread while the band before is processed
+        y = self._y
+        bands = [(r0, min(r0 + self._band, y)) for r0 in range(0, y, self._band)]
+        read = lambda r0, r1: [np.array(f[..., max(r0 - halo, 0):min(r1 + halo, y), :]) for f in fields]
+        future = self._loader.submit(read, *bands[0])
+        for i, (r0, r1) in enumerate(bands):
+            arrays = future.result()
+            if i + 1 < len(bands):
+                future = self._loader.submit(read, *bands[i + 1])
+            yield r0, r1, max(r0 - halo, 0), arrays
+
+    def stableStep(self, dtMax: float, cfl: float = 0.5) -> float:
+        v = 0.
+        for _, _, _, (WM, SVX, SVY) in self._stream(0, (self._WM, self._SVX, self._SVY)):
+            t = np.add(SVX[0], SVX[1])
+            np.add(t, SVY[0], out=t)
+            np.add(t, SVY[1], out=t)
+            v = max(v, float(np.max(t, where=WM > 0, initial=0)))
+        v *= self._eta
+        return dtMax if v * dtMax <= cfl else cfl / v
+
+    def run(self, until: float, dtMax: float = 1.0, dtMin: float = 1e-3, cfl: float = 0.5, maxRise: float = None,
+            outputs=(), callback=None) -> int:
+        if maxRise is not None and self._prevWM is None:
+            self._prevWM = self._map("prevWM", self._WM.shape, self._WM.dtype)
+        return super().run(until, dtMax, dtMin, cfl, maxRise, outputs, callback)
+
+    def _applyLayers(self, tick):
+        fields = self._fields
+        if not fields:
+            return
+        files = {field: getattr(self, f"_{name}") for field, name in FIELDS.items()}
+        # only the water, which drains clamp against, and the fields the layers change are read in, the others are
+        # handed to the layers as mapped rows that cost no reads unless a layer looks at them
+        streamed = [field for field in FIELDS if field == "W" or field in fields]
+        for r0, r1, _, arrays in self._stream(0, tuple(files[field] for field in streamed)):
+            n = r1 - r0
+            band = dict(zip(streamed, arrays))
+            acc = Accumulator(self._dW[:n], self._dB[:n], self._dSVX[:, :n], self._dSVY[:, :n], self._ws.l[:n],
+                              cache=False, jit=self._jit)
+            self._accumulate(acc, [self._bandLayer(layer, r0, r1) for layer in self._layers],
+                             *(band.get(field, files[field][..., r0:r1, :]) for field in FIELDS), tick)
+            for field in fields:
+                band[field] += acc[field]
+                files[field][..., r0:r1, :] = band[field]
+        if "B" in fields:
+            self._edited()
+
+    def _flow(self, tick):
+        iterations, residual = 0, 0.
+        tol = -1. if self._tol is None else self._tol
+        fields = self._WM, self._BM, self._SVX, self._SVY
+        for r0, r1, h0, (WM, BM, SVX, SVY) in self._stream(self._spread(), fields):
+            out = self._nWM[r0:r1]
+            if not WM.any():
+                out[...] = 0
+                continue
+            # rows further than spread from the band are never reached, so the halo edge can be treated as a wall
+            ws, tmp, sol = self._ws.view(WM.shape), self._tWM[:len(WM)], self._sol[:len(WM)]
+            if self._jit:
+                WM += jit.velAct(WM, SVX, SVY, tick, tmp)
+                np.copyto(sol, WM)
+                it, res = jit.jacobi(BM, WM, sol, tick, self._maxIter, tol, ws.t)
+            else:
+                WM += velAct(BM, WM, SVX, SVY, tick, out=tmp, ws=ws)
+                foo = lambda dex, ndex, BM=BM, ws=ws, tick=tick: self._diffuse(BM, ws, dex, ndex, tick)
+                sol, it, res = jacobi_solver(foo, WM, self._maxIter, self._tol, out=sol, tmp=tmp)
+            out[...] = sol[r0 - h0:r1 - h0]
+            iterations, residual = max(iterations, it), max(residual, res)
+        self._WM, self._nWM = self._nWM, self._WM
+        self._iterations, self._residual = iterations, residual
@@ -0,0 +1,163 @@
+import multiprocessing as mp
+import os
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from flosim import jit
+from flosim.basin import Basin
+from flosim.func import Workspace, surr, velAct
+
+_RUN, _STOP = 0, 1
+
+
+def _attach(specs):
+    shms, arrays = [], {}
+    for field, (name, shape, dtype) in specs.items():
+        shms.append(shm := SharedMemory(name=name))
+        arrays[field] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return shms, arrays
+
+
+def _worker(wid, band, specs, start, sync, end, jitted):
+    shms, a = _attach(specs)
+    BM, WM, P, Q, SVX, SVY, ctl, res = (a[f] for f in ("BM", "WM", "P", "Q", "SVX", "SVY", "ctl", "res"))
+    y, x = WM.shape
+    r0, r1 = band
+    # every band is advanced on its rows plus a one row halo, the halo rows of the result are discarded
+    h0, h1 = max(r0 - 1, 0), min(r1 + 1, y)
+    i0, i1 = r0 - h0, r1 - h0
+    ws = Workspace((h1 - h0, x), WM.dtype)
+    loc = np.empty((h1 - h0, x), dtype=WM.dtype)
+    try:
+        while True:
+            start.wait()
+            if ctl[0] == _STOP:
+                break
+            k, n, tol = ctl[1], int(ctl[2]), ctl[3]
+
+            if jitted:
+                jit.velAct(WM[h0:h1], SVX[:, h0:h1], SVY[:, h0:h1], k, loc)
+            else:
+                velAct(BM[h0:h1], WM[h0:h1], SVX[:, h0:h1], SVY[:, h0:h1], k, out=loc, ws=ws)
+            sync.wait()
+            WM[r0:r1] += loc[i0:i1]
+            P[r0:r1] = WM[r0:r1]
+            sync.wait()
+
+            src, dst, it, r = P, Q, 0, np.inf
+            while it < n:
+                it += 1
+                if jitted:
+                    jit.surr(BM[h0:h1], src[h0:h1], loc)
+                else:
+                    surr(BM[h0:h1], src[h0:h1], out=loc, ws=ws)
+                d = dst[r0:r1]
+                np.multiply(loc[i0:i1], k, out=d)
+                np.add(d, WM[r0:r1], out=d)
+                np.divide(d, 1 + k, out=d)
+                check = tol >= 0 or it == n
+                if check:
+                    t = np.subtract(d, src[r0:r1], out=loc[i0:i1])
+                    res[it % 2, wid] = np.abs(t, out=t).max(initial=0)
+                sync.wait()
+                src, dst = dst, src
+                if check:
+                    r = res[it % 2].max()
+                    if 0 <= tol and r <= tol:
+                        break
+            WM[r0:r1] = src[r0:r1]
+            if wid == 0:
+                ctl[4], ctl[5] = it, r
+            end.wait()
+    except BaseException:
+        for barrier in (start, sync, end):
+            barrier.abort()
+        raise
+    finally:
+        del BM, WM, P, Q, SVX, SVY, ctl, res, a
+        for shm in shms:
+            shm.close()
+
+
+class ParallelBasin(Basin):
+    def __init__(self, x: int, y: int, workers: int = None, **kwargs):
+        super().__init__(x, y, **kwargs)
+        if self._tileSize is not None:
+            raise ValueError("ParallelBasin does not track active tiles")
+        workers = min(workers or os.cpu_count(), y)
+
+        self._shms = []
+        specs = {}
+        for field, shape, dtype in (("BM", self._BM.shape, self._BM.dtype),
+                                    ("WM", self._WM.shape, self._WM.dtype),
+                                    ("P", self._WM.shape, self._WM.dtype),
+                                    ("Q", self._WM.shape, self._WM.dtype),
+                                    ("SVX", self._SVX.shape, self._SVX.dtype),
+                                    ("SVY", self._SVY.shape, self._SVY.dtype),
+                                    ("ctl", (6,), np.float64),
+                                    ("res", (2, workers), np.float64)):
+            nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            self._shms.append(shm := SharedMemory(create=True, size=nbytes))
+            specs[field] = shm.name, shape, dtype
+            array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            array[:] = getattr(self, f"_{field}", 0)
+            setattr(self, f"_{field}", array)
+        self._nWM, self._tWM = self._P, self._Q
+
+        ctx = mp.get_context()
+        # the parent must hold on to every barrier, their shared state is freed and reused once it is collected
+        self._start, self._end = ctx.Barrier(workers + 1), ctx.Barrier(workers + 1)
+        self._sync = sync = ctx.Barrier(workers)
+        bands = np.array_split(np.arange(y), workers)
+        self._workers = [ctx.Process(target=_worker,
+                                     args=(i, (int(b[0]), int(b[-1]) + 1), specs,
+                                           self._start, sync, self._end, self._jit),
+                                     daemon=True)
+                         for i, b in enumerate(bands)]
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def _config(self) -> dict:
+        return dict(super()._config(), workers=len(self._workers) or None)
+
+    def _adopt(self, field: str, array: "np.ndarray"):
+        # the workers hold the shared buffers, so restored state is copied in rather than swapped
+        if self._workers:
+            getattr(self, f"_{field}")[...] = array
+        else:
+            super()._adopt(field, array)
+
+    def _flow(self, tick):
+        if not self._workers:
+            return super()._flow(tick)
+        self._ctl[:4] = _RUN, tick, self._maxIter, -1. if self._tol is None else self._tol
+        self._start.wait()
+        self._end.wait()
+        self._iterations, self._residual = int(self._ctl[4]), float(self._ctl[5])
+
+    def close(self):
+        if not getattr(self, "_workers", None):
+            return
+        self._ctl[0] = _STOP
+        if not self._start.broken:
+            self._start.wait()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        for field in ("BM", "WM", "P", "Q", "SVX", "SVY", "ctl", "res"):
+            setattr(self, f"_{field}", getattr(self, f"_{field}").copy())
+        self._nWM, self._tWM = self._P, self._Q
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms = []
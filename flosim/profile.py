@@ -0,0 +1,152 @@
+import logging
+import time
+import tracemalloc
+
+
+class Phase:
+    __slots__ = "calls", "seconds", "maxSeconds", "last", "peakBytes", "allocations", "sites"
+
+    def __init__(self):
+        self.calls, self.seconds, self.maxSeconds, self.last, self.peakBytes = 0, 0., 0., 0., 0
+        # blocks a call left allocated, summed over the calls, in total and by the source line that allocated them
+        self.allocations, self.sites = 0, {}
+
+    def asdict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profiler:
+    # times the phases of Basin.tick by wrapping the basin's and its layers' methods on the instance,
+    # a basin without a profiler attached runs the plain class methods and pays nothing
+    PHASES = "_step", "_applyLayers", "_boundaries", "_flow", "_activeWindows", "_advect", "solve"
+    NAMES = {"_step": "tick", "_applyLayers": "layers", "_boundaries": "boundaries", "_flow": "flow",
+             "_activeWindows": "window", "_advect": "velAct", "solve": "solve"}
+    # the profiler's own allocations, and those of taking a snapshot, are left out of the counts
+    FILTERS = tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)
+
+    def __init__(self, sink=None, every: int = 1, memory: bool = False):
+        self._sink, self._every, self._memory = sink, every, memory
+        self._basin, self._layers = None, {}
+        self._startedTracing = False
+        self._stack = []
+        self.phases: dict[str, Phase] = {}
+        self.ticks, self.iterations, self.maxIterations = 0, 0, 0
+
+    def attach(self, basin) -> "Profiler":
+        if self._basin is not None:
+            raise ValueError("profiler is already attached")
+        self._basin = basin
+        if self._memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._startedTracing = True
+        for attr in self.PHASES:
+            setattr(basin, attr, self._wrap(self.NAMES[attr], getattr(basin, attr)))
+        self._wrapLayers()
+        return self
+
+    def detach(self):
+        if self._basin is None:
+            return
+        for attr in self.PHASES:
+            vars(self._basin).pop(attr, None)
+        for layer in self._layers.values():
+            vars(layer).pop("accumulate", None)
+        self._basin, self._layers = None, {}
+        if self._startedTracing:
+            tracemalloc.stop()
+            self._startedTracing = False
+
+    def _wrapLayers(self):
+        for i, layer in enumerate(self._basin._layers):
+            if id(layer) not in self._layers:
+                self._layers[id(layer)] = layer
+                layer.accumulate = self._wrap(f"layer{i}:{type(layer).__name__}", layer.accumulate)
+
+    def _wrap(self, name, foo):
+        phase = self.phases.setdefault(name, Phase())
+        memory, stack = self._memory, self._stack
+
+        def timed(*args, **kwargs):
+            if name == "layers":
+                self._wrapLayers()
+            if memory:
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], tracemalloc.get_traced_memory()[1])
+                # the snapshot is held through the call, its own size is left out of the peaks of the callers
+                current = tracemalloc.get_traced_memory()[0]
+                before = self._snapshot()
+                overhead = tracemalloc.get_traced_memory()[0] - current
+                tracemalloc.reset_peak()
+                stack.append([tracemalloc.get_traced_memory()[0], 0, before, overhead])
+            t0 = time.perf_counter()
+            try:
+                return foo(*args, **kwargs)
+            finally:
+                t = time.perf_counter() - t0
+                phase.calls += 1
+                phase.seconds += t
+                phase.last = t
+                phase.maxSeconds = max(phase.maxSeconds, t)
+                if memory:
+                    start, peak, before, overhead = stack.pop()
+                    peak = max(peak, tracemalloc.get_traced_memory()[1])
+                    phase.peakBytes = max(phase.peakBytes, peak - start)
+                    self._count(phase, self._snapshot().compare_to(before, "lineno"))
+                    del before
+                    tracemalloc.reset_peak()
+                    if stack:
+                        stack[-1][1] = max(stack[-1][1], peak - overhead)
+                if name == "tick":
+                    self._ticked()
+
+        return timed
+
+    def _snapshot(self) -> "tracemalloc.Snapshot":
+        return tracemalloc.take_snapshot().filter_traces(self.FILTERS)
+
+    @staticmethod
+    def _count(phase: Phase, stats: list["tracemalloc.StatisticDiff"]):
+        for stat in stats:
+            if stat.count_diff > 0:
+                frame = stat.traceback[0]
+                site = f"{frame.filename}:{frame.lineno}"
+                phase.sites[site] = phase.sites.get(site, 0) + stat.count_diff
+                phase.allocations += stat.count_diff
+
+    def _ticked(self):
+        self.ticks += 1
+        self.iterations += self._basin.iterations
+        self.maxIterations = max(self.maxIterations, self._basin.iterations)
+        if self._sink is not None and self.ticks % self._every == 0:
+            self._sink(self)
+
+    def report(self) -> dict:
+        return {"ticks": self.ticks, "iterations": self.iterations, "maxIterations": self.maxIterations,
+                "phases": {name: phase.asdict() for name, phase in self.phases.items() if phase.calls}}
+
+    def reset(self):
+        for phase in self.phases.values():
+            phase.__init__()
+        self.ticks, self.iterations, self.maxIterations = 0, 0, 0
+
+    def __str__(self):
+        lines = [f"{self.ticks} ticks, {self.iterations} solver iterations (max {self.maxIterations} per tick)",
+                 f"{'phase':>24} {'calls':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10} {'peak KiB':>10} "
+                 f"{'allocs':>8}"]
+        for name, phase in self.phases.items():
+            if phase.calls:
+                lines.append(f"{name:>24} {phase.calls:>8} {phase.seconds:>10.4f} "
+                             f"{phase.seconds / phase.calls * 1e3:>10.4f} {phase.maxSeconds * 1e3:>10.4f} "
+                             f"{phase.peakBytes / 1024:>10.1f} {phase.allocations:>8}")
+        return "\n".join(lines)
+
+
+def logSink(logger: logging.Logger = None, level: int = logging.INFO):
+    logger = logger or logging.getLogger("flosim.profile")
+
+    def sink(profiler: Profiler):
+        logger.log(level, "tick %d: %s, %d iterations", profiler.ticks,
+                   ", ".join(f"{name} {phase.last * 1e3:.3f} ms" for name, phase in profiler.phases.items()
+                             if phase.calls), profiler._basin.iterations)
+
+    return sink
@@ -0,0 +1,165 @@
+import json
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# store layout:
+#   meta.json                  fields, chunking, compression and the number of frames flushed so far
+#   times.npy                  simulation time of every flushed frame
+#   <field>/<t>.<i>.<j>.npy    raw chunk, memory-mappable
+#   <field>/<t>.<i>.<j>.z      zlib compressed chunk
+# a chunk holds up to chunks[0] frames of a chunks[1] x chunks[2] tile, leading field axes are kept whole
+
+
+class Recorder:
+    FIELDS = "WM", "BM", "SVX", "SVY"
+
+    def __init__(self,
+                 path: str,
+                 fields: tuple[str, ...] = ("WM",),
+                 every: int = 1,
+                 chunks: tuple[int, int, int] = (16, 256, 256),
+                 compress: int = None,
+                 background: bool = True):
+        for field in fields:
+            if field not in self.FIELDS:
+                raise ValueError(f"unknown field {field!r}, expected one of {self.FIELDS}")
+        self._path, self._fields, self._every = path, tuple(fields), every
+        self._chunks, self._compress = tuple(chunks), compress
+        self._meta, self._times = None, []
+        self._buffers, self._spare, self._n, self._flushed = None, None, 0, 0
+        self._pool = ThreadPoolExecutor(max_workers=1) if background else None
+        self._pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __call__(self, basin):
+        if basin.ticks % self._every:
+            return
+        if self._meta is None:
+            self._open(basin)
+        for field in self._fields:
+            self._buffers[field][self._n] = getattr(basin, f"_{field}")
+        self._times.append(basin.time)
+        self._n += 1
+        if self._n == self._chunks[0]:
+            self.flush()
+
+    def _open(self, basin):
+        os.makedirs(self._path, exist_ok=True)
+        self._meta = {"fields": {}, "chunks": self._chunks, "compress": self._compress, "every": self._every}
+        for field in self._fields:
+            array = getattr(basin, f"_{field}")
+            self._meta["fields"][field] = {"shape": array.shape, "dtype": array.dtype.str}
+            os.makedirs(os.path.join(self._path, field), exist_ok=True)
+        self._buffers = self._allocate()
+
+    def _allocate(self):
+        return {field: np.empty((self._chunks[0], *meta["shape"]), dtype=meta["dtype"])
+                for field, meta in self._meta["fields"].items()}
+
+    def flush(self):
+        if not self._n:
+            return
+        buffers, n, t = self._buffers, self._n, self._flushed // self._chunks[0]
+        times = np.asarray(self._times)
+        self._flushed += n
+        self._times = self._times if n < self._chunks[0] else []
+        self._wait()
+        if self._pool is None:
+            self._write(buffers, n, t, times, self._flushed)
+        else:
+            self._pending = self._pool.submit(self._write, buffers, n, t, times, self._flushed)
+        if n == self._chunks[0]:
+            if self._pool is not None:
+                # the spare was written by the job that _wait just joined
+                self._buffers, self._spare = self._spare or self._allocate(), buffers
+            self._n = 0
+        else:
+            # a partial chunk is rewritten in full by the next flush
+            self._flushed -= n
+
+    def _wait(self):
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+
+    def _write(self, buffers, n, t, times, frames):
+        _, cy, cx = self._chunks
+        for field, buffer in buffers.items():
+            *_, y, x = buffer.shape
+            for i in range(0, y, cy):
+                for j in range(0, x, cx):
+                    chunk = np.ascontiguousarray(buffer[:n, ..., i:i + cy, j:j + cx])
+                    name = os.path.join(self._path, field, f"{t}.{i // cy}.{j // cx}")
+                    if self._compress is None:
+                        np.save(name + ".npy", chunk)
+                    else:
+                        with open(name + ".z", "wb") as f:
+                            f.write(zlib.compress(chunk.tobytes(), self._compress))
+        previous = np.load(os.path.join(self._path, "times.npy")) if t else np.empty(0)
+        np.save(os.path.join(self._path, "times.npy"), np.concatenate([previous[:t * self._chunks[0]], times]))
+        with open(os.path.join(self._path, "meta.json"), "w") as f:
+            json.dump({**self._meta, "frames": frames}, f)
+
+    def close(self):
+        if self._meta is not None:
+            self.flush()
+            self._wait()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+class Recording:
+    def __init__(self, path: str):
+        self._path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self._meta = json.load(f)
+        self._times = np.load(os.path.join(path, "times.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return self._meta["frames"]
+
+    @property
+    def fields(self):
+        return tuple(self._meta["fields"])
+
+    @property
+    def times(self):
+        return self._times[:len(self)]
+
+    def shape(self, field: str) -> tuple[int, ...]:
+        return len(self), *self._meta["fields"][field]["shape"]
+
+    def _chunk(self, field, t, i, j, n, lead, cy, cx):
+        name = os.path.join(self._path, field, f"{t}.{i}.{j}")
+        if self._meta["compress"] is None:
+            return np.load(name + ".npy", mmap_mode="r")
+        with open(name + ".z", "rb") as f:
+            data = zlib.decompress(f.read())
+        return np.frombuffer(data, dtype=self._meta["fields"][field]["dtype"]).reshape(n, *lead, cy, cx)
+
+    def read(self, field: str, t=slice(None), y=slice(None), x=slice(None)) -> "np.ndarray":
+        ct, cy, cx = self._meta["chunks"]
+        frames, *lead, ny, nx = self.shape(field)
+        (t0, t1, ts), (y0, y1, ys), (x0, x1, xs) = (s.indices(n) for s, n in ((t, frames), (y, ny), (x, nx)))
+        t1, y1, x1 = max(t0, t1), max(y0, y1), max(x0, x1)
+        out = np.empty((t1 - t0, *lead, y1 - y0, x1 - x0), dtype=self._meta["fields"][field]["dtype"])
+        for tc in range(t0 // ct, -(-t1 // ct)):
+            n = min(ct, frames - tc * ct)
+            for i in range(y0 // cy, -(-y1 // cy)):
+                for j in range(x0 // cx, -(-x1 // cx)):
+                    h, w = min(cy, ny - i * cy), min(cx, nx - j * cx)
+                    chunk = self._chunk(field, tc, i, j, n, lead, h, w)
+                    a0, a1 = max(t0, tc * ct), min(t1, tc * ct + n)
+                    b0, b1 = max(y0, i * cy), min(y1, i * cy + h)
+                    c0, c1 = max(x0, j * cx), min(x1, j * cx + w)
+                    out[a0 - t0:a1 - t0, ..., b0 - y0:b1 - y0, c0 - x0:c1 - x0] = \
+                        chunk[a0 - tc * ct:a1 - tc * ct, ..., b0 - i * cy:b1 - i * cy, c0 - j * cx:c1 - j * cx]
+        return out[::ts, ..., ::ys, ::xs]
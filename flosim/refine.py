@@ -0,0 +1,239 @@
+import numpy as np
+
+from flosim import checkpoint
+from flosim.basin import Basin
+
+
+def restrict(a: "np.ndarray", r: int) -> "np.ndarray":
+    # block mean, a depth averaged over r x r fine cells keeps the volume of the coarse cell
+    *n, y, x = a.shape
+    return a.reshape(*n, y // r, r, x // r, r).mean(axis=(-3, -1))
+
+
+def prolong(a: "np.ndarray", r: int) -> "np.ndarray":
+    return a.repeat(r, axis=-2).repeat(r, axis=-1)
+
+
+class Patch:
+    def __init__(self, x: slice, y: slice, basin: Basin, ratio: int, walled: Basin):
+        self.x, self.y, self.basin, self.ratio = x, y, basin, ratio
+        # the patch window at coarse resolution behind walls, its step tells the coarse step's exchange across the
+        # patch edge apart from the water it moves inside the window
+        self._walled = walled
+        self._before = None
+
+    @property
+    def win(self):
+        return self.y, self.x
+
+    def __getitem__(self, item):
+        return self.basin[item]
+
+
+class HierarchicalBasin(Basin):
+    # a coarse basin with refined patches, each patch is a Basin at ratio times the resolution whose cells
+    # the coarse grid sees as their block mean, water crosses patch edges on the coarse grid only and moves
+    # inside a patch on the fine grid only, velocities count cells per tick, so a patch holds them ratio times
+    # larger and takes ratio sub-steps per coarse step to cover the same distance at the same stability
+    def __init__(self, x: int, y: int, ratio: int = 4, fineElevation: "np.ndarray" = None, _fields=None, **kwargs):
+        super().__init__(x, y, _fields=_fields, **kwargs)
+        self._ratio = ratio
+        self._fineElevation = fineElevation
+        self._patchKwargs = kwargs
+        self._patches: list[Patch] = []
+        self._covered = np.zeros((y, x), dtype=bool)
+
+    @property
+    def ratio(self):
+        return self._ratio
+
+    @property
+    def patches(self):
+        return tuple(self._patches)
+
+    @property
+    def cells(self):
+        # cell updates per coarse step: the whole coarse grid, each patch's walled window and its fine sub-steps
+        return self._x * self._y + sum(p._walled[:].size + p.basin[:].size * p.ratio for p in self._patches)
+
+    def addPatch(self, x: slice, y: slice) -> Patch:
+        (x0, x1, _), (y0, y1, _) = x.indices(self._x), y.indices(self._y)
+        x, y = slice(x0, x1), slice(y0, y1)
+        if self._covered[y, x].any():
+            raise ValueError("patches must not overlap")
+        r = self._ratio
+        patch = self._newPatch(x, y)
+        fine = patch.basin
+        if self._fineElevation is not None:
+            elevation = np.asarray(self._fineElevation[y0 * r:y1 * r, x0 * r:x1 * r], dtype=self.dtype)
+            self._BM[y, x] = restrict(elevation, r)
+            self._edited(x, y)
+        else:
+            elevation = prolong(self._BM[y, x], r)
+        fine._BM[...] = elevation
+        fine._WM[...] = prolong(self._WM[y, x], r)
+        for field in ("SVX", "SVY"):
+            getattr(fine, f"_{field}")[...] = prolong(getattr(self, f"_{field}")[:, y, x], r) * r
+        return patch
+
+    def _newPatch(self, x: slice, y: slice) -> Patch:
+        r = self._ratio
+        (x0, x1, _), (y0, y1, _) = x.indices(self._x), y.indices(self._y)
+        fine = Basin((x1 - x0) * r, (y1 - y0) * r, **self._patchKwargs)
+        self._covered[y, x] = True
+        self._patches.append(patch := Patch(x, y, fine, r, Basin(x1 - x0, y1 - y0, **self._patchKwargs)))
+        return patch
+
+    def _overlaps(self, x, y):
+        # the patches under an edit of the coarse cells at y, x, with the fine cells the edit covers in each
+        edited = np.zeros((self._y, self._x), dtype=bool)
+        edited[y, x] = True
+        for patch in self._patches:
+            if edited[patch.win].any():
+                yield patch, prolong(edited[patch.win], self._ratio)
+
+    # edits of the coarse grid reach the patches under them: an elevation set flattens the fine cells to the coarse
+    # value, an elevation added shifts them by it and keeps their detail, velocities are set ratio times larger,
+    # the walled windows take the coarse grid over at every step, fineElevation only seeds patches added later
+    def setElevation(self, x, y, elevation):
+        super().setElevation(x, y, elevation)
+        for patch, mask in self._overlaps(x, y):
+            patch.basin._BM[mask] = prolong(self._BM[patch.win], self._ratio)[mask]
+            patch.basin._edited()
+
+    def addElevation(self, x, y, elevation):
+        before = self._BM.copy()
+        super().addElevation(x, y, elevation)
+        for patch, mask in self._overlaps(x, y):
+            fine = patch.basin._BM
+            fine[mask] = np.clip(fine[mask] + prolong(self._BM[patch.win] - before[patch.win], self._ratio)[mask],
+                                 0, self._maxElv)
+            patch.basin._edited()
+
+    def _setVel(self, field, side, x, y):
+        for patch, mask in self._overlaps(x, y):
+            coarse = getattr(self, f"_{field}")[side][patch.win]
+            getattr(patch.basin, f"_{field}")[side][mask] = prolong(coarse, self._ratio)[mask] * self._ratio
+
+    def setVelL(self, x, y, vel):
+        super().setVelL(x, y, vel)
+        self._setVel("SVX", 0, x, y)
+
+    def setVelR(self, x, y, vel):
+        super().setVelR(x, y, vel)
+        self._setVel("SVX", 1, x, y)
+
+    def setVelU(self, x, y, vel):
+        super().setVelU(x, y, vel)
+        self._setVel("SVY", 0, x, y)
+
+    def setVelD(self, x, y, vel):
+        super().setVelD(x, y, vel)
+        self._setVel("SVY", 1, x, y)
+
+    def flag(self, depth: float = None, slope: float = None, mask: "np.ndarray" = None) -> "np.ndarray":
+        # coarse cells that want refinement: deep water, steep terrain or an explicit mask (e.g. structures)
+        flags = np.zeros((self._y, self._x), dtype=bool)
+        if depth is not None:
+            flags |= self._WM > depth
+        if slope is not None:
+            gy, gx = np.gradient(self._BM)
+            flags |= np.hypot(gx, gy) > slope
+        if mask is not None:
+            flags |= mask
+        return flags
+
+    def refine(self, flags: "np.ndarray", tile: int = 8) -> list[Patch]:
+        # flagged cells are rounded up to tiles, touching tiles are merged into boxes until no two boxes overlap
+        ty, tx = -(-self._y // tile), -(-self._x // tile)
+        tiles = np.zeros((ty, tx), dtype=bool)
+        fy, fx = np.nonzero(flags & ~self._covered)
+        tiles[fy // tile, fx // tile] = True
+        boxes = [[i, i + 1, j, j + 1] for i, j in zip(*np.nonzero(tiles))]
+        merged = True
+        while merged:
+            merged = False
+            for a in range(len(boxes)):
+                for b in range(a + 1, len(boxes)):
+                    p, q = boxes[a], boxes[b]
+                    if p[0] <= q[1] and q[0] <= p[1] and p[2] <= q[3] and q[2] <= p[3]:
+                        boxes[a] = [min(p[0], q[0]), max(p[1], q[1]), min(p[2], q[2]), max(p[3], q[3])]
+                        del boxes[b]
+                        merged = True
+                        break
+                if merged:
+                    break
+        patches = []
+        for i0, i1, j0, j1 in boxes:
+            y, x = slice(i0 * tile, min(i1 * tile, self._y)), slice(j0 * tile, min(j1 * tile, self._x))
+            if not self._covered[y, x].any():
+                patches.append(self.addPatch(x, y))
+        return patches
+
+    def _config(self) -> dict:
+        return dict(super()._config(), ratio=self._ratio)
+
+    def _snapshot(self):
+        patches, arrays = [], {}
+        if self._fineElevation is not None:
+            arrays["fineElevation"] = np.asarray(self._fineElevation)
+        for i, patch in enumerate(self._patches):
+            header, fine = checkpoint.snapshot(patch.basin)
+            patches.append({"x": [patch.x.start, patch.x.stop], "y": [patch.y.start, patch.y.stop],
+                            "state": header["state"]})
+            arrays.update({f"patch{i}{name}": array for name, array in fine.items()})
+        return {"patches": patches, "fineElevation": self._fineElevation is not None}, arrays
+
+    def _restore(self, extra, array):
+        # the coarse fields are restored already, the patches are only rebuilt and take their own fields over
+        if extra.get("fineElevation"):
+            self._fineElevation = array("fineElevation")
+        for i, entry in enumerate(extra.get("patches", ())):
+            fine = self._newPatch(slice(*entry["x"]), slice(*entry["y"])).basin
+            for field in checkpoint.FIELDS:
+                fine._adopt(field, array(f"patch{i}{field}"))
+            for name, value in entry["state"].items():
+                setattr(fine, f"_{name}", value)
+
+    def _applyLayers(self, tick):
+        for patch in self._patches:
+            patch._before = self._WM[patch.win].copy()
+        super()._applyLayers(tick)
+
+    @staticmethod
+    def _transfer(fine, delta, r):
+        # a coarse change of depth onto the fine grid, additions spread evenly, removals in proportion to the fine
+        # depth, what a coarse cell cannot give up comes out of the whole patch, so the volume always matches
+        gain, loss = np.maximum(delta, 0), np.minimum(delta, 0)
+        fine += prolong(gain, r)
+        if not loss.any():
+            return
+        held = restrict(fine, r)
+        scale = np.divide(loss, held, out=np.zeros_like(loss), where=held > 0)
+        np.maximum(scale, -1, out=scale)
+        short = float((loss - scale * held).sum())
+        fine *= 1 + prolong(scale, r)
+        if short < 0:
+            total = float(restrict(fine, r).sum())
+            fine *= max(1 + short / total, 0) if total > 0 else 0
+
+    def _flow(self, tick):
+        pre = [self._WM[patch.win].copy() for patch in self._patches]
+        super()._flow(tick)
+        r = self._ratio
+        for patch, before in zip(self._patches, pre):
+            fine, walled, coarse = patch.basin, patch._walled, self._WM[patch.win]
+            # the layers' change reaches the fine grid first, it then flows behind its walls, and what the coarse
+            # step exchanged across the patch edge, its result less that of the walled window, is added after
+            self._transfer(fine._WM, before - patch._before, r)
+            fine._touched()
+            for _ in range(r):
+                fine.tick(tick / self._eta / r)
+            walled._BM[...], walled._WM[...] = self._BM[patch.win], before
+            walled._SVX[...], walled._SVY[...] = self._SVX[:, patch.y, patch.x], self._SVY[:, patch.y, patch.x]
+            walled._touched()
+            walled._flow(tick)
+            self._transfer(fine._WM, coarse - walled._WM, r)
+            fine._touched()
+            coarse[...] = restrict(fine._WM, r)
+            self._touched(patch.win)
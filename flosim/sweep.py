@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from flosim.observe import Volume
+
+# arrays shared with the workers of the current process, attached once per worker by _attach
+_shared: dict[str, "np.ndarray"] = {}
+_shms: list = []
+
+
+def _attach(specs):
+    for name, (shm, shape, dtype) in specs.items():
+        _shms.append(m := SharedMemory(name=shm))
+        a = np.ndarray(shape, dtype=dtype, buffer=m.buf)
+        a.flags.writeable = False
+        _shared[name] = a
+
+
+def _run(task, key, params):
+    return key, task(_shared, params)
+
+
+def summarize(basin, until: float, dtMax: float = 1.0, **runKwargs) -> dict:
+    # peak depth map and hydrograph of a basin run until the given time
+    peak = basin[:].copy()
+    basin.addHook(volume := Volume())
+    basin.addHook(lambda b: np.maximum(peak, b[:], out=peak))
+    basin.run(until, dtMax, **runKwargs)
+    return {"peak": peak, "times": volume.times, "volume": volume.values[:, 0]}
+
+
+class Sweep:
+    # runs task(shared, params) for every (key, params) scenario on a process pool, the shared arrays are placed in
+    # shared memory once and reach every worker as read-only views instead of being pickled with every task
+    def __init__(self, task, shared: dict[str, "np.ndarray"] = None, workers: int = None,
+                 journal: str = None, window: int = None):
+        self._task, self._journal = task, journal
+        self._workers = workers or os.cpu_count()
+        # at most window scenarios are pending or finished but not yet handed to the caller
+        self._window = window or 2 * self._workers
+        self._shms, specs = [], {}
+        for name, array in (shared or {}).items():
+            array = np.ascontiguousarray(array)
+            self._shms.append(shm := SharedMemory(create=True, size=max(array.nbytes, 1)))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            specs[name] = shm.name, array.shape, array.dtype.str
+        self._pool = ProcessPoolExecutor(self._workers, initializer=_attach, initargs=(specs,))
+        if journal is not None:
+            os.makedirs(journal, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms = []
+
+    def _path(self, key):
+        return os.path.join(self._journal, f"{key}.npz")
+
+    def done(self, key) -> bool:
+        return self._journal is not None and os.path.exists(self._path(key))
+
+    def load(self, key) -> dict:
+        with np.load(self._path(key)) as f:
+            return dict(f)
+
+    def _record(self, key, result):
+        # written next to its final name and renamed, a killed sweep never leaves a half written result behind
+        tmp = self._path(key) + ".tmp.npz"
+        np.savez(tmp, **result)
+        os.replace(tmp, self._path(key))
+
+    def run(self, scenarios):
+        # yields (key, result) as scenarios finish, in completion order, scenarios already in the journal are skipped
+        scenarios = iter(scenarios)
+        pending = set()
+        while True:
+            while len(pending) < self._window:
+                try:
+                    key, params = next(scenarios)
+                except StopIteration:
+                    break
+                if not self.done(key):
+                    pending.add(self._pool.submit(_run, self._task, key, params))
+            if not pending:
+                return
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key, result = future.result()
+                if self._journal is not None:
+                    self._record(key, result)
+                yield key, result
@@ -0,0 +1,158 @@
+import warnings
+
+import numpy as np
+
+from flosim import jit
+
+
+class Terrain:
+    # drainage of an elevation grid over the four neighbours the solver exchanges water with: a priority flood gives
+    # every cell the lowest level at which water can leave it over the grid edge (filled) and the neighbour it leaves
+    # through (parent, -1 at the edge), connected cells below their filled level form depressions, each holding
+    # capacity water before it spills into its pour point
+    DIRECTIONS = "LRUD"
+
+    def __init__(self, elevation: "np.ndarray"):
+        if elevation.ndim != 2:
+            raise ValueError("terrain needs a single (y, x) elevation grid")
+        if not jit.AVAILABLE:
+            # the flood, labelling and routing walk the cells one by one, in plain python that takes seconds a million
+            warnings.warn("numba is not installed, the terrain index falls back to slow per-cell python loops",
+                          RuntimeWarning)
+        self._y, self._x = y, x = elevation.shape
+        self._elevation = np.empty((y, x))
+        self._filled = np.empty((y, x))
+        self._parent = np.full(y * x, -1, dtype=np.int64)
+        self._order = np.empty(y * x, dtype=np.int64)
+        self._labels = np.zeros(y * x, dtype=np.int64)
+        self._count = 0
+        self._dirty = np.ones((y, x), dtype=bool)
+        self._flooded = 0
+        self.update(elevation)
+
+    def invalidate(self, x, y):
+        self._dirty[y, x] = True
+
+    def update(self, elevation: "np.ndarray") -> "Terrain":
+        # re-floods only the cells an edit since the last update can have affected, everything else keeps its
+        # filled level and parent, ordering and labelling are cheap linear passes and simply redone
+        if not self._dirty.any():
+            return self
+        e, x = self._elevation, self._x
+        if self._dirty.all():
+            np.copyto(e, elevation)
+            region = np.ones((self._y, x), dtype=bool)
+        else:
+            # a cell raised without topping its filled level or lowered while under water changes no filled level
+            raised = self._dirty & (elevation > self._filled)
+            lowered = self._dirty & (elevation < e) & (e == self._filled)
+            np.copyto(e, elevation)
+            region = np.zeros(self._y * x, dtype=bool)
+            jit.affected(raised.reshape(-1), lowered.reshape(-1), e.reshape(-1), self._filled.reshape(-1),
+                         self._parent, self._order, self._labels, x, region)
+            region = region.reshape(self._y, x)
+        self._flood(region)
+        self._count = jit.drainage(e.reshape(-1), self._filled.reshape(-1), self._parent, x, self._order,
+                                   self._labels)
+        if self._count < 0:
+            # the kept parents should never lead back into the re-flooded cells, if they do everything is redone
+            self._flood(np.ones((self._y, x), dtype=bool))
+            self._count = jit.drainage(e.reshape(-1), self._filled.reshape(-1), self._parent, x, self._order,
+                                       self._labels)
+        self._dirty[...] = False
+
+        depth = (self._filled - e).reshape(-1)
+        self._capacity = np.bincount(self._labels, weights=depth, minlength=self._count + 1)
+        self._capacity[0] = 0
+        # cells of every depression sorted by elevation, and the first of its exits, the cells draining out of it
+        cells = np.flatnonzero(self._labels)
+        self._cells = cells[np.lexsort((e.reshape(-1)[cells], self._labels[cells]))]
+        self._starts = np.searchsorted(self._labels[self._cells], np.arange(1, self._count + 1))
+        exits = cells[self._labels[self._parent[cells]] != self._labels[cells]]
+        self._exits = exits[np.unique(self._labels[exits], return_index=True)[1]]
+        return self
+
+    def _flood(self, region):
+        self._flooded = int(region.sum())
+        if self._flooded:
+            rows, cols = np.flatnonzero(region.any(axis=1)), np.flatnonzero(region.any(axis=0))
+            jit.priorityFlood(self._elevation, region, self._filled, self._parent, rows[0], rows[-1] + 1, cols[0],
+                              cols[-1] + 1)
+
+    @property
+    def flooded(self):
+        # cells the last update re-flooded
+        return self._flooded
+
+    @property
+    def filled(self) -> "np.ndarray":
+        return self._filled
+
+    @property
+    def depth(self) -> "np.ndarray":
+        return self._filled - self._elevation
+
+    @property
+    def parent(self) -> "np.ndarray":
+        return self._parent.reshape(self._y, self._x)
+
+    @property
+    def directions(self) -> "np.ndarray":
+        # 0 at the outlets, otherwise 1 + the index of the way out in DIRECTIONS
+        c, p = np.arange(self._y * self._x), self._parent
+        out = np.zeros(c.shape, dtype=np.int8)
+        for code, step in enumerate((-1, 1, -self._x, self._x), 1):
+            out[(p >= 0) & (p == c + step)] = code
+        return out.reshape(self._y, self._x)
+
+    @property
+    def labels(self) -> "np.ndarray":
+        # 0 outside depressions, depressions are numbered from 1
+        return self._labels.reshape(self._y, self._x)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def capacity(self) -> "np.ndarray":
+        # per label, the water a depression holds before it spills
+        return self._capacity
+
+    @property
+    def spill(self) -> "np.ndarray":
+        return np.concatenate([[np.nan], self._filled.reshape(-1)[self._cells[self._starts]]])
+
+    @property
+    def sinks(self) -> "np.ndarray":
+        # per label, the flat index of the lowest cell, -1 for label 0
+        return np.concatenate([[-1], self._cells[self._starts]])
+
+    @property
+    def pours(self) -> "np.ndarray":
+        # per label, the flat index of a cell the depression spills into, -1 for label 0
+        return np.concatenate([[-1], self._parent[self._exits]])
+
+    def settle(self, volume: "np.ndarray") -> "np.ndarray":
+        # where water comes to rest: every cell's volume runs down the drainage tree, a depression keeps what reaches
+        # it up to its capacity, ponded at one level, and passes the rest on from its pour point, water reaching the
+        # grid edge stays in the edge cell it arrives at since the basin is walled
+        *n, y, x = volume.shape
+        out = np.array(volume, dtype=np.float64).reshape(-1, y * x)
+        cells, starts = self._cells, self._starts
+        labels, b = self._labels[cells], self._elevation.reshape(-1)[cells]
+        # below[i] sums the elevation of the cells up to i in its depression, need[i] lifts those to the level b[i]
+        sums = np.cumsum(b)
+        first = starts[labels - 1]
+        below = sums - sums[first] + b[first]
+        need = (np.arange(len(cells)) - first + 1) * b - below
+        for v in out:
+            stored = np.zeros(self._count + 1)
+            jit.route(v, self._order, self._parent, self._labels, self._capacity, stored)
+            if not self._count:
+                continue
+            wet = np.add.reduceat(need <= stored[labels], starts, dtype=np.int64)
+            level = (stored[1:] + below[starts + wet - 1]) / wet
+            np.minimum(level, self.spill[1:], out=level)
+            v[cells] += np.maximum(level[labels - 1] - b, 0)
+        return out.reshape(volume.shape)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from flosim import Basin, RainLayer, SparseRainLayer
+
+
+def build(n=96, **kwargs):
+    basin = Basin(n, n, **kwargs)
+    basin.setElevation(slice(0, n), slice(0, n), np.random.default_rng(2).random((n, n)) * 2)
+    basin.setVelR(slice(60, 64), slice(20, 24), 0.2)
+    basin.addLayer(rain := RainLayer(n, n))
+    rain.setFill(slice(60, 64), slice(20, 24), 0.5)
+    return basin, rain
+
+
+def test_active_tiles_match_full_grid():
+    (full, r1), (tiled, r2) = build(maxIter=8), build(maxIter=8, tileSize=8)
+    for i in range(30):
+        if i == 15:
+            r1.removeFill(slice(60, 64), slice(20, 24))
+            r2.removeFill(slice(60, 64), slice(20, 24))
+        full.tick(0.5)
+        tiled.tick(0.5)
+    assert tiled.active.sum() < tiled.active.size
+    assert np.allclose(full[:], tiled[:], rtol=0, atol=1e-12)
+
+
+def test_odd_tiles_and_distant_storms():
+    # windows of odd tile sizes, two storms apart are solved in two windows
+    for backend in ("numpy", "numba"):
+        kwargs = dict(maxIter=8, backend=backend)
+        (full, _), (tiled, _) = build(**kwargs), build(tileSize=7, **kwargs)
+        for basin in (full, tiled):
+            basin.addLayer(spring := SparseRainLayer(96, 96))
+            spring.setFill([5], [85], 1.)
+        for _ in range(20):
+            full.tick(0.5)
+            tiled.tick(0.5)
+        windows = tiled._activeWindows()
+        assert len(windows) == 2 and sum(tiled[w].size for w in windows) < tiled[:].size / 2
+        assert np.allclose(full[:], tiled[:], rtol=0, atol=1e-12), backend
+
+
+if __name__ == '__main__':
+    test_active_tiles_match_full_grid()
+    test_odd_tiles_and_distant_storms()
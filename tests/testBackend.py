@@ -0,0 +1,67 @@
+import numpy as np
+
+from flosim import Basin, RainLayer, GutterLayer, EvaporationLayer, ReservoirLayer, jit
+from flosim.basin import Accumulator
+from flosim.func import surr, velAct
+
+
+def basin(backend, x=48, y=32):
+    rng = np.random.default_rng(7)
+    b = Basin(x, y, backend=backend)
+    b.setElevation(slice(0, x), slice(0, y), rng.random((y, x)) * 3)
+    b.setVelR(slice(4, 9), slice(4, 9), 0.3)
+    b.setVelU(slice(4, 9), slice(4, 9), 0.2)
+    b.addLayer(rl := RainLayer(x, y))
+    b.addLayer(gl := GutterLayer(x, y))
+    b.addLayer(rs := ReservoirLayer(x, y, 0.4))
+    b.addLayer(EvaporationLayer(x, y, 0.05))
+    rl.setFill(slice(20, 30), slice(10, 20), 0.3)
+    gl.setDrain(slice(0, 4), slice(0, 4), 0.2)
+    rs.setMask(slice(40, 44), slice(25, 30))
+    return b
+
+
+def test_kernel_parity():
+    rng = np.random.default_rng(3)
+    e, w = rng.random((2, 17, 23))
+    w[4, 5:9] = w[4, 4]
+    e[4, 5:9] = e[4, 4]
+    vx, vy = rng.random((2, 2, 17, 23))
+    assert np.allclose(jit.surr(e, w, np.empty_like(w)), surr(e, w), rtol=0, atol=1e-12)
+    assert np.allclose(jit.velAct(w, vx, vy, 0.3, np.empty_like(w)), velAct(e, w, vx, vy, 0.3), rtol=0, atol=1e-12)
+
+
+def test_layer_parity():
+    # the compiled accumulation of the built-in layers, also run as plain python where numba is missing
+    x, y = 23, 17
+    rng = np.random.default_rng(4)
+    WM = rng.random((y, x)) * 0.6
+    rain, gutter, evaporation, reservoir = (RainLayer(x, y), GutterLayer(x, y), EvaporationLayer(x, y, 0.3),
+                                            ReservoirLayer(x, y, 0.4))
+    rain.setFill(slice(2, 9), slice(3, 7), 0.5)
+    gutter.setDrain(slice(5, 20), slice(0, 12), 0.7)
+    reservoir.setMask(slice(0, 15), slice(6, 17))
+    for layer in (rain, gutter, evaporation, reservoir):
+        accs = [Accumulator(*np.zeros((2, y, x)), *np.zeros((2, 2, y, x)), np.zeros((y, x), dtype=bool), jit=j)
+                for j in (False, True)]
+        for acc in accs:
+            layer.accumulate(acc, WM, None, None, None, tick=0.5)
+        assert np.array_equal(accs[0].dW, accs[1].dW), type(layer).__name__
+
+
+def test_tick_parity():
+    if not jit.AVAILABLE:
+        return
+    a, b = basin("numpy"), basin("numba")
+    assert b.backend == "numba"
+    for _ in range(40):
+        a.tick(0.5)
+        b.tick(0.5)
+    assert np.allclose(a[:], b[:], rtol=1e-9, atol=1e-9)
+    assert a.iterations == b.iterations
+
+
+if __name__ == '__main__':
+    test_kernel_parity()
+    test_layer_parity()
+    test_tick_parity()
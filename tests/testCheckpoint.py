@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from flosim import checkpoint, Basin, EnsembleBasin, RainLayer, GutterLayer, EvaporationLayer, ReservoirLayer
+
+
+def build(basin, x, y, **kwargs):
+    basin.addLayer(rain := RainLayer(x, y, **kwargs))
+    basin.addLayer(gutter := GutterLayer(x, y, **kwargs))
+    basin.addLayer(EvaporationLayer(x, y, 0.2, **kwargs))
+    basin.addLayer(reservoir := ReservoirLayer(x, y, 0.4, **kwargs))
+    basin.setElevation(slice(0, x), slice(0, y), np.linspace(0, 2, x))
+    rain.setFill(slice(2, 9), slice(3, 7), 0.5)
+    gutter.setDrain(slice(20, 24), slice(10, 14), 0.3)
+    reservoir.setMask(slice(12, 14), slice(1, 3))
+    basin.setVelL(slice(10, 20), slice(0, y), 0.1)
+    return basin
+
+
+def test_resume():
+    x, y = 31, 23
+    for basin in (build(Basin(x, y, tileSize=8), x, y),
+                  build(EnsembleBasin(3, x, y, sharedElevation=False), x, y, members=3)):
+        for _ in range(5):
+            basin.tick(0.5)
+        with tempfile.TemporaryDirectory() as path:
+            basin.checkpoint(path + "/a")
+            future = basin.checkpoint(path + "/b", background=True)
+            restored = type(basin).restore(path + "/a")
+            future.result()
+            forked = Basin.restore(path + "/b")
+            assert type(forked) is type(basin)
+            assert restored.time == basin.time and restored.ticks == basin.ticks
+            assert [type(layer) for layer in restored._layers] == [type(layer) for layer in basin._layers]
+            for _ in range(5):
+                basin.tick(0.5)
+                restored.tick(0.5)
+                forked.tick(0.5)
+            assert np.array_equal(restored[:], basin[:])
+            assert np.array_equal(forked[:], basin[:])
+            restored._layers[0].setFill(slice(0, 3), slice(0, 3), 1.0)
+            assert not Basin.restore(path + "/a")._layers[0][..., 0, 0].any()
+
+
+def test_restore_maps_fields():
+    # the restored basin works on the checkpointed files directly, nothing is allocated for them and copied over
+    basin = build(Basin(31, 23), 31, 23)
+    basin.tick(0.5)
+    with tempfile.TemporaryDirectory() as path:
+        basin.checkpoint(path + "/a")
+        restored = Basin.restore(path + "/a")
+        for field in ("BM", "WM", "SVX", "SVY"):
+            assert isinstance(getattr(restored, f"_{field}"), np.memmap), field
+        assert np.array_equal(restored[:], basin[:])
+
+
+class Custom(RainLayer):
+    pass
+
+
+@checkpoint.register
+class Registered(RainLayer):
+    pass
+
+
+def test_only_flosim_classes():
+    basin = build(Basin(31, 23), 31, 23)
+    with tempfile.TemporaryDirectory() as path:
+        basin.checkpoint(path + "/a")
+        with open(path + "/a/header.json") as f:
+            header = json.load(f)
+        for name, where in (("os:system", "class"), ("flosim.checkpoint:write", "class"), ("flosim:Basin", "layer"),
+                            ("builtins:dict", "layer")):
+            tampered = json.loads(json.dumps(header))
+            if where == "class":
+                tampered["class"] = name
+            else:
+                tampered["layers"][0]["class"] = name
+            with open(path + "/a/header.json", "w") as f:
+                json.dump(tampered, f)
+            try:
+                Basin.restore(path + "/a")
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(name)
+        # and a basin with a layer from outside flosim is refused before anything is written
+        basin.addLayer(Custom(31, 23))
+        try:
+            basin.checkpoint(path + "/b")
+        except TypeError:
+            pass
+        else:
+            raise AssertionError("checkpointed a layer from outside flosim")
+        assert not os.path.exists(path + "/b")
+
+
+def test_registered_classes():
+    x, y = 31, 23
+    basin = build(Basin(x, y), x, y)
+    basin.addLayer(registered := Registered(x, y))
+    registered.setFill(slice(20, 25), slice(2, 6), 0.25)
+    basin.tick(0.5)
+    with tempfile.TemporaryDirectory() as path:
+        basin.checkpoint(path + "/a")
+        restored = Basin.restore(path + "/a")
+        assert type(restored._layers[-1]) is Registered
+        basin.tick(0.5)
+        restored.tick(0.5)
+        assert np.array_equal(restored[:], basin[:])
+        # a class registered under the same name does not stand in for another
+        basin.addLayer(type("Registered", (RainLayer,), {"__module__": __name__})(x, y))
+        try:
+            basin.checkpoint(path + "/b")
+        except TypeError:
+            pass
+        else:
+            raise AssertionError("checkpointed a class shadowing a registered one")
+
+
+if __name__ == '__main__':
+    test_resume()
+    test_restore_maps_fields()
+    test_only_flosim_classes()
+    test_registered_classes()
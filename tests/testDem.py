@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+import numpy as np
+
+from data import dem
+
+
+def write_ascii(path, z, left, bottom, size, nodata=-9999):
+    with open(path, 'w') as f:
+        f.write(f'ncols {z.shape[1]}\nnrows {z.shape[0]}\nxllcorner {left}\nyllcorner {bottom}\n'
+                f'cellsize {size}\nNODATA_value {nodata}\n')
+        np.savetxt(f, z, fmt='%.4f')
+
+
+def write_bil(path, z, left, top, size):
+    z.astype('>i2').tofile(path)
+    with open(os.path.splitext(path)[0] + '.hdr', 'w') as f:
+        f.write(f'BYTEORDER M\nLAYOUT BIL\nNROWS {z.shape[0]}\nNCOLS {z.shape[1]}\nNBANDS 1\nNBITS 16\n'
+                f'ULXMAP {left + size / 2}\nULYMAP {top - size / 2}\nXDIM {size}\nYDIM {size}\n')
+
+
+def test_dem():
+    # small chunks so the conversions go through several of them, the module default is restored afterwards
+    chunk, dem.CHUNK_BYTES = dem.CHUNK_BYTES, 4096
+    try:
+        rng = np.random.default_rng(3)
+        z = np.round(rng.random((120, 90)) * 100, 2)
+        with tempfile.TemporaryDirectory() as path:
+            cache = os.path.join(path, 'cache')
+            write_ascii(os.path.join(path, 'a.asc'), z, 100., 200., 2.)
+            write_bil(os.path.join(path, 'b.bil'), (z * 10).astype(int), 100., 440., 2.)
+
+            raster = dem.load(os.path.join(path, 'a.asc'), cache)
+            assert isinstance(raster.data, np.memmap) and raster.bounds == (100., 200., 280., 440.)
+            assert np.allclose(raster.data, z, atol=1e-4)
+            bil = dem.load(os.path.join(path, 'b.bil'))
+            assert bil.bounds == raster.bounds and np.array_equal(bil.data, (z * 10).astype(int))
+
+            mean = dem.elevation(os.path.join(path, 'a.asc'), (40, 30), cache=cache)
+            assert np.allclose(mean, z.reshape(40, 3, 30, 3).mean(axis=(1, 3)), atol=1e-4)
+            assert len(os.listdir(cache)) == 2
+            assert np.array_equal(dem.elevation(os.path.join(path, 'a.asc'), (40, 30), cache=cache), mean)
+
+            # crop to rows 10:70 and columns 30:60 of the grid
+            crop = dem.elevation(os.path.join(path, 'b.bil'), (20, 10), bbox=(160., 300., 220., 420.), cache=None)
+            assert np.allclose(crop, (z * 10).astype(int)[10:70, 30:60].reshape(20, 3, 10, 3).mean(axis=(1, 3)))
+
+            ramp = dem.Raster(np.add.outer(np.arange(50.) * 2, np.arange(40.)), 0, 50, 1, 1)
+            up = dem.bilinear(ramp, (100, 80))
+            cy, cx = (np.arange(100) + 0.5) / 2 - 0.5, (np.arange(80) + 0.5) / 2 - 0.5
+            assert np.allclose(up, np.add.outer(np.clip(cy, 0, 49) * 2, np.clip(cx, 0, 39)))
+
+            z[6:9, 6:9] = -9999
+            write_ascii(os.path.join(path, 'c.asc'), z, 0., 0., 1.)
+            holes = dem.elevation(os.path.join(path, 'c.asc'), (40, 30), cache=None)
+            assert np.isnan(holes[2, 2]) and np.isfinite(holes[1, 1]) and np.isfinite(holes[1:3, 1:3]).sum() == 3
+
+    finally:
+        dem.CHUNK_BYTES = chunk
+
+
+if __name__ == '__main__':
+    test_dem()
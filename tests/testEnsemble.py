@@ -0,0 +1,42 @@
+import numpy as np
+
+from flosim import Basin, EnsembleBasin, RainLayer, GutterLayer
+
+X, Y, N = 24, 18, 5
+
+
+def terrain():
+    return np.random.default_rng(5).random((Y, X)) * 2
+
+
+def test_ensemble_matches_members():
+    ensemble = EnsembleBasin(N, X, Y, maxIter=8)
+    ensemble.setElevation(slice(0, X), slice(0, Y), terrain())
+    ensemble.addLayer(rain := RainLayer(X, Y, members=N))
+    ensemble.addLayer(gutter := GutterLayer(X, Y))
+    gutter.setDrain(slice(0, 3), slice(0, 3), 0.1)
+    ensemble.setVelR(slice(2, 6), slice(2, 6), 0.2, member=1)
+
+    singles = []
+    for m in range(N):
+        basin = Basin(X, Y, maxIter=8)
+        basin.setElevation(slice(0, X), slice(0, Y), terrain())
+        basin.addLayer(r := RainLayer(X, Y))
+        basin.addLayer(g := GutterLayer(X, Y))
+        g.setDrain(slice(0, 3), slice(0, 3), 0.1)
+        if m == 1:
+            basin.setVelR(slice(2, 6), slice(2, 6), 0.2)
+        rain.setFill(slice(m, m + 4), slice(5, 9), 0.1 * (m + 1), member=m)
+        r.setFill(slice(m, m + 4), slice(5, 9), 0.1 * (m + 1))
+        singles.append(basin)
+
+    for _ in range(20):
+        ensemble.tick(0.5)
+        for basin in singles:
+            basin.tick(0.5)
+    for m, basin in enumerate(singles):
+        assert np.allclose(ensemble[m], basin[:], rtol=1e-12, atol=1e-12), m
+
+
+if __name__ == '__main__':
+    test_ensemble_matches_members()
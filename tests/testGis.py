@@ -0,0 +1,71 @@
+import json
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from data.gis import Fetcher, elevation, road
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+    failures = 0
+
+    def log_message(self, *_):
+        pass
+
+    def _reply(self, body, request):
+        if Handler.failures:
+            Handler.failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        Handler.requests.append(request)
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        locations = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['locations']
+        self._reply({'results': [{**p, 'elevation': p['latitude'] * 100 + p['longitude']} for p in locations]},
+                    ('lookup', len(locations)))
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        lat = float(query['lat'][0])
+        self._reply({'address': {'road': 'x'} if round(lat * 10) % 2 else {}}, ('reverse', 1))
+
+
+def test_fetch():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}'
+    with tempfile.TemporaryDirectory() as path:
+        kwargs = dict(elevation_url=url, road_url=url, workers=4, batch=7, backoff=0, cache=path + '/gis.sqlite')
+        Handler.failures = 2
+        with Fetcher(**kwargs) as fetcher:
+            ele = elevation(10, 20, 11, 20.5, fetcher=fetcher)
+            lat, lon = np.mgrid[10:11:.1, 20:20.5:.1]
+            assert ele.shape == (10, 5) and np.allclose(ele, lat * 100 + lon)
+            assert sum(n for kind, n in Handler.requests if kind == 'lookup') == 50
+            assert max(n for _, n in Handler.requests) == 7
+            is_road = road(10, 20, 10.4, 20.2, fetcher=fetcher)
+            assert np.array_equal(is_road, np.round(np.mgrid[10:10.4:.1, 20:20.2:.1][0] * 10) % 2)
+
+        # a fresh fetcher answers from the on-disk cache
+        Handler.requests.clear()
+        with Fetcher(**kwargs) as fetcher:
+            assert np.array_equal(elevation(10, 20, 11, 20.5, fetcher=fetcher), ele)
+            assert np.array_equal(road(10, 20, 10.4, 20.2, fetcher=fetcher), is_road)
+        assert not Handler.requests
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    test_fetch()
@@ -0,0 +1,135 @@
+import tracemalloc
+
+import numpy as np
+
+from flosim import Basin, jit
+from flosim.func import Workspace, surr, velAct
+
+
+# the padded kernels of the first release, the buffered ones must give the same results
+def padSurr(e, w):
+    h = np.pad(e + w, ((1, 1), (1, 1)), 'constant', constant_values=float("inf"))
+    # the padded corners give inf - inf, they are never read
+    with np.errstate(invalid="ignore"):
+        lr = h[:, :-1] - h[:, 1:]
+        ud = h[:-1, :] - h[1:, :]
+    l = lr[1:-1, :-1] <= 0
+    r = lr[1:-1, 1:] >= 0
+    u = ud[:-1, 1:-1] <= 0
+    d = ud[1:, 1:-1] >= 0
+
+    s = np.pad((w * l)[:, 1:], ((0, 0), (0, 1))) / 4 + \
+        np.pad((w * r)[:, :-1], ((0, 0), (1, 0))) / 4 + \
+        np.pad((w * u)[1:, :], ((0, 1), (0, 0))) / 4 + \
+        np.pad((w * d)[:-1, :], ((1, 0), (0, 0))) / 4
+    agr = 4 - (l.astype(np.int8) + r.astype(np.int8) + u.astype(np.int8) + d.astype(np.int8))
+    return s + agr * w / 4
+
+
+def padVelAct(e, w, vx, vy, k):
+    fx = w * vx * k
+    fy = w * vy * k
+    l = np.pad(fx[0, :, 1:], ((0, 0), (0, 1)))
+    r = np.pad(fx[1, :, :-1], ((0, 0), (1, 0)))
+    u = np.pad(fy[0, 1:], ((0, 1), (0, 0)))
+    d = np.pad(fy[1, :-1], ((1, 0), (0, 0)))
+    return l + r + u + d - fx.sum(axis=0) - fy.sum(axis=0)
+
+
+def grids(rng, y, x):
+    # terraced elevation so neighbours tie, a third of the cells dry, and whole dry or flat rows at the edges
+    e = np.round(rng.random((y, x)) * 4) / 2
+    w = rng.random((y, x)) * (rng.random((y, x)) > 0.3)
+    w[0] = 0
+    e[-1] = e[-1, 0]
+    w[-1] = w[-1, 0]
+    vx, vy = rng.random((2, 2, y, x))
+    return e, w, vx, vy
+
+
+SHAPES = [(1, 1), (1, 7), (9, 1), (2, 2), (5, 8), (17, 23), (32, 31)]
+
+
+def test_surr():
+    rng = np.random.default_rng(11)
+    big = Workspace((32, 31))
+    for y, x in SHAPES:
+        for _ in range(20):
+            e, w, *_ = grids(rng, y, x)
+            expected = padSurr(e, w)
+            assert np.allclose(surr(e, w), expected, rtol=0, atol=1e-12), (y, x)
+            # a view of a larger workspace, and out aliasing w
+            ws, alias = big.view((y, x)), w.copy()
+            assert surr(e, alias, out=alias, ws=ws) is alias
+            assert np.allclose(alias, expected, rtol=0, atol=1e-12), (y, x)
+            if jit.AVAILABLE:
+                assert np.allclose(jit.surr(e, w, np.empty_like(w)), expected, rtol=0, atol=1e-12), (y, x)
+
+
+def test_velAct():
+    rng = np.random.default_rng(12)
+    big = Workspace((32, 31))
+    for y, x in SHAPES:
+        for _ in range(20):
+            e, w, vx, vy = grids(rng, y, x)
+            expected = padVelAct(e, w, vx, vy, 0.3)
+            assert np.allclose(velAct(e, w, vx, vy, 0.3), expected, rtol=0, atol=1e-12), (y, x)
+            out = np.full_like(w, np.nan)
+            assert velAct(e, w, vx, vy, 0.3, out=out, ws=big.view((y, x))) is out
+            assert np.allclose(out, expected, rtol=0, atol=1e-12), (y, x)
+            if jit.AVAILABLE:
+                got = jit.velAct(w, vx, vy, 0.3, np.empty_like(w))
+                assert np.allclose(got, expected, rtol=0, atol=1e-12), (y, x)
+
+
+def test_stacked():
+    # a leading member axis is the same as every member on its own
+    rng = np.random.default_rng(13)
+    e, w, vx, vy = (np.stack(a) for a in zip(*(grids(rng, 12, 9) for _ in range(3))))
+    s, v = surr(e, w), velAct(e, w, vx, vy, 0.3)
+    for m in range(3):
+        assert np.allclose(s[m], padSurr(e[m], w[m]), rtol=0, atol=1e-12), m
+        assert np.allclose(v[m], padVelAct(e[m], w[m], vx[m], vy[m], 0.3), rtol=0, atol=1e-12), m
+
+
+def peak(foo):
+    foo()
+    tracemalloc.start()
+    foo()
+    size = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size
+
+
+def test_own_buffers():
+    # called without a workspace a kernel allocates only the scratch it uses, beyond what it takes with one
+    rng = np.random.default_rng(15)
+    e, w, vx, vy = grids(rng, 64, 64)
+    ws, out = Workspace(w.shape), np.empty_like(w)
+    for kernel, name in ((lambda **kw: surr(e, w, **kw), "surr"), (lambda **kw: velAct(e, w, vx, vy, 0.3, **kw),
+                                                                   "velAct")):
+        own = Workspace(w.shape, kernels=(name,))
+        scratch = sum(a.nbytes for a in vars(own).values() if isinstance(a, np.ndarray)) + out.nbytes
+        assert peak(kernel) - peak(lambda: kernel(out=out, ws=ws)) <= scratch * 1.05, name
+    assert own.h is None and own.view((4, 4)).h is None and own.view((4, 4)).fx.shape == (2, 4, 4)
+
+
+def test_diffuse():
+    # the public step leaves its arguments alone, as the first release's did
+    rng = np.random.default_rng(14)
+    e, w, *_ = grids(rng, 17, 23)
+    for backend in ("numpy", "numba"):
+        basin = Basin(23, 17, backend=backend, maxElv=100)
+        basin.setElevation(slice(0, 23), slice(0, 17), e)
+        dex, ndex = w.copy(), w * 0.5
+        got = basin.diffuse(dex, ndex, 0.3)
+        assert np.allclose(got, (w + 0.3 * padSurr(e, w * 0.5)) / 1.3, rtol=0, atol=1e-12), backend
+        assert np.array_equal(dex, w) and np.array_equal(ndex, w * 0.5) and got is not ndex
+
+
+if __name__ == '__main__':
+    test_surr()
+    test_velAct()
+    test_stacked()
+    test_own_buffers()
+    test_diffuse()
@@ -0,0 +1,157 @@
+import numpy as np
+
+from flosim import Basin, ControlLayer, FillsLayer, DrainLayer, RainLayer, GutterLayer, EvaporationLayer, \
+    ReservoirLayer, jit
+from flosim.basin import Accumulator
+
+
+# layers written against the tuple protocol only, they go through ControlLayer.accumulate
+class TupleRain(FillsLayer):
+    FIELDS = "W",
+
+    def _tick(self, *_, tick: float, **__):
+        # the elevation change is outside FIELDS and must never reach the basin
+        return self._level * tick, np.ones_like(self._level), self.ZERO, self.ZERO
+
+
+class TupleGutter(DrainLayer):
+    FIELDS = "W",
+
+    def _tick(self, *_, tick: float, **__):
+        return self._level * tick, self.ZERO, self.ZERO, self.ZERO
+
+
+class TupleSource(ControlLayer):
+    # every field by default, the zeros are skipped
+    def __init__(self, x, y, rate):
+        super().__init__(x, y)
+        self._level[...] = rate
+
+    def _tick(self, WM, BM, SVX, SVY, tick):
+        return self._level * tick, self.ZERO, self.ZERO, self.ZERO
+
+
+def build(e, rain, gutter, **kwargs):
+    y, x = e.shape
+    basin = Basin(x, y, **kwargs)
+    basin.setElevation(slice(0, x), slice(0, y), e)
+    basin.setVelR(slice(5, 15), slice(5, 15), 0.2)
+    basin.addLayer(rain)
+    basin.addLayer(gutter)
+    rain.setFill(slice(4, 20), slice(6, 18), 0.3)
+    gutter.setDrain(slice(0, 5), slice(0, 5), 0.2)
+    return basin
+
+
+def test_tuple_layers_match_builtin():
+    e = np.random.default_rng(5).random((24, 30)) * 2
+    backends = ("numpy", "numba") if jit.AVAILABLE else ("numpy",)
+    for kwargs in [dict(backend=b) for b in backends] + [dict(fuseSources=True), dict(cacheLayers=False)]:
+        rain, gutter = RainLayer(30, 24), GutterLayer(30, 24)
+        a = build(e, rain, gutter, **kwargs)
+        b = build(e, TupleRain(30, 24), TupleGutter(30, 24), **kwargs)
+        assert b._fields == ("W",)
+        for i in range(30):
+            if i == 15:
+                for basin in (a, b):
+                    basin._layers[0].removeFill(slice(4, 12), slice(6, 18))
+                    basin._layers[1].setDrain(slice(20, 30), slice(20, 24), 0.1)
+            a.tick(0.5)
+            b.tick(0.5)
+            assert np.array_equal(a[:], b[:]), kwargs
+        assert np.array_equal(a.BM, b.BM) and np.array_equal(b.BM, e)
+
+
+def test_control_layer():
+    # a bare ControlLayer subclass with all FIELDS against a rain layer filled everywhere
+    e = np.random.default_rng(6).random((16, 20))
+    a, b = Basin(20, 16), Basin(20, 16)
+    for basin in (a, b):
+        basin.setElevation(slice(0, 20), slice(0, 16), e)
+    a.addLayer(rain := RainLayer(20, 16))
+    rain.setFill(slice(0, 20), slice(0, 16), 0.05)
+    b.addLayer(TupleSource(20, 16, 0.05))
+    assert b._fields == ControlLayer.FIELDS
+    for _ in range(20):
+        a.tick(0.5)
+        b.tick(0.5)
+    assert np.array_equal(a[:], b[:])
+    assert np.array_equal(a.BM, b.BM)
+    # eta halves every tick
+    assert np.isclose(b.mass(), 0.05 * 0.5 * 0.5 * 20 * 20 * 16)
+
+
+def accumulator(y, x):
+    return Accumulator(*np.zeros((2, y, x)), *np.zeros((2, 2, y, x)), np.zeros((y, x), dtype=bool))
+
+
+def test_scaled_cache():
+    acc, rain = accumulator(6, 8), RainLayer(8, 6)
+    rain.setFill(slice(0, 4), slice(0, 3), 0.2)
+    first = acc.scaled(rain, 0.5).copy()
+    assert np.array_equal(first, rain[...] * 0.5)
+    # every setter bumps the version, so the cached grid follows it
+    version = rain.version
+    rain.setFill(7, 5, 0.4)
+    assert rain.version > version
+    assert np.array_equal(acc.scaled(rain, 0.5), rain[...] * 0.5)
+    rain.removeFill(slice(0, 4), slice(0, 3))
+    assert np.array_equal(acc.scaled(rain, 0.5), rain[...] * 0.5)
+    # and so does the tick
+    assert np.array_equal(acc.scaled(rain, 0.25), rain[...] * 0.25)
+    # a direct edit of the grid is only seen once the layer is touched
+    rain._level[2, 2] = 1.
+    assert acc.scaled(rain, 0.25)[2, 2] == 0
+    rain.touch()
+    assert acc.scaled(rain, 0.25)[2, 2] == 0.25
+    rain.clear()
+    assert not acc.scaled(rain, 0.25).any()
+
+
+def test_fused_cache():
+    acc, a, b = accumulator(6, 8), RainLayer(8, 6), RainLayer(8, 6)
+    a.setFill(slice(0, 4), slice(0, 3), 0.2)
+    b.setFill(slice(2, 8), slice(1, 6), 0.1)
+    assert np.allclose(acc.fused([a, b], 0.5), (a[...] + b[...]) * 0.5)
+    b.setFill(0, 0, 0.7)
+    assert np.allclose(acc.fused([a, b], 0.5), (a[...] + b[...]) * 0.5)
+    b._level[5, 7] = 3.
+    assert np.allclose(acc.fused([a, b], 0.5)[5, 7], 0.05)
+    b.touch()
+    assert np.allclose(acc.fused([a, b], 0.5), (a[...] + b[...]) * 0.5)
+    assert np.allclose(acc.fused([a], 0.5), a[...] * 0.5)
+    assert np.allclose(acc.fused([a, b], 0.1), (a[...] + b[...]) * 0.1)
+
+
+def test_fused_sources_match():
+    # only the order rain is summed in changes, the drains and the reservoir still see the same water
+    e = np.random.default_rng(7).random((24, 30)) * 2
+    basins = []
+    for fuse in (False, True):
+        basin = Basin(30, 24, fuseSources=fuse)
+        basin.setElevation(slice(0, 30), slice(0, 24), e)
+        for layer in (RainLayer(30, 24), RainLayer(30, 24), GutterLayer(30, 24), EvaporationLayer(30, 24, 0.1),
+                      ReservoirLayer(30, 24, 0.5)):
+            basin.addLayer(layer)
+        basin._layers[0].setFill(slice(4, 20), slice(6, 18), 0.3)
+        basin._layers[1].setFill(slice(10, 30), slice(0, 12), 0.1)
+        basin._layers[2].setDrain(slice(0, 5), slice(0, 5), 0.2)
+        basin._layers[4].setMask(slice(25, 28), slice(18, 22))
+        basins.append(basin)
+    for i in range(40):
+        for basin in basins:
+            if i == 10:
+                basin._layers[0].removeFill(slice(4, 12), slice(6, 18))
+            if i == 20:
+                basin._layers[1]._level[:, 20:] = 0.5
+                basin._layers[1].touch()
+            basin.tick(0.5 if i < 30 else 0.25)
+        assert np.allclose(basins[0][:], basins[1][:], rtol=0, atol=1e-12), i
+
+
+if __name__ == '__main__':
+    test_tuple_layers_match_builtin()
+    test_control_layer()
+    test_scaled_cache()
+    test_fused_cache()
+    test_fused_sources_match()
@@ -0,0 +1,55 @@
+import numpy as np
+
+from flosim import Basin, EnsembleBasin, RainLayer
+from flosim.observe import Gauges, Regions, Sections, Volume
+
+
+def test_observers_match_frames():
+    x, y = 30, 20
+    for basin, members in ((Basin(x, y), None), (EnsembleBasin(2, x, y), 2)):
+        basin.setVelR(slice(0, x), slice(0, y), 0.3)
+        basin.addLayer(rain := RainLayer(x, y, members=members))
+        rain.setFill(slice(0, 4), slice(0, y), 0.2)
+        labels = np.zeros((y, x), dtype=int)
+        labels[:, :10], labels[:, 10:] = 1, 2
+        basin.addHook(gauges := Gauges([1, 29, 5], [0, 19, 10], capacity=5))
+        basin.addHook(regions := Regions(labels))
+        basin.addHook(masks := Regions([labels == 1, labels > 0]))
+        basin.addHook(sections := Sections([(x - 1, slice(0, y), "R"), (slice(0, x), 0, "U"), (9, slice(0, y), "R")]))
+        basin.addHook(volume := Volume())
+
+        frames = []
+        for _ in range(12):
+            basin.tick(0.5)
+            frames.append(basin[:].copy())
+        frames = np.array(frames)
+
+        assert len(gauges) == 5 and np.allclose(gauges.times, np.arange(8, 13) * 0.5)
+        assert np.array_equal(gauges.values, frames[-5:][..., [0, 19, 10], [1, 29, 5]])
+        assert np.allclose(regions.values[..., 0], frames[..., :10].sum(axis=(-2, -1)))
+        assert np.allclose(masks.values[..., 1], frames.sum(axis=(-2, -1)))
+        assert np.allclose(volume.values[..., 0], frames.sum(axis=(-2, -1)))
+
+        w, vx = frames[-1], basin._SVX
+        outlet = (w[..., x - 1] * vx[..., 1, :, x - 1]).sum(axis=-1) * 0.5
+        inner = (w[..., 9] * vx[..., 1, :, 9] - w[..., 10] * vx[..., 0, :, 10]).sum(axis=-1) * 0.5
+        assert np.allclose(sections.values[-1], np.stack([outlet, np.zeros_like(outlet), inner], axis=-1))
+
+
+def test_float32_volume():
+    # the hydrograph of a single precision basin is summed and kept in double precision
+    x, y = 64, 48
+    basin = Basin(x, y, dtype=np.float32)
+    basin.addLayer(rain := RainLayer(x, y, dtype=np.float32))
+    rain.setFill(slice(0, x), slice(0, y), 0.1)
+    basin.addHook(volume := Volume())
+    basin.addHook(gauges := Gauges([3], [4]))
+    for _ in range(3):
+        basin.tick(0.5)
+    assert volume.values.dtype == np.float64 and gauges.values.dtype == np.float32
+    assert np.array_equal(volume.values[-1], [basin[:].sum(dtype=np.float64)])
+
+
+if __name__ == '__main__':
+    test_observers_match_frames()
+    test_float32_volume()
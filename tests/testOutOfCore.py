@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+import numpy as np
+
+from flosim import Basin, OutOfCoreBasin, RainLayer, GutterLayer, SparseRainLayer
+
+
+def build(basin, x, y):
+    rng = np.random.default_rng(3)
+    basin.setElevation(slice(0, x), slice(0, y), rng.random((y, x)) * 2)
+    basin.setVelR(slice(0, x // 2), slice(0, y), 0.1)
+    basin.setVelD(slice(0, x), slice(y // 3, y), 0.05)
+    basin.addLayer(rain := RainLayer(x, y))
+    rain.setFill(slice(2, 8), slice(0, y), 0.3)
+    basin.addLayer(gutter := GutterLayer(x, y))
+    gutter.setDrain(slice(x - 5, x), slice(y - 6, y), 0.1)
+    basin.addLayer(spring := SparseRainLayer(x, y))
+    spring.setFill([x - 3, 4], [2, y - 2], 1.)
+    return basin
+
+
+def test_matches_in_core():
+    x, y = 24, 45
+    for backend in ("numpy", "numba"):
+        with tempfile.TemporaryDirectory() as path:
+            ref = build(Basin(x, y, maxIter=6, backend=backend), x, y)
+            with OutOfCoreBasin(x, y, path, band=7, maxIter=6, backend=backend) as ooc:
+                build(ooc, x, y)
+                # nothing but one band with its halo is ever held in memory
+                assert ooc._ws.q.shape == (7 + 2 * 7, x) and ooc._dW.shape == (7, x)
+                assert isinstance(ooc._layers[0]._level, np.memmap)
+                assert os.path.exists(os.path.join(path, "layer0_level.npy"))
+                # layers changing only the water stream nothing but the water
+                streamed, stream = [], ooc._stream
+                ooc._stream = lambda halo, fields: streamed.append(len(fields)) or stream(halo, fields)
+                ooc._applyLayers(0.)
+                del ooc._stream
+                assert streamed == [1]
+                for _ in range(15):
+                    ref.tick(0.5)
+                    ooc.tick(0.5)
+                assert np.array_equal(ref[:], ooc[:])
+                assert ref.iterations == ooc.iterations
+                assert ref.stableStep(1.) == ooc.stableStep(1.)
+                assert ref.run(12, maxRise=0.05) == ooc.run(12, maxRise=0.05)
+                assert np.array_equal(ref[:], ooc[:]) and ref.time == ooc.time
+
+
+def test_checkpoint():
+    x, y = 24, 45
+    with tempfile.TemporaryDirectory() as path:
+        with OutOfCoreBasin(x, y, path + "/a", band=7, maxIter=6) as ooc:
+            build(ooc, x, y)
+            for _ in range(5):
+                ooc.tick(0.5)
+            ooc.checkpoint(path + "/c")
+            # restoring onto the files of a live basin would truncate them
+            for restore in (lambda: OutOfCoreBasin.restore(path + "/c"), lambda: Basin.restore(path + "/c"),
+                            lambda: OutOfCoreBasin.restore(path + "/c", path + "/a/")):
+                try:
+                    restore()
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError("restored onto the files of a live basin")
+            with OutOfCoreBasin.restore(path + "/c", path + "/b") as restored:
+                assert restored.time == ooc.time and restored._band == 7
+                assert np.array_equal(restored[:], ooc[:])
+                for _ in range(5):
+                    ooc.tick(0.5)
+                    restored.tick(0.5)
+                assert np.array_equal(restored[:], ooc[:])
+            for call in (lambda: ooc.terrain, lambda: ooc.fastForward(1.)):
+                try:
+                    call()
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError("flood filled out of core")
+        # once closed its directory may be mapped again
+        OutOfCoreBasin.restore(path + "/c").close()
+
+
+if __name__ == '__main__':
+    test_matches_in_core()
+    test_checkpoint()
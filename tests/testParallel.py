@@ -0,0 +1,30 @@
+import numpy as np
+
+from flosim import Basin, ParallelBasin, RainLayer, GutterLayer
+
+
+def build(cls, x=40, y=37, **kwargs):
+    rng = np.random.default_rng(11)
+    basin = cls(x, y, **kwargs)
+    basin.setElevation(slice(0, x), slice(0, y), rng.random((y, x)) * 3)
+    basin.setVelD(slice(10, 14), slice(5, 9), 0.3)
+    basin.addLayer(rl := RainLayer(x, y))
+    basin.addLayer(gl := GutterLayer(x, y))
+    rl.setFill(slice(5, 30), slice(10, 12), 0.2)
+    gl.setDrain(slice(0, 5), slice(30, 37), 0.1)
+    return basin
+
+
+def test_parallel_matches_serial():
+    for kwargs in ({}, {"tol": 1e-3, "maxIter": 64}):
+        serial = build(Basin, **kwargs)
+        with build(ParallelBasin, workers=4, **kwargs) as parallel:
+            for _ in range(30):
+                serial.tick(0.5)
+                parallel.tick(0.5)
+                assert parallel.iterations == serial.iterations
+            assert np.allclose(serial[:], parallel[:], rtol=1e-12, atol=1e-12)
+
+
+if __name__ == '__main__':
+    test_parallel_matches_serial()
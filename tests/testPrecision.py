@@ -0,0 +1,32 @@
+import numpy as np
+
+from flosim import Basin, RainLayer, GutterLayer
+
+N = 64
+
+
+def run(dtype, accDtype=None, ticks=300):
+    rng = np.random.default_rng(4)
+    basin = Basin(N, N, dtype=dtype, accDtype=accDtype)
+    basin.setElevation(slice(0, N), slice(0, N), rng.random((N, N)) * 3)
+    basin.setVelR(slice(10, 20), slice(10, 20), 0.3)
+    basin.addLayer(rain := RainLayer(N, N, dtype=dtype))
+    basin.addLayer(gutter := GutterLayer(N, N, dtype=dtype))
+    rain.setFill(slice(30, 34), slice(30, 34), 0.05)
+    gutter.setDrain(slice(50, 52), slice(50, 52), 0.01)
+    for _ in range(ticks):
+        basin.tick(0.5)
+    return basin
+
+
+def test_single_precision_mass_drift():
+    reference = run(np.float64)
+    for accDtype in (None, np.float64):
+        basin = run(np.float32, accDtype)
+        assert basin[:].dtype == np.float32 and basin.BM.dtype == np.float32
+        assert abs(float(basin.mass()) - float(reference.mass())) <= 1e-5 * float(reference.mass())
+        assert np.allclose(basin[:], reference[:], rtol=0, atol=1e-3)
+
+
+if __name__ == '__main__':
+    test_single_precision_mass_drift()
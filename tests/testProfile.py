@@ -0,0 +1,63 @@
+import numpy as np
+
+from flosim import Basin, RainLayer, GutterLayer
+
+
+def test_profile_phases():
+    x, y = 40, 30
+    basin, reference = Basin(x, y), Basin(x, y)
+    for b in (basin, reference):
+        b.addLayer(rain := RainLayer(x, y))
+        rain.setFill(slice(5, 10), slice(5, 10), 0.2)
+
+    seen = []
+    profiler = basin.profile(sink=lambda p: seen.append(p.ticks), every=2, memory=True)
+    for b in (basin, reference):
+        b.addLayer(gutter := GutterLayer(x, y))
+        gutter.setDrain(slice(0, 5), slice(0, 5), 0.1)
+    for _ in range(6):
+        basin.tick(0.5)
+        reference.tick(0.5)
+    assert np.array_equal(basin[:], reference[:])
+
+    report = profiler.report()
+    assert seen == [2, 4, 6] and report["ticks"] == 6
+    assert report["iterations"] == 6 * 32
+    for phase in ("tick", "layers", "flow", "velAct", "solve", "layer0:RainLayer", "layer1:GutterLayer"):
+        assert report["phases"][phase]["calls"] == 6
+    phases = report["phases"]
+    assert phases["solve"]["seconds"] <= phases["flow"]["seconds"] <= phases["tick"]["seconds"]
+    assert phases["velAct"]["seconds"] <= phases["flow"]["seconds"]
+
+    basin.unprofile()
+    assert "_step" not in vars(basin) and not any("accumulate" in vars(layer) for layer in basin._layers)
+    basin.tick(0.5)
+    assert profiler.report()["ticks"] == 6
+
+
+def test_allocations():
+    # blocks a phase leaves allocated are counted by the line that allocated them
+    x, y = 40, 30
+    basin = Basin(x, y)
+    basin.addLayer(rain := RainLayer(x, y))
+    rain.setFill(slice(5, 10), slice(5, 10), 0.2)
+    kept, accumulate = [], rain.accumulate
+
+    def leaky(*args, **kwargs):
+        kept.append(np.empty(1000))
+        return accumulate(*args, **kwargs)
+
+    rain.accumulate = leaky
+    profiler = basin.profile(memory=True)
+    for _ in range(4):
+        basin.tick(0.5)
+    phases = profiler.report()["phases"]
+    site = f"{leaky.__code__.co_filename}:{leaky.__code__.co_firstlineno + 1}"
+    assert phases["layer0:RainLayer"]["sites"].get(site, 0) >= 4 and phases["layers"]["allocations"] >= phases["layer0:RainLayer"]["allocations"]
+    assert phases["layer0:RainLayer"]["peakBytes"] >= 8000
+    basin.unprofile()
+
+
+if __name__ == '__main__':
+    test_profile_phases()
+    test_allocations()
@@ -0,0 +1,41 @@
+import tempfile
+
+import numpy as np
+
+from flosim import Basin, RainLayer
+from flosim.record import Recorder, Recording
+
+
+def test_recording_round_trip():
+    x, y = 37, 29
+    for compress in (None, 1):
+        for background in (False, True):
+            basin = Basin(x, y)
+            basin.addLayer(rain := RainLayer(x, y))
+            rain.setFill(slice(3, 9), slice(4, 8), 0.3)
+            basin.setVelR(slice(3, 9), slice(4, 8), 0.1)
+            with tempfile.TemporaryDirectory() as path:
+                frames, vel = [], []
+                with Recorder(path, ("WM", "SVX"), every=2, chunks=(4, 10, 16),
+                              compress=compress, background=background) as recorder:
+                    basin.addHook(recorder)
+                    for i in range(1, 23):
+                        basin.tick(0.5)
+                        if i % 2 == 0:
+                            frames.append(basin[:].copy())
+                            vel.append(basin._SVX.copy())
+                        if i == 9:
+                            recorder.flush()
+                frames, vel = np.array(frames), np.array(vel)
+
+                rec = Recording(path)
+                assert len(rec) == len(frames) == 11
+                assert np.allclose(rec.times, np.arange(1, 12) * 1.0)
+                assert np.array_equal(rec.read("WM"), frames)
+                assert np.array_equal(rec.read("WM", slice(3, 9), slice(5, 22), slice(11, 30)),
+                                      frames[3:9, 5:22, 11:30])
+                assert np.array_equal(rec.read("SVX", slice(2, 7, 2), x=slice(0, 17)), vel[2:7:2, ..., :17])
+
+
+if __name__ == '__main__':
+    test_recording_round_trip()
@@ -0,0 +1,157 @@
+import tempfile
+
+import numpy as np
+
+from flosim import Basin, RainLayer
+from flosim.refine import HierarchicalBasin, restrict, prolong
+
+
+def test_patches_conserve_mass():
+    x, y, r = 32, 24, 4
+    rng = np.random.default_rng(0)
+    fine = np.add.outer(np.zeros(y * r), np.linspace(3, 0, x * r)) + rng.random((y * r, x * r)) * 0.2
+    fine[40:44, 30:60] = 8
+    basin = HierarchicalBasin(x, y, ratio=r, fineElevation=fine)
+    basin.setElevation(slice(0, x), slice(0, y), restrict(fine, r))
+    flags = np.zeros((y, x), dtype=bool)
+    flags[8:12, 6:16] = True
+    flags[9, 16] = True
+    patches = basin.refine(basin.flag(mask=flags), tile=4)
+    assert [(p.x, p.y) for p in patches] == [(slice(4, 20), slice(8, 12))]
+    assert basin.cells == x * y + 16 * 4 + 64 * 16 * r < x * y * r * r
+    assert np.array_equal(patches[0].basin.BM, fine[32:48, 16:80])
+
+    basin.addLayer(rain := RainLayer(x, y))
+    rain.setFill(slice(0, 4), slice(0, y), 0.05)
+    for _ in range(200):
+        basin.tick(0.5)
+    assert np.isclose(basin.mass(), 4 * y * 0.05 * 0.25 * 200)
+    assert np.allclose(basin[patches[0].win], restrict(patches[0][:], r))
+    # water reached the patch through its edge and the fine wall holds some of it back
+    wall = patches[0][:]
+    assert wall[:8].sum() > 0 and wall[8:12, 14:44].max() < wall[:8].max()
+    assert (basin[:] >= 0).all() and (wall >= 0).all()
+
+
+def test_unit_ratio_is_plain():
+    # a patch at the coarse resolution only moves water the coarse step would have moved
+    x, y = 32, 24
+    rng = np.random.default_rng(0)
+    e = np.add.outer(np.zeros(y), np.linspace(3, 0, x)) + rng.random((y, x)) * 0.2
+    for kwargs in ({}, dict(maxIter=4)):
+        result = []
+        for basin in (Basin(x, y, **kwargs), HierarchicalBasin(x, y, ratio=1, **kwargs)):
+            basin.setElevation(slice(0, x), slice(0, y), e)
+            basin.setVelL(slice(0, x), slice(0, y), 0.05)
+            if isinstance(basin, HierarchicalBasin):
+                basin.addPatch(slice(4, 20), slice(8, 16))
+            basin.addLayer(rain := RainLayer(x, y))
+            rain.setFill(slice(0, 8), slice(0, y), 0.05)
+            for _ in range(200):
+                basin.tick(0.5)
+            result.append(basin[:])
+        assert np.allclose(*result, rtol=0, atol=1e-12)
+
+
+def test_matches_uniform_fine():
+    # a patch over the whole grid is the uniform fine basin with its velocities in fine cells and ratio sub-steps
+    x, y, r = 16, 12, 2
+    fine = np.add.outer(np.linspace(0, 1, y * r), np.linspace(2, 0, x * r))
+    basin = HierarchicalBasin(x, y, ratio=r, fineElevation=fine)
+    basin.setVelR(slice(0, x), slice(0, y), 0.2)
+    basin.setVelD(slice(0, x), slice(0, y), 0.05)
+    basin[:][3:6, 2:5] = 1
+    patch = basin.addPatch(slice(0, x), slice(0, y))
+    uniform = Basin(x * r, y * r)
+    uniform.setElevation(slice(0, x * r), slice(0, y * r), fine)
+    uniform.setVelR(slice(0, x * r), slice(0, y * r), 0.2 * r)
+    uniform.setVelD(slice(0, x * r), slice(0, y * r), 0.05 * r)
+    uniform[:][...] = prolong(basin[:], r)
+    for _ in range(20):
+        basin.tick(1)
+        for _ in range(r):
+            uniform.tick(1 / r)
+    assert np.allclose(patch[:], uniform[:], rtol=0, atol=1e-12)
+    assert np.allclose(basin[:], restrict(uniform[:], r), rtol=0, atol=1e-12)
+
+
+def test_edits_reach_patches():
+    # edits made once the patch is in place land on the fine grid as they would on the uniform fine basin
+    x, y, r = 16, 12, 2
+    fine = np.add.outer(np.linspace(0, 1, y * r), np.linspace(2, 0, x * r))
+    basin = HierarchicalBasin(x, y, ratio=r, fineElevation=fine)
+    basin[:][3:6, 2:5] = 1
+    patch = basin.addPatch(slice(0, x), slice(0, y))
+    basin.setVelR(slice(0, x), slice(0, y), 0.2)
+    basin.setVelD(slice(0, x), slice(0, y), 0.05)
+    basin.addElevation(slice(8, 12), slice(0, 6), 0.3)
+    basin.setElevation(slice(0, 3), slice(8, 12), 0.1)
+    uniform = Basin(x * r, y * r)
+    uniform.setElevation(slice(0, x * r), slice(0, y * r), fine)
+    uniform.setVelR(slice(0, x * r), slice(0, y * r), 0.2 * r)
+    uniform.setVelD(slice(0, x * r), slice(0, y * r), 0.05 * r)
+    uniform.addElevation(slice(16, 24), slice(0, 12), 0.3)
+    uniform.setElevation(slice(0, 6), slice(16, 24), 0.1)
+    uniform[:][...] = prolong(basin[:], r)
+    assert np.allclose(patch.basin.BM, uniform.BM, rtol=0, atol=1e-12)
+    assert np.allclose(basin.BM, restrict(uniform.BM, r), rtol=0, atol=1e-12)
+    for _ in range(20):
+        basin.tick(1)
+        for _ in range(r):
+            uniform.tick(1 / r)
+    assert np.allclose(patch[:], uniform[:], rtol=0, atol=1e-12)
+    assert np.allclose(basin[:], restrict(uniform[:], r), rtol=0, atol=1e-12)
+
+
+def test_patch_keeps_pace():
+    # water carried through a patch travels as far as on the plain coarse grid
+    x, y = 48, 16
+    shift = []
+    for r in (None, 2, 4):
+        basin = Basin(x, y) if r is None else HierarchicalBasin(x, y, ratio=r)
+        basin.setVelR(slice(0, x), slice(0, y), 0.2)
+        basin[:][6:10, 10:14] = 1
+        if r is not None:
+            basin.addPatch(slice(4, 40), slice(0, y))
+        centroid = lambda: (basin[:].sum(axis=0) * np.arange(x)).sum() / basin.mass()
+        start = centroid()
+        for _ in range(20):
+            basin.tick(1)
+        shift.append(centroid() - start)
+    assert np.allclose(shift, shift[0], rtol=0.05)
+
+
+def test_checkpoint():
+    x, y, r = 16, 12, 2
+    fine = np.add.outer(np.zeros(y * r), np.linspace(2, 0, x * r)) + np.random.default_rng(0).random((y * r, x * r))
+    basin = HierarchicalBasin(x, y, ratio=r, fineElevation=fine)
+    basin.setElevation(slice(0, x), slice(0, y), restrict(fine, r))
+    basin.addPatch(slice(4, 8), slice(2, 6))
+    basin.addPatch(slice(10, 14), slice(6, 10))
+    basin.addLayer(rain := RainLayer(x, y))
+    rain.setFill(slice(0, 3), slice(0, y), 0.05)
+    for _ in range(20):
+        basin.tick(0.5)
+    with tempfile.TemporaryDirectory() as path:
+        basin.checkpoint(path + "/a")
+        restored = HierarchicalBasin.restore(path + "/a")
+    assert restored.ratio == r and [(p.x, p.y) for p in restored.patches] == [(p.x, p.y) for p in basin.patches]
+    # a patch added after the restore is seeded from the checkpointed fine elevation
+    for b in (basin, restored):
+        b.addPatch(slice(0, 4), slice(8, 12))
+    assert np.array_equal(restored.patches[-1].basin.BM, fine[16:24, 0:8])
+    for _ in range(20):
+        basin.tick(0.5)
+        restored.tick(0.5)
+    assert np.array_equal(restored[:], basin[:])
+    for p, q in zip(restored.patches, basin.patches):
+        assert np.array_equal(p[:], q[:]) and p.basin.time == q.basin.time
+
+
+if __name__ == '__main__':
+    test_patches_conserve_mass()
+    test_unit_ratio_is_plain()
+    test_matches_uniform_fine()
+    test_edits_reach_patches()
+    test_patch_keeps_pace()
+    test_checkpoint()
@@ -0,0 +1,58 @@
+import warnings
+
+import numpy as np
+
+from flosim import Basin, RainLayer, GutterLayer
+
+
+def build(x=30, y=20):
+    basin = Basin(x, y)
+    basin.setElevation(slice(0, x), slice(0, y), np.linspace(3, 0, x))
+    basin.setVelR(slice(0, x), slice(0, y), 0.4)
+    basin.addLayer(rain := RainLayer(x, y))
+    basin.addLayer(gutter := GutterLayer(x, y))
+    gutter.setDrain(slice(x - 2, x), slice(0, y), 0.5)
+    return basin, rain
+
+
+def test_run_hits_outputs():
+    basin, rain = build()
+    rain.setFill(slice(0, 5), slice(0, 20), 0.1)
+    times = []
+    steps = basin.run(10, dtMax=2.0, outputs=np.arange(1, 11) * 0.75, callback=lambda b: times.append(b.time))
+    assert times == list(np.arange(1, 11) * 0.75)
+    assert basin.time == 10 and steps == basin.ticks
+    # the velocity criterion keeps every outgoing flux below the cell content
+    assert steps >= 10 / (0.5 / (0.4 * 0.5))
+    assert (basin[:] >= 0).all()
+
+
+def test_run_adapts_to_surges():
+    basin, rain = build()
+    calm = basin.run(20, dtMax=2.0, maxRise=0.05)
+    rain.setFill(slice(0, 5), slice(0, 20), 1.0)
+    surge = basin.run(40, dtMax=2.0, maxRise=0.05)
+    assert calm == 10 and surge > 3 * calm
+    assert basin.time == 40
+
+
+def test_run_keeps_velocity_criterion():
+    # dtMin is above what the velocities allow, the criterion still holds and run warns once
+    basin, rain = build()
+    rain.setFill(slice(0, 5), slice(0, 20), 0.1)
+    basin.setVelR(slice(0, 30), slice(0, 20), 40.)
+    basin.tick(0.01)
+    stable = basin.stableStep(1.0)
+    assert stable < 0.1
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        steps = basin.run(1.01, dtMin=0.1, maxRise=0.05)
+    assert len([w for w in caught if issubclass(w.category, RuntimeWarning)]) == 1
+    assert steps >= 1 / stable
+    assert (basin[:] >= 0).all()
+
+
+if __name__ == '__main__':
+    test_run_hits_outputs()
+    test_run_adapts_to_surges()
+    test_run_keeps_velocity_criterion()
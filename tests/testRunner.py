@@ -0,0 +1,42 @@
+import numpy as np
+
+from flosim import Basin, RainLayer
+from tools.runner import SimulationRunner
+
+
+def test_runner():
+    x, y = 64, 48
+    basin = Basin(x, y)
+    basin.addLayer(rain := RainLayer(x, y))
+    runner = SimulationRunner(basin, step=0.2, publishEvery=0.01)
+    runner.start()
+    first = runner.latest()
+    assert first.ticks == 0 and runner.latest() is None
+
+    runner.edit(lambda b: rain.setFill(slice(10, 20), slice(10, 20), 0.5))
+    runner.play()
+    assert runner.wait(runner.published + 3, timeout=30)
+    runner.pause()
+    ticks = basin.ticks
+    frame = runner.latest()
+    assert ticks > 0 and 0 < frame.ticks <= ticks and frame.edits == 1
+
+    # paused, the worker still applies and publishes edits but does not tick
+    runner.edit(lambda b: None)
+    assert runner.wait(runner.published + 1, timeout=30)
+    edited = runner.latest()
+    assert basin.ticks == ticks and edited.ticks == ticks and edited.edits == 2
+
+    # a frame held by the reader is never written by the worker
+    held = edited.WM.copy()
+    runner.edit(lambda b: b.setElevation(slice(0, 5), slice(0, 5), 3))
+    runner.play()
+    assert runner.wait(runner.published + 3, timeout=30)
+    assert np.array_equal(edited.WM, held)
+    runner.close()
+    last = runner.latest()
+    assert last.edits == 3 and last.BM[0, 0] == 3 and last.ticks > edited.ticks
+
+
+if __name__ == '__main__':
+    test_runner()
@@ -0,0 +1,54 @@
+import numpy as np
+
+from flosim import Basin, RainLayer, jit
+
+
+def build(e, **kwargs):
+    y, x = e.shape
+    basin = Basin(x, y, **kwargs)
+    basin.setElevation(slice(0, x), slice(0, y), e)
+    basin.addLayer(rain := RainLayer(x, y))
+    rain.setFill(slice(x // 4, 3 * x // 4), slice(y // 4, 3 * y // 4), 0.3)
+    return basin
+
+
+def test_depth_and_mass():
+    # the solves must neither dig below the terrain nor lose water
+    e = np.random.default_rng(0).random((48, 40)) * 2
+    backends = ("numpy", "numba") if jit.AVAILABLE else ("numpy",)
+    for kwargs in [dict(backend=b) for b in backends] + [dict(tol=1e-6)]:
+        basin = build(e, **kwargs)
+        for i in range(40):
+            basin.tick(0.5)
+            assert basin[:].min() >= 0, kwargs
+        assert np.isclose(basin.mass(), 0.3 * 0.5 * 0.5 * 20 * 24 * 40, rtol=1e-12), kwargs
+
+
+def test_tolerance():
+    # on a slope the masks settle and tol ends the solves early, close to where running on would end up, once the
+    # water ponds against the wall they flip and the solves run to maxIter
+    yy, xx = np.mgrid[0:32, 0:32]
+    e = xx * 0.2 + yy * 0.05
+    loose, tight = build(e, tol=1e-6, maxIter=500), build(e, maxIter=500)
+    for _ in range(3):
+        loose.tick(0.5)
+        tight.tick(0.5)
+        assert loose.iterations < 50 and loose.residual <= 1e-6
+    assert np.allclose(loose[:], tight[:], rtol=0, atol=1e-4)
+    assert np.isclose(loose.mass(), tight.mass(), rtol=1e-12)
+
+
+def test_unknown_solver():
+    for solver in ("redblack", "multigrid"):
+        try:
+            Basin(8, 8, solver=solver)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(solver)
+
+
+if __name__ == '__main__':
+    test_depth_and_mass()
+    test_tolerance()
+    test_unknown_solver()
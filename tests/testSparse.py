@@ -0,0 +1,77 @@
+import tempfile
+
+import numpy as np
+
+from flosim import Basin, EnsembleBasin, RainLayer, GutterLayer, ReservoirLayer, \
+    SparseRainLayer, SparseGutterLayer, SparseReservoirLayer
+
+
+def build(basin, rain, gutter, reservoir, members=None):
+    m = {} if members is None else {"member": 1}
+    basin.addLayer(rain)
+    basin.addLayer(gutter)
+    basin.addLayer(reservoir)
+    rain.setFill(slice(3, 9), slice(2, 5), 0.4)
+    rain.setFill([20, 21, 22], [10, 11, 12], 0.7, **m)
+    rain.removeFill(4, 3)
+    gutter.setDrain(slice(24, 30), 15, 0.2)
+    gutter.setDrain(slice(0, 3), slice(0, 3), 0.05)
+    reservoir.setMask(slice(12, 14), slice(16, 18), **m)
+    basin.setVelR(slice(0, 30), slice(0, 20), 0.1)
+    return basin
+
+
+def test_sparse_matches_dense():
+    x, y = 30, 20
+    # layers without members act on every member of an ensemble
+    for basinMembers, members in ((None, None), (3, 3), (3, None)):
+        make = (lambda **kw: Basin(x, y, **kw)) if basinMembers is None else \
+            (lambda **kw: EnsembleBasin(basinMembers, x, y, **kw))
+        for cache in (True, False):
+            dense = build(make(cacheLayers=cache), RainLayer(x, y, members), GutterLayer(x, y, members),
+                          ReservoirLayer(x, y, 0.3, members), members)
+            sparse = build(make(cacheLayers=cache), SparseRainLayer(x, y, members), SparseGutterLayer(x, y, members),
+                           SparseReservoirLayer(x, y, 0.3, members), members)
+            for a, b in zip(dense._layers, sparse._layers):
+                assert np.array_equal(a[...], b.dense())
+            assert np.array_equal(sparse._layers[0].index, np.flatnonzero(dense._layers[0][...]))
+            for _ in range(20):
+                dense.tick(0.5)
+                sparse.tick(0.5)
+            assert np.array_equal(dense[:], sparse[:])
+            if basinMembers is not None:
+                assert (sparse.mass() > 0).all() and np.allclose(sparse.mass(), sparse.mass()[0]) == (members is None)
+
+    with tempfile.TemporaryDirectory() as path:
+        sparse.checkpoint(path + "/c")
+        restored = Basin.restore(path + "/c")
+        for _ in range(5):
+            sparse.tick(0.5)
+            restored.tick(0.5)
+        assert np.array_equal(restored[:], sparse[:])
+
+
+def test_edit_between_ticks():
+    # points added and removed while the basin runs, the cached contributions follow the set cells
+    x, y = 30, 20
+    for cache in (True, False):
+        dense = build(Basin(x, y, cacheLayers=cache), RainLayer(x, y), GutterLayer(x, y), ReservoirLayer(x, y, 0.3))
+        sparse = build(Basin(x, y, cacheLayers=cache), SparseRainLayer(x, y), SparseGutterLayer(x, y),
+                       SparseReservoirLayer(x, y, 0.3))
+        for i in range(12):
+            for basin in (dense, sparse):
+                rain, gutter, reservoir = basin._layers
+                if i % 3 == 0:
+                    rain.setFill(i, slice(5, 8), 0.2)
+                    gutter.setDrain(slice(i, i + 2), 18, 0.1)
+                elif i % 3 == 1:
+                    rain.removeFill(slice(3, 9), 3)
+                    gutter.removeDrain(slice(24, 27), 15)
+                    reservoir.setMask(i, 1)
+                basin.tick(0.5)
+            assert np.array_equal(dense[:], sparse[:]), (cache, i)
+
+
+if __name__ == '__main__':
+    test_sparse_matches_dense()
+    test_edit_between_ticks()
@@ -0,0 +1,46 @@
+import tempfile
+
+import numpy as np
+
+from flosim import Basin, RainLayer, GutterLayer
+from flosim.sweep import Sweep, summarize
+
+
+def flood(shared, params):
+    y, x = shared["BM"].shape
+    basin = Basin(x, y)
+    basin.setElevation(slice(0, x), slice(0, y), shared["BM"])
+    basin.addLayer(rain := RainLayer(x, y))
+    basin.addLayer(gutter := GutterLayer(x, y))
+    rain.setFill(slice(0, x), slice(0, y), shared["rain"] * params["rain"])
+    gutter.setDrain(slice(0, 3), slice(0, y), params["drain"])
+    return summarize(basin, 10)
+
+
+def scenarios(n):
+    for i in range(n):
+        yield f"s{i}", {"rain": 0.01 * (i + 1), "drain": 0.02 * (i % 3)}
+
+
+def test_sweep():
+    rng = np.random.default_rng(5)
+    shared = {"BM": rng.random((20, 30)) * 2, "rain": rng.random((20, 30))}
+    serial = dict((key, flood(shared, params)) for key, params in scenarios(8))
+    with tempfile.TemporaryDirectory() as journal:
+        with Sweep(flood, shared, workers=2, journal=journal, window=3) as sweep:
+            partial = {}
+            for key, result in sweep.run(scenarios(8)):
+                partial[key] = result
+                if len(partial) == 3:
+                    break
+        with Sweep(flood, shared, workers=2, journal=journal) as sweep:
+            rest = dict(sweep.run(scenarios(8)))
+            assert not rest.keys() & partial.keys() and len(rest) + len(partial) >= 8
+            for key, expected in serial.items():
+                result = rest.get(key) or sweep.load(key)
+                assert np.array_equal(result["peak"], expected["peak"])
+                assert np.array_equal(result["volume"], expected["volume"])
+
+
+if __name__ == '__main__':
+    test_sweep()
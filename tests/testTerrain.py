@@ -0,0 +1,151 @@
+import warnings
+
+import numpy as np
+
+from flosim import Basin, EnsembleBasin, Terrain, RainLayer, SparseRainLayer, jit
+
+
+def brute(e):
+    # lowest level at which water leaves every cell over the grid edge, by relaxation
+    f = np.full_like(e, np.inf)
+    f[0], f[-1], f[:, 0], f[:, -1] = e[0], e[-1], e[:, 0], e[:, -1]
+    while True:
+        n = np.full_like(e, np.inf)
+        n[:, 1:] = np.minimum(n[:, 1:], f[:, :-1])
+        n[:, :-1] = np.minimum(n[:, :-1], f[:, 1:])
+        n[1:] = np.minimum(n[1:], f[:-1])
+        n[:-1] = np.minimum(n[:-1], f[1:])
+        g = np.minimum(f, np.maximum(e, n))
+        if np.array_equal(g, f):
+            return f
+        f = g
+
+
+def test_fill_and_incremental():
+    rng = np.random.default_rng(1)
+    y, x = 40, 50
+    basin = Basin(x, y, maxElv=100)
+    basin.setElevation(slice(0, x), slice(0, y), rng.random((y, x)) * 5)
+    terrain = basin.terrain
+    assert np.array_equal(terrain.filled, brute(basin.BM))
+    # every cell leaves through its parent at its filled level
+    c, p = np.arange(x * y), terrain.parent.reshape(-1)
+    inner = p >= 0
+    assert np.isin(np.abs(p[inner] - c[inner]), (1, x)).all()
+    assert np.array_equal(terrain.filled.reshape(-1)[inner],
+                          np.maximum(basin.BM.reshape(-1), terrain.filled.reshape(-1)[p])[inner])
+    assert (terrain.directions > 0).sum() == inner.sum()
+    assert np.isclose(terrain.capacity.sum(), terrain.depth.sum())
+    for k in range(30):
+        x0, y0 = rng.integers(0, x - 3), rng.integers(0, y - 2)
+        if k % 2:
+            basin.addElevation(slice(x0, x0 + 3), slice(y0, y0 + 2), rng.normal() * 2)
+        else:
+            basin.setElevation(x0, y0, rng.random() * 6)
+        terrain = basin.terrain
+        full = Terrain(basin.BM)
+        assert np.array_equal(terrain.filled, full.filled)
+        assert np.array_equal(terrain.labels, full.labels)
+        assert np.allclose(terrain.capacity, full.capacity)
+        assert terrain.flooded < x * y
+
+
+def test_incremental_random():
+    # rough edits on small grids, cells dug to the floor and raised far above their surroundings, every update must
+    # match a terrain built from scratch, also when several edits pile up between updates
+    for seed in range(200):
+        rng = np.random.default_rng(seed)
+        y, x = rng.integers(3, 12, 2)
+        basin = Basin(x, y, maxElv=100)
+        basin.setElevation(slice(0, x), slice(0, y), rng.random((y, x)) * 5)
+        basin.terrain
+        for k in range(25):
+            x0, y0 = rng.integers(0, x), rng.integers(0, y)
+            w, h = rng.integers(1, 4, 2)
+            r = rng.random()
+            if r < 0.3:
+                basin.setElevation(x0, y0, 0.)
+            elif r < 0.5:
+                basin.setElevation(x0, y0, rng.random() * 20)
+            elif r < 0.8:
+                basin.addElevation(slice(x0, x0 + w), slice(y0, y0 + h), rng.normal() * 4)
+            else:
+                basin.setElevation(x0, y0, rng.random() * 6)
+            if rng.random() < 0.3:
+                continue
+            terrain, full = basin.terrain, Terrain(basin.BM)
+            assert np.array_equal(terrain.filled, full.filled), (seed, k)
+            assert np.array_equal(terrain.labels, full.labels), (seed, k)
+            assert np.allclose(terrain.capacity, full.capacity), (seed, k)
+
+
+def test_fast_forward():
+    y, x = 20, 30
+    e = np.full((y, x), 5.)
+    e[5:15, 5:12] = 1.
+    e[5:15, 12] = 3.
+    e[5:15, 13:20] = 2.
+    basin = Basin(x, y)
+    basin.setElevation(slice(0, x), slice(0, y), e)
+    terrain = basin.terrain
+    # the two pits share one depression spilling at the surrounding plateau
+    assert terrain.count == 1 and terrain.spill[1] == 5 and terrain.capacity[1] == 70 * 4 + 10 * 2 + 70 * 3
+    assert terrain.sinks[1] == 5 * x + 5
+    basin.addLayer(rain := RainLayer(x, y))
+    rain.setFill(slice(0, x), slice(0, y), 0.01)
+    basin.fastForward(10)
+    assert basin.time == 10 and np.isclose(basin.mass(), 0.01 * 0.5 * 10 * x * y)
+    # rain on the pits ponds in the lower one at a single level, the plateau's runs off to the edge
+    pond = basin[5:15, 5:12]
+    assert np.allclose(pond, pond[0, 0]) and np.isclose(pond.sum(), 0.05 * 150)
+    assert basin[5:15, 12:20].sum() == 0 and np.isclose(basin[1:-1, 1:-1].sum(), pond.sum())
+    # long enough and the depression fills to its spill level, the rest stays at the edge
+    basin.fastForward(1000)
+    assert np.allclose(basin[5:15, 5:20] + e[5:15, 5:20], 5)
+
+    # sparse rain falls the same as dense rain
+    for layer in (RainLayer(x, y), SparseRainLayer(x, y)):
+        basin = Basin(x, y)
+        basin.setElevation(slice(0, x), slice(0, y), e)
+        basin.addLayer(layer)
+        layer.setFill(slice(5, 15), slice(5, 15), 0.1)
+        basin.fastForward(10)
+        assert np.isclose(basin.mass(), 0.1 * 0.5 * 10 * 100)
+
+    ensemble = EnsembleBasin(2, x, y)
+    ensemble.setElevation(slice(0, x), slice(0, y), e)
+    ensemble.fastForward(10, np.array([0.01, 0.2])[:, None, None])
+    assert np.allclose(ensemble.mass(), [0.1 * x * y, 2 * x * y])
+    assert ensemble[0, 5, 5] < ensemble[1, 5, 5]
+
+    # members with their own elevation settle on their own terrain
+    ensemble = EnsembleBasin(2, x, y, sharedElevation=False)
+    ensemble.setElevation(slice(0, x), slice(0, y), e)
+    ensemble.setElevation(slice(5, 20), slice(5, 15), 5., member=1)
+    try:
+        ensemble.terrain
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("members with their own elevation share a terrain")
+    assert ensemble.memberTerrain(0).count == 1 and ensemble.memberTerrain(1).count == 0
+    ensemble.fastForward(10, 0.01)
+    assert np.allclose(ensemble.mass(), 0.1 * x * y)
+    assert np.isclose(ensemble[0, 5:15, 5:12].sum(), 0.1 * 150) and ensemble[1, 5:15, 5:20].sum() == 0
+    ensemble.setElevation(slice(5, 12), slice(5, 15), 1., member=1)
+    assert ensemble.memberTerrain(1).count == 1 and ensemble.memberTerrain(0).count == 1
+
+
+def test_fallback_warns():
+    # without numba the per-cell loops run in python, which is said once a terrain is built
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        Terrain(np.zeros((4, 5)))
+    assert any("numba" in str(w.message) for w in caught) != jit.AVAILABLE
+
+
+if __name__ == '__main__':
+    test_fill_and_incremental()
+    test_incremental_random()
+    test_fast_forward()
+    test_fallback_warns()
@@ -0,0 +1,154 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from flosim import Basin, RainLayer, GutterLayer, EvaporationLayer, ReservoirLayer
+from flosim.func import Workspace, surr, velAct, gauss_seidel_solver
+
+SIZES = 16, 64, 256, 1024, 4096
+CASES = "surr", "velAct", "gauss_seidel_solver", "layers", "tick"
+
+
+def terrain(n, seed=777):
+    try:
+        from data.rnd import rnd
+        return rnd(n, n, seed=seed) * 10
+    except ImportError:
+        pass
+    # octaves of bilinearly upsampled value noise, close enough to the perlin terrain for timing
+    rng = np.random.default_rng(seed)
+    out = np.zeros((n, n))
+    cells, amp = 4, 1.
+    while cells <= n:
+        coarse = rng.random((cells + 1, cells + 1))
+        t = np.linspace(0, cells, n, endpoint=False)
+        i, f = t.astype(int), t % 1
+        rows = coarse[i] * (1 - f)[:, None] + coarse[i + 1] * f[:, None]
+        out += amp * (rows[:, i] * (1 - f) + rows[:, i + 1] * f)
+        cells, amp = cells * 2, amp / 2
+    out -= out.min()
+    return out / out.max() * 10
+
+
+def basin(n, **kwargs):
+    b = Basin(n, n, **kwargs)
+    b.setElevation(slice(0, n), slice(0, n), terrain(n))
+    rng = np.random.default_rng(0)
+    b.setVelR(slice(0, n), slice(0, n), rng.random((n, n)) * 0.1)
+    b.setVelD(slice(0, n), slice(0, n), rng.random((n, n)) * 0.1)
+    b.addLayer(rain := RainLayer(n, n))
+    b.addLayer(gutter := GutterLayer(n, n))
+    b.addLayer(EvaporationLayer(n, n, 0.1))
+    b.addLayer(reservoir := ReservoirLayer(n, n, 0.5))
+    rain.setFill(slice(0, n), slice(0, n), 0.01)
+    gutter.setDrain(slice(0, n // 8 + 1), slice(0, n), 0.05)
+    reservoir.setMask(slice(n // 2, n // 2 + n // 16 + 1), slice(n // 2, n // 2 + n // 16 + 1))
+    for _ in range(3):
+        b.tick(0.2)
+    return b
+
+
+def setup(case, n, **kwargs):
+    # returns the callable to time and the number of cell updates one call performs
+    b = basin(n, **kwargs)
+    e, w, ws = b.BM, b[:].copy(), Workspace((n, n))
+    out = np.empty_like(w)
+    match case:
+        case "surr":
+            return lambda: surr(e, w, out=out, ws=ws), n * n
+        case "velAct":
+            return lambda: velAct(e, w, b._SVX, b._SVY, 0.1, out=out, ws=ws), n * n
+        case "gauss_seidel_solver":
+            foo = lambda dex, ndex: b._diffuse(e, b._ws, dex, ndex, 0.1)
+            return lambda: gauss_seidel_solver(foo, w, b._maxIter, out=out), n * n * b._maxIter
+        case "layers":
+            return lambda: b._applyLayers(0.1), n * n
+        case "tick":
+            return lambda: b.tick(0.2), n * n
+    raise ValueError(f"unknown case {case!r}, expected one of {CASES}")
+
+
+def measure(foo, minTime=0.2, repeat=5):
+    foo()
+    tracemalloc.start()
+    foo()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    times = []
+    for _ in range(repeat):
+        calls, t0 = 0, time.perf_counter()
+        while True:
+            foo()
+            calls += 1
+            t = time.perf_counter() - t0
+            if t >= minTime / repeat:
+                break
+        times.append(t / calls)
+    return min(times), float(np.median(times)), peak
+
+
+def run(cases, sizes, minTime, **kwargs):
+    results = []
+    for case in cases:
+        for n in sizes:
+            foo, cells = setup(case, n, **kwargs)
+            best, median, peak = measure(foo, minTime)
+            results.append({"case": case, "size": n, "seconds": best, "median": median,
+                            "cellsPerSecond": cells / best, "peakBytes": peak})
+            print(f"{case:>20} {n:>5}  {best * 1e3:10.3f} ms  {cells / best:10.3e} cells/s  "
+                  f"{peak / 2 ** 20:8.1f} MiB", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    # a result regresses when it is more than threshold slower than the baseline, or uses that much more memory
+    old = {(r["case"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = old.get((r["case"], r["size"]))
+        if b is None:
+            continue
+        speed = r["cellsPerSecond"] / b["cellsPerSecond"]
+        memory = (r["peakBytes"] + 1) / (b["peakBytes"] + 1)
+        flag = speed < 1 - threshold or memory > 1 + threshold
+        print(f"{r['case']:>20} {r['size']:>5}  speed x{speed:6.3f}  memory x{memory:6.3f}"
+              f"{'  REGRESSION' if flag else ''}", file=sys.stderr)
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="flosim kernel and tick benchmarks")
+    parser.add_argument("--cases", nargs="+", default=CASES, choices=CASES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds spent timing each case")
+    parser.add_argument("--solver", default="jacobi", choices=Basin.SOLVERS)
+    parser.add_argument("--backend", default="numpy", choices=Basin.BACKENDS)
+    parser.add_argument("--out", help="write the results as json")
+    parser.add_argument("--compare", help="baseline json to compare against, exits 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    results = run(args.cases, args.sizes, args.min_time, solver=args.solver, backend=args.backend)
+    report = {"machine": platform.platform(), "python": platform.python_version(), "numpy": np.__version__,
+              "solver": args.solver, "backend": args.backend, "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,7 +3,8 @@ from PyQt5 import Qt
 from matplotlib import pyplot as plt
 
 from data.rnd import rnd
-from flosim import Basin, RainLayer, GutterLayer, ReservoirLayer, EvaporationLayer
+from flosim import Basin, RainLayer, GutterLayer, ReservoirLayer, EvaporationLayer, Volume
+from tools.runner import SimulationRunner
 
 
 class GISMap(Qt.QWidget):
@@ -18,17 +19,26 @@ class GISMap(Qt.QWidget):
 
         self._BM = np.zeros((height, width), dtype=np.uint8)
         self._WM = np.zeros((height, width), dtype=np.float64)
+        self._bmMax = None
 
         self.road = np.zeros((height, width), dtype=bool)
         self.building = np.zeros((height, width), dtype=bool)
 
+        # the image shares the rgb buffer, colouring a region of _rgb is all a redraw needs
+        self._rgb = np.zeros((height, width, 3), dtype=np.uint8)
+        self._image = Qt.QImage(self._rgb.data, width, height, 3 * width, Qt.QImage.Format_RGB888)
+
         self.clickListener = None
         self._pressed = 0
 
-    def setBM(self, array):
+    def setBM(self, array, x=slice(None), y=slice(None)):
         assert array.shape == (self._H, self._W)
-        array = (array / array.max() * 255).astype(np.uint8)
-        self._BM[:] = array
+        top = array.max()
+        if top != self._bmMax:
+            # the scale changed, every cell has to be recoloured
+            self._bmMax, x, y = top, slice(None), slice(None)
+        self._BM[y, x] = array[y, x] / top * 255
+        self.refresh(x, y)
 
     def setSF(self, sf):
         self._sf = sf
@@ -36,28 +46,32 @@ class GISMap(Qt.QWidget):
 
     def setWM(self, array):
         assert array.shape == (self._H, self._W)
-        array = array / (array.max() + 1e-6)
-        self._WM[:] = array
+        np.divide(array, array.max() + 1e-6, out=self._WM)
+        self.refresh()
+
+    def refresh(self, x=slice(None), y=slice(None)):
+        # recolours the cells in the x, y slices and schedules a repaint of just that rectangle
+        y0, y1, _ = y.indices(self._H)
+        x0, x1, _ = x.indices(self._W)
+        if y0 >= y1 or x0 >= x1:
+            return
+        win = slice(y0, y1), slice(x0, x1)
+        blue, elev, out = self._WM[win], self._BM[win].astype(np.float64), self._rgb[win]
+        water = np.minimum(1 - blue, 0.2) * 2 / 3
+        rgb = np.multiply.outer(water, self.BLUE)
+        rgb += (elev / 3)[..., None]
+        np.copyto(out, np.where((blue > 0)[..., None], rgb, elev[..., None]), casting="unsafe")
+        out[self.road[win]] = 0, 0, 0
+        out[self.building[win]] = 255, 255, 0
+        self.update(x0 * self._sf, y0 * self._sf, (x1 - x0) * self._sf, (y1 - y0) * self._sf)
 
     def paintEvent(self, event):
+        sf, r = self._sf, event.rect()
+        x0, y0 = r.left() // sf, r.top() // sf
+        x1, y1 = min(-(-(r.right() + 1) // sf), self._W), min(-(-(r.bottom() + 1) // sf), self._H)
         painter = Qt.QPainter(self)
-        painter.setPen(Qt.Qt.NoPen)
-        for j in range(self._H):
-            for i in range(self._W):
-                blue = self._WM[j, i]
-                elev = self._BM[j, i]
-                if self.building[j, i]:
-                    col = 255, 255, 0
-                elif self.road[j, i]:
-                    col = 0, 0, 0
-                elif blue > 0:
-                    blue = np.minimum(1 - blue, 0.2) * 2 / 3
-                    elev = elev / 3
-                    col = int(self.BLUE[0] * blue + elev), int(self.BLUE[1] * blue + elev), int(self.BLUE[2] * blue + elev)
-                else:
-                    col = elev, elev, elev
-                painter.setBrush(Qt.QColor(*col))
-                painter.drawRect(i * self._sf, j * self._sf, self._sf, self._sf)
+        painter.drawImage(Qt.QRect(x0 * sf, y0 * sf, (x1 - x0) * sf, (y1 - y0) * sf),
+                          self._image, Qt.QRect(x0, y0, x1 - x0, y1 - y0))
         painter.end()
 
     def mousePressEvent(self, event):
@@ -75,6 +89,7 @@ class GISMap(Qt.QWidget):
 
 class DebugWindow(Qt.QWidget):
     WIDTH, HEIGHT = 1200, 600
+    FPS = 30
 
     def __init__(self):
         super().__init__()
@@ -95,7 +110,8 @@ class DebugWindow(Qt.QWidget):
         self.basin.addLayer(self.reservoir)
         self.evaporation = EvaporationLayer(x, y, 0.9)
 
-        self.hydrograph = []
+        self.hydrograph = Volume()
+        self.basin.addHook(self.hydrograph)
 
         self._map = GISMap(x, y, 1)
         self._map.setBM(self.basin.BM)
@@ -111,69 +127,99 @@ class DebugWindow(Qt.QWidget):
         self._menu = self.menu()
         self._layout.addWidget(self._menu, stretch=1)
 
+        # the basin belongs to the runner's thread from here on, the gui only edits it through _edit
+        self._sim = SimulationRunner(self.basin, step=1.0, maxRise=0.05)
+        self._edits, self._queued, self._regions = 0, 0, []
+        self._sim.start()
+        self._timer = Qt.QTimer(self)
+        self._timer.timeout.connect(self._present)
+        self._timer.start(1000 // self.FPS)
+
+    def closeEvent(self, event):
+        self._timer.stop()
+        self._sim.close()
+        super().closeEvent(event)
+
     def __reinit__(self):
-        self.basin.setElevation(slice(0, self._map._W), slice(0, self._map._H), rnd(self._map._W, self._map._H, seed=777) * 10)
-        self.rain._level *= 0
-        self.gutter._level *= 0
-        self.basin._WM *= 0
-        self._map.building *= False
-        self._map.road *= False
-        self.reservoir._level *= False
-        self._map.setBM(self.basin.BM)
-        self._map.setWM(self.basin[:])
-        self._map.update()
-        plt.plot(self.hydrograph)
+        running = self._sim.running
+        self._sim.pause()
+        # hooks only run in ticks, so the paused worker leaves the hydrograph alone
+        plt.plot(self.hydrograph.times, self.hydrograph.values)
         plt.show()
-        self.hydrograph = []
+        self._map.building[...] = False
+        self._map.road[...] = False
+        old, self.hydrograph = self.hydrograph, Volume()
+        elevation = rnd(self._map._W, self._map._H, seed=777) * 10
+
+        def reset(basin):
+            basin.setElevation(slice(0, self._map._W), slice(0, self._map._H), elevation)
+            self.rain.clear()
+            self.gutter.clear()
+            self.reservoir.clear()
+            basin._WM *= 0
+            basin.removeHook(old)
+            basin.addHook(self.hydrograph)
+
+        self._edit(reset, slice(None), slice(None))
+        if running:
+            self._sim.play()
+
+    def _edit(self, foo, x: slice = None, y: slice = None):
+        # queues foo for the worker, the x, y region of an elevation edit is recoloured once a frame holds it
+        self._queued += 1
+        if x is not None:
+            self._regions.append((self._queued, x, y))
+        self._sim.edit(foo)
 
     def tick(self):
-        for _ in range(1000):
-            self.basin.tick(0.2)
-            self._map.setBM(self.basin.BM)
-            self._map.setWM(self.basin[:])
-            self._map.update()
-            self.hydrograph.append(self.basin[:].sum())
-            Qt.QTest.qWait(1)
+        if self._sim.running:
+            self._sim.pause()
+            self._tick.setText("Run")
+        else:
+            self._sim.play()
+            self._tick.setText("Pause")
+
+    def _present(self):
+        # shows the newest frame, frames published in between are skipped
+        frame = self._sim.latest()
+        if frame is None:
+            return
+        if frame.edits != self._edits:
+            self._edits = frame.edits
+            for _, x, y in (r for r in self._regions if r[0] <= frame.edits):
+                self._map.setBM(frame.BM, x, y)
+            self._regions = [r for r in self._regions if r[0] > frame.edits]
+        self._map.setWM(frame.WM)
 
     def elevMode(self, px, py, k):
         px = max(min(px, self._map._W - 1), 0)
         py = max(min(py, self._map._H - 1), 0)
-        self.basin.addElevation(
-            *np.meshgrid([max(px - 1, 0), px, min(px + 1, self._map._W - 1)],
-                         [max(py - 1, 0), py, min(py + 1, self._map._H - 1)]), self.value.value() * k
-        )
-        self._map.setBM(self.basin.BM)
-        self._map.update()
+        p = np.meshgrid([max(px - 1, 0), px, min(px + 1, self._map._W - 1)],
+                        [max(py - 1, 0), py, min(py + 1, self._map._H - 1)])
+        value = self.value.value() * k
+        self._edit(lambda basin: basin.addElevation(*p, value), slice(max(px - 1, 0), px + 2),
+                   slice(max(py - 1, 0), py + 2))
 
     def rainMode(self, px, py, k):
         px = max(min(px, self._map._W - 1), 0)
         py = max(min(py, self._map._H - 1), 0)
-        if k > 0:
-            self.rain.setFill(py, px, 0.001)
-        else:
-            self.rain.setFill(py, px, 0)
+        fill = 0.001 if k > 0 else 0
+        self._edit(lambda _: self.rain.setFill(py, px, fill))
 
     def gutterMode(self, px, py, k):
         px = max(min(px, self._map._W - 1), 0)
         py = max(min(py, self._map._H - 1), 0)
         p = np.meshgrid([max(px - 1, 0), px, min(px + 1, self._map._W - 1)],
                         [max(py - 1, 0), py, min(py + 1, self._map._H - 1)])
-        if k > 0:
-            self.gutter.setDrain(*p, 0.1)
-        else:
-            self.gutter.setDrain(*p, 0)
+        drain = 0.1 if k > 0 else 0
+        self._edit(lambda _: self.gutter.setDrain(*p, drain))
 
     def buildingMode(self, px, py, k):
         px = max(min(px, self._map._W - 1), 0)
         py = max(min(py, self._map._H - 1), 0)
-        if k > 0:
-            self._map.building[py, px] = 1
-            self.basin.setElevation(px, py, 10)
-        else:
-            self._map.building[py, px] = 0
-            self.basin.setElevation(px, py, self._initElev[py, px])
-        self._map.setBM(self.basin.BM)
-        self._map.update()
+        self._map.building[py, px] = k > 0
+        elevation = 10 if k > 0 else self._initElev[py, px]
+        self._edit(lambda basin: basin.setElevation(px, py, elevation), slice(px, px + 1), slice(py, py + 1))
 
     def roadMode(self, px, py, k):
         px = max(min(px, self._map._W - 1), 0)
@@ -184,16 +230,21 @@ class DebugWindow(Qt.QWidget):
             self._map.road[py, px] = 1
         else:
             self._map.road[py, px] = 0
-        self._map.update()
+        self._map.refresh(slice(px[0], px[-1] + 1), slice(py[0], py[-1] + 1))
 
     def riverMode(self, px, py, k):
         px = max(min(px, self._map._W - 1), 0)
         py = max(min(py, self._map._H - 1), 0)
-        self.reservoir.setHeight(self.value.value())
-        if k > 0:
-            self.reservoir.setMask(px, py, True)
-        else:
-            self.reservoir.setFill(px, py, False)
+        height = self.value.value()
+
+        def edit(_):
+            self.reservoir.setHeight(height)
+            if k > 0:
+                self.reservoir.setMask(px, py, True)
+            else:
+                self.reservoir.setFill(px, py, False)
+
+        self._edit(edit)
 
     def modeSwitch(self, i):
         match i:
@@ -217,9 +268,9 @@ class DebugWindow(Qt.QWidget):
         layout = Qt.QVBoxLayout()
         menu.setLayout(layout)
 
-        tick = Qt.QPushButton("Tick")
-        tick.clicked.connect(lambda: self.tick())
-        layout.addWidget(tick, alignment=Qt.Qt.AlignTop)
+        self._tick = Qt.QPushButton("Run")
+        self._tick.clicked.connect(lambda: self.tick())
+        layout.addWidget(self._tick, alignment=Qt.Qt.AlignTop)
 
         modeLabel = Qt.QLabel("Mode:")
         layout.addWidget(modeLabel, alignment=Qt.Qt.AlignTop)
@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class Frame:
+    __slots__ = "index", "time", "ticks", "edits", "WM", "BM"
+
+    def __init__(self, basin):
+        self.index, self.time, self.ticks, self.edits = -1, 0., 0, 0
+        self.WM = np.empty_like(basin[:])
+        self.BM = np.empty_like(basin.BM)
+
+
+class SimulationRunner:
+    # advances a basin on a worker thread and publishes snapshots through a triple buffer: the worker only ever
+    # writes the back frame, the reader only ever reads the front frame, and the two swap through a ready frame
+    def __init__(self, basin, step: float = 0.2, publishEvery: float = 1 / 60, **runKwargs):
+        # every iteration advances the basin by step through Basin.run, which may split it into smaller ticks
+        self.basin = basin
+        self._step, self._publishEvery, self._runKwargs = step, publishEvery, runKwargs
+        self._frames = [Frame(basin) for _ in range(3)]
+        self._back, self._ready, self._front = 0, 1, 2
+        self._fresh, self._published, self._edits = False, 0, 0
+        self._lock = threading.Lock()
+        self._publishedCond = threading.Condition(self._lock)
+        self._queue = queue.SimpleQueue()
+        self._running, self._idle = threading.Event(), threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self._publish()
+        self._thread.start()
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def play(self):
+        self._running.set()
+
+    def pause(self):
+        # returns once the worker has finished its current tick
+        self._running.clear()
+        if self._thread.is_alive():
+            self._idle.wait()
+
+    def edit(self, foo):
+        # foo(basin) runs on the worker between two ticks, frames count the edits applied before them
+        self._queue.put(foo)
+
+    @property
+    def published(self):
+        return self._published
+
+    def wait(self, frames: int, timeout: float = None) -> bool:
+        # blocks until frames frames have been published in all, False on timeout
+        with self._publishedCond:
+            return self._publishedCond.wait_for(lambda: self._published >= frames, timeout)
+
+    def latest(self) -> Frame:
+        # the newest published frame, or None when nothing was published since the last call
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._front, self._ready, self._fresh = self._ready, self._front, False
+        return self._frames[self._front]
+
+    def close(self):
+        self._stop = True
+        self._running.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _applyEdits(self):
+        applied = False
+        while True:
+            try:
+                foo = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            foo(self.basin)
+            self._edits += 1
+            applied = True
+        return applied
+
+    def _publish(self):
+        frame, basin = self._frames[self._back], self.basin
+        np.copyto(frame.WM, basin[:])
+        np.copyto(frame.BM, basin.BM)
+        frame.time, frame.ticks, frame.edits = basin.time, basin.ticks, self._edits
+        with self._publishedCond:
+            frame.index, self._published = self._published, self._published + 1
+            self._back, self._ready, self._fresh = self._ready, self._back, True
+            self._publishedCond.notify_all()
+
+    def _loop(self):
+        last = time.perf_counter()
+        while not self._stop:
+            edited = self._applyEdits()
+            if not self._running.is_set():
+                if edited:
+                    self._publish()
+                self._idle.set()
+                self._running.wait(0.02)
+                continue
+            self._idle.clear()
+            if not self._running.is_set():
+                continue
+            self.basin.run(self.basin.time + self._step, dtMax=self._step, **self._runKwargs)
+            now = time.perf_counter()
+            # frames are decimated to the publishing rate, the simulation never waits for the reader
+            if edited or now - last >= self._publishEvery:
+                self._publish()
+                last = now
+        self._idle.set()